@@ -0,0 +1,165 @@
+"""
+Forced Alignment
+Aligns lyric text the user already has to the audio with a CTC acoustic model
+(torchaudio's MMS_FA bundle) instead of running open-vocabulary Whisper
+decoding. The model only scores the audio once and the text is fixed, so this
+is much faster than transcription and needs no manual word fixes afterwards.
+torch/torchaudio are imported on first use.
+"""
+
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_ingest import SAMPLE_RATE, load_pcm
+
+# wav2vec2 attention memory grows with the square of the input length, so
+# emissions are computed in windows with a little context on each side
+CHUNK_SECONDS = 30
+CONTEXT_SECONDS = 1
+# Lyric text is sent as a form field next to the audio
+MAX_LYRICS_BYTES = 64 * 1024
+
+_aligner: Optional[Dict[str, Any]] = None
+_aligner_lock = threading.Lock()
+
+
+class AlignmentError(Exception):
+    pass
+
+
+def get_aligner() -> Dict[str, Any]:
+    """
+    Load the MMS_FA model, tokenizer and aligner once per process.
+    The weights are downloaded by torchaudio on first use.
+    """
+    global _aligner
+    if _aligner is not None:
+        return _aligner
+
+    with _aligner_lock:
+        if _aligner is None:
+            from torchaudio.pipelines import MMS_FA
+            print('Loading forced alignment model (MMS_FA)...')
+            model = MMS_FA.get_model(with_star=False)
+            model.eval()
+            _aligner = {
+                'model': model,
+                'tokenizer': MMS_FA.get_tokenizer(),
+                'aligner': MMS_FA.get_aligner(),
+                'dictionary': MMS_FA.get_dict(star=None),
+            }
+        return _aligner
+
+
+def split_lyrics(text: str) -> List[str]:
+    """Lyric text is aligned word by word; any whitespace separates words"""
+    return text.split()
+
+
+def normalize_word(word: str, dictionary: Dict[str, int]) -> str:
+    """Lowercase, strip accents and drop characters the acoustic model has no token for"""
+    decomposed = unicodedata.normalize('NFKD', word.lower().replace('’', "'"))
+    return ''.join(c for c in decomposed if c in dictionary and c != '-')
+
+
+def _emissions(model, waveform: np.ndarray):
+    """Frame-level log probabilities for the whole waveform, computed window by window"""
+    import torch
+
+    chunk = CHUNK_SECONDS * SAMPLE_RATE
+    context = CONTEXT_SECONDS * SAMPLE_RATE
+    outputs = []
+    with torch.inference_mode():
+        for start in range(0, len(waveform), chunk):
+            end = min(start + chunk, len(waveform))
+            lo, hi = max(0, start - context), min(len(waveform), end + context)
+            emission, _ = model(torch.from_numpy(waveform[lo:hi]).unsqueeze(0))
+
+            # Drop the frames that belong to the context padding
+            frames_per_sample = emission.shape[1] / (hi - lo)
+            first = round((start - lo) * frames_per_sample)
+            last = first + round((end - start) * frames_per_sample)
+            outputs.append(emission[0, first:last])
+    return torch.cat(outputs)
+
+
+def _fill_unaligned(timings: List[Optional[Tuple[int, int]]], duration_ms: int) -> List[Tuple[int, int]]:
+    """
+    Words with nothing the model can align (e.g. only punctuation or digits)
+    share the gap between their aligned neighbours
+    """
+    filled = list(timings)
+    i = 0
+    while i < len(filled):
+        if filled[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(filled) and filled[j] is None:
+            j += 1
+        gap_start = filled[i - 1][1] if i > 0 else 0
+        gap_end = filled[j][0] if j < len(filled) else duration_ms
+        step = max(gap_end - gap_start, 0) / (j - i)
+        for k in range(i, j):
+            filled[k] = (int(gap_start + (k - i) * step), int(gap_start + (k - i + 1) * step))
+        i = j
+    return filled
+
+
+def align_lyrics(audio_path: str, text: str) -> Dict:
+    """
+    Align known lyric text to a raw 16 kHz mono .pcm file from audio_ingest.
+
+    Returns the same shape as transcribe_audio:
+    {
+        "lyrics": [{"text": "Hello", "start": 0, "end": 800}, ...],
+        "duration": 10.5,
+        "text": "Hello ..."
+    }
+    """
+    words = split_lyrics(text)
+    if not words:
+        raise AlignmentError('Lyrics text is empty')
+
+    resources = get_aligner()
+    normalized = [normalize_word(word, resources['dictionary']) for word in words]
+    aligned = [i for i, word in enumerate(normalized) if word]
+    if not aligned:
+        raise AlignmentError('Lyrics contain no alignable words')
+
+    waveform = load_pcm(audio_path)
+    if len(waveform) == 0:
+        raise AlignmentError('Audio is empty')
+    duration_ms = int(len(waveform) / SAMPLE_RATE * 1000)
+
+    print(f'Aligning {len(words)} words to audio file: {audio_path}')
+    started = time.perf_counter()
+    emission = _emissions(resources['model'], waveform)
+
+    tokens = resources['tokenizer']([normalized[i] for i in aligned])
+    try:
+        spans = resources['aligner'](emission, tokens)
+    except RuntimeError as e:
+        # CTC needs at least one frame per token
+        raise AlignmentError(f'Lyrics do not fit the audio: {e}')
+
+    ms_per_frame = len(waveform) / emission.shape[0] / SAMPLE_RATE * 1000
+    timings: List[Optional[Tuple[int, int]]] = [None] * len(words)
+    for word_index, word_spans in zip(aligned, spans):
+        timings[word_index] = (int(word_spans[0].start * ms_per_frame), int(word_spans[-1].end * ms_per_frame))
+
+    lyrics = [
+        {'text': word, 'start': start, 'end': end}
+        for word, (start, end) in zip(words, _fill_unaligned(timings, duration_ms))
+    ]
+    print(f'Aligned {len(aligned)}/{len(words)} words in {time.perf_counter() - started:.2f}s')
+
+    return {
+        'lyrics': lyrics,
+        'duration': duration_ms / 1000,
+        'text': ' '.join(words)
+    }
@@ -0,0 +1,297 @@
+"""
+ASS Subtitle Render Backend
+Renders the standard lyric style (white text, black stroke, scale-up on the
+active word) entirely inside ffmpeg. The lyric timeline is compiled into an
+ASS subtitle script, and one filter graph loops, scales and crops the
+background, burns in the subtitles with libass and muxes the audio. No frame
+passes through Python, except the few the preview sprite needs.
+
+Used automatically for styles it can draw (see choose_backend); anything else
+falls back to the NumPy compositor in render_engine.
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from hls_output import EncodeError
+from lyric_timeline import LyricTimeline
+from media_tools import find_ffmpeg
+from preview_assets import PreviewCollector
+
+FONTS_DIR = os.environ.get("LYRIC_FONTS_DIR")
+SCRIPT_NAME = 'lyrics.ass'
+
+# Matches the Text Styling defaults in README_RENDER_ENGINE.md
+DEFAULT_STYLE = {
+    'font': 'Inter',
+    'font_size': 80,
+    'text_color': 'white',
+    'stroke_color': 'black',
+    'stroke_width': 2,
+}
+NAMED_COLORS = {
+    'white': 'FFFFFF', 'black': '000000', 'red': 'FF0000', 'green': '00FF00', 'blue': '0000FF',
+    'yellow': 'FFFF00', 'cyan': '00FFFF', 'magenta': 'FF00FF', 'gray': '808080', 'grey': '808080',
+}
+# The active word grows to its full scale over this many ms
+SCALE_UP_MS = 80
+
+BACKENDS = ('auto', 'ffmpeg', 'numpy')
+# key=value lines written by `-progress`
+_PROGRESS_LINE = re.compile(r'([a-z_0-9]+)=(\S*)')
+# Demuxer named on the `Input #0, <format>, from ...` line of `ffmpeg -i`
+_INPUT_FORMAT = re.compile(r'^Input #0, ([\w,]+), from ', re.MULTILINE)
+# Single-picture demuxers: image2 (by extension) and the *_pipe probes (png_pipe, webp_pipe, ...)
+_STILL_IMAGE_FORMATS = re.compile(r'image2|\w+_pipe')
+
+
+def ass_color(value) -> Optional[str]:
+    """'white' or '#RRGGBB' as an ASS colour (&HAABBGGRR), or None if not recognized"""
+    if not isinstance(value, str):
+        return None
+    rgb = NAMED_COLORS.get(value.lower())
+    if rgb is None and re.fullmatch(r'#[0-9a-fA-F]{6}', value):
+        rgb = value[1:].upper()
+    if rgb is None:
+        return None
+    return f'&H00{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}'
+
+
+def unsupported_style(style: Optional[Dict]) -> Optional[str]:
+    """Why this backend cannot draw `style`, or None if it can"""
+    if style is None:
+        return None
+    if not isinstance(style, dict):
+        return 'style must be an object'
+    unknown = sorted(set(style) - set(DEFAULT_STYLE))
+    if unknown:
+        return f"style options {', '.join(unknown)} are only drawn by the compositor"
+    if 'font' in style and (not isinstance(style['font'], str) or ',' in style['font']):
+        return 'font must be a font name without commas'
+    for key in ('text_color', 'stroke_color'):
+        if key in style and ass_color(style[key]) is None:
+            return f'{key} {style[key]!r} is not a named or #RRGGBB colour'
+    for key in ('font_size', 'stroke_width'):
+        if key in style and (not isinstance(style[key], (int, float)) or style[key] < 0):
+            return f'{key} must be a non-negative number'
+    return None
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_has_libass() -> bool:
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return False
+    result = subprocess.run([ffmpeg, '-nostdin', '-hide_banner', '-filters'], capture_output=True)
+    return re.search(rb'^\s*\S+\s+ass\s', result.stdout, re.MULTILINE) is not None
+
+
+def is_still_image(path: str) -> bool:
+    """
+    True when ffmpeg opens `path` as a single picture (JPG, PNG, WebP) rather
+    than a video. Animated GIFs are videos.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return False
+    result = subprocess.run([ffmpeg, '-nostdin', '-hide_banner', '-i', path], capture_output=True)
+    match = _INPUT_FORMAT.search(result.stderr.decode(errors='replace'))
+    return match is not None and _STILL_IMAGE_FORMATS.fullmatch(match.group(1)) is not None
+
+
+def choose_backend(project_config: Dict) -> str:
+    """
+    'ffmpeg' or 'numpy' for a render. `render_backend` in the config pins one;
+    'auto' (the default) picks ffmpeg whenever it can produce the output.
+    """
+    requested = project_config.get('render_backend') or 'auto'
+    if requested == 'numpy':
+        return 'numpy'
+
+    reason = unsupported_style(project_config.get('style'))
+    if reason is None and project_config.get('output_mode') == 'hls':
+        reason = 'HLS output is streamed by the compositor'
+    if reason is None and not os.path.isfile(project_config.get('background_url') or ''):
+        reason = 'background is not a local file'
+    if reason is None and not ffmpeg_has_libass():
+        reason = 'ffmpeg was built without libass'
+
+    if reason is None:
+        return 'ffmpeg'
+    if requested == 'ffmpeg':
+        print(f"ffmpeg render backend unavailable ({reason}); using the compositor")
+    return 'numpy'
+
+
+def _ass_timestamp(ms: int) -> str:
+    # ASS times are centiseconds; flooring keeps back-to-back words from overlapping
+    centiseconds = max(int(ms), 0) // 10
+    seconds, cs = divmod(centiseconds, 100)
+    minutes, secs = divmod(seconds, 60)
+    hours, mins = divmod(minutes, 60)
+    return f'{hours}:{mins:02d}:{secs:02d}.{cs:02d}'
+
+
+def _ass_text(text: str) -> str:
+    # Braces would start an override block; newlines become ASS hard breaks
+    return text.replace('{', '\\{').replace('}', '\\}').replace('\r', '').replace('\n', '\\N')
+
+
+def build_ass_script(timeline: LyricTimeline, width: int, height: int,
+                     style: Optional[Dict] = None, active_scale: float = 1.0) -> str:
+    """ASS script showing one centred event per word, scaling up to `active_scale` as it appears"""
+    style = {**DEFAULT_STYLE, **(style or {})}
+    text_color = ass_color(style['text_color'])
+    stroke_color = ass_color(style['stroke_color'])
+    scale = round(active_scale * 100)
+
+    lines = [
+        '[Script Info]',
+        'ScriptType: v4.00+',
+        f'PlayResX: {width}',
+        f'PlayResY: {height}',
+        'WrapStyle: 0',
+        'ScaledBorderAndShadow: yes',
+        '',
+        '[V4+ Styles]',
+        'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, '
+        'Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, '
+        'Alignment, MarginL, MarginR, MarginV, Encoding',
+        f"Style: Lyric,{style['font']},{style['font_size']:g},{text_color},{text_color},{stroke_color},"
+        f"&H00000000,0,0,0,0,100,100,0,0,1,{style['stroke_width']:g},0,5,40,40,0,1",
+        '',
+        '[Events]',
+        'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+    ]
+    scale_up = f'{{\\fscx100\\fscy100\\t(0,{SCALE_UP_MS},\\fscx{scale}\\fscy{scale})}}'
+    for index, start, end in zip(timeline.text_index.tolist(), timeline.starts.tolist(), timeline.ends.tolist()):
+        lines.append(
+            f'Dialogue: 0,{_ass_timestamp(start)},{_ass_timestamp(end)},Lyric,,0,0,0,,'
+            f'{scale_up}{_ass_text(timeline.strings[index])}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def _filter_graph(width: int, height: int, fps: int, frame_count: int,
+                  preview_frames: Optional[List[int]]) -> str:
+    subtitles = f'ass={SCRIPT_NAME}'
+    if FONTS_DIR:
+        subtitles += f":fontsdir='{FONTS_DIR}'"
+    # Centre-crop to the output aspect before scaling, so only the visible part is scaled.
+    # yuv420p is pinned before the split; otherwise the preview branch's rgb24 would be
+    # negotiated through the whole graph and every frame converted twice.
+    graph = (
+        f"[0:v]fps={fps},trim=end_frame={frame_count},"
+        f"crop='min(iw,ih*{width}/{height})':'min(ih,iw*{height}/{width})',"
+        f"scale={width}:{height},setsar=1,format=yuv420p,{subtitles}"
+    )
+    if not preview_frames:
+        return graph + '[video]'
+
+    # A second branch hands only the frames the preview collector keeps back to Python
+    wanted = '+'.join(f'eq(n,{frame})' for frame in preview_frames)
+    return graph + f",split=2[video][taps];[taps]select='{wanted}',format=rgb24[previews]"
+
+
+def render_with_ass(timeline: LyricTimeline, background_path: str, output_path: str,
+                    width: int, height: int, fps: int, encoder_settings: Dict,
+                    style: Optional[Dict] = None, active_scale: float = 1.0,
+                    audio_path: Optional[str] = None, audio_copy: bool = False,
+                    preview_collector: Optional[PreviewCollector] = None,
+                    progress_callback: Optional[Callable[[float], None]] = None) -> int:
+    """
+    Render the whole video with one ffmpeg run. Returns the number of frames
+    rendered; raises EncodeError if ffmpeg fails.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise EncodeError('ffmpeg is not installed')
+    frame_count = int(np.ceil(int(timeline.ends.max()) / 1000 * fps)) if len(timeline) else 0
+    if frame_count == 0:
+        raise EncodeError('No lyrics to render')
+
+    preview_frames = preview_collector.wanted_frames() if preview_collector else None
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-progress', 'pipe:2']
+    if is_still_image(background_path):
+        # -stream_loop restarts a picture at pts 0 every loop, so fps/trim would never advance
+        command += ['-loop', '1', '-framerate', str(fps)]
+    else:
+        command += ['-stream_loop', '-1']
+    command += ['-i', os.path.abspath(background_path)]
+    if audio_path:
+        command += ['-i', os.path.abspath(audio_path)]
+    command += ['-filter_complex', _filter_graph(width, height, fps, frame_count, preview_frames),
+                '-map', '[video]']
+    if audio_path:
+        command += ['-map', '1:a:0']
+        command += ['-c:a', 'copy'] if audio_copy else ['-c:a', 'aac', '-b:a', '192k']
+        command += ['-shortest']
+    command += [
+        '-c:v', encoder_settings.get('codec', 'libx264'),
+        '-preset', encoder_settings.get('preset', 'veryfast'),
+        '-crf', str(encoder_settings.get('crf', 23)),
+        '-threads', str(encoder_settings.get('threads', 0)),
+        '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+        os.path.abspath(output_path),
+    ]
+    if preview_frames:
+        command += ['-map', '[previews]', '-fps_mode', 'passthrough', '-f', 'rawvideo', 'pipe:1']
+
+    with tempfile.TemporaryDirectory(prefix='lyric_ass_') as work_dir:
+        with open(os.path.join(work_dir, SCRIPT_NAME), 'w', encoding='utf-8') as f:
+            f.write(build_ass_script(timeline, width, height, style, active_scale))
+
+        # Run inside the work dir so the filter graph can name the script without path escaping
+        process = subprocess.Popen(command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        errors: List[str] = []
+        failures: List[BaseException] = []
+        reader = threading.Thread(target=_read_progress, daemon=True,
+                                  args=(process, frame_count, progress_callback, errors, failures))
+        reader.start()
+        try:
+            frame_size = width * height * 3
+            for frame_index in preview_frames or []:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                preview_collector.offer(frame_index, np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+            process.stdout.read()
+            returncode = process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            reader.join()
+
+    if failures:
+        # The progress callback aborted the render (e.g. the worker lost its lease)
+        raise failures[0]
+    if returncode != 0:
+        raise EncodeError(f"ffmpeg render failed: {errors[-1] if errors else 'unknown error'}")
+    return frame_count
+
+
+def _read_progress(process: subprocess.Popen, frame_count: int, progress_callback,
+                   errors: List[str], failures: List[BaseException]):
+    """Turn `-progress` frame counts into progress callbacks; other stderr lines are error text"""
+    for raw in process.stderr:
+        line = raw.decode(errors='replace').strip()
+        match = _PROGRESS_LINE.fullmatch(line)
+        if not match:
+            if line:
+                errors.append(line)
+            continue
+        if match.group(1) == 'frame' and progress_callback and not failures:
+            try:
+                progress_callback(min(int(match.group(2)) / frame_count, 1.0))
+            except BaseException as e:
+                failures.append(e)
+                process.kill()
@@ -0,0 +1,265 @@
+"""
+Audio Analysis
+Min/max waveform peaks at several zoom levels plus an onset and beat grid for
+the word timeline editor, computed once from the decoded upload and cached by
+the audio's SHA-256 so clients never decode the full audio themselves.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from audio_ingest import SAMPLE_RATE
+
+CACHE_DIR = os.environ.get(
+    "AUDIO_ANALYSIS_CACHE",
+    os.path.join(tempfile.gettempdir(), "lyric_audio_analysis")
+)
+PEAKS_NAME = 'peaks.bin'
+ANALYSIS_NAME = 'analysis.json'
+ANALYSIS_VERSION = 1
+
+# Samples per peak at each zoom level (16 kHz: 4 ms, 16 ms, 64 ms, 256 ms, 1 s);
+# every level is built from the one before it
+PEAK_LEVELS = [64, 256, 1024, 4096, 16384]
+PEAK_BITS = 8
+
+# Onset envelope: 64 ms frames every 32 ms
+FFT_SIZE = 1024
+HOP_SIZE = 512
+# Frames per STFT block in onset_envelope (about 65 s of audio, ~20 MB of spectrum)
+ONSET_BLOCK_FRAMES = 2048
+MIN_BPM = 60
+MAX_BPM = 200
+PREFERRED_BPM = 120
+# Higher values keep the beat grid closer to the global tempo
+BEAT_TIGHTNESS = 100
+MIN_ONSET_SPACING_MS = 50
+
+
+def cache_path(sha256: str, name: str = ANALYSIS_NAME) -> Optional[str]:
+    """Path of a cached analysis file, or None for anything but a hex digest"""
+    if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+        return None
+    return os.path.join(CACHE_DIR, f'v{ANALYSIS_VERSION}', sha256, name)
+
+
+def peak_pyramid(samples: np.ndarray, bits: int = PEAK_BITS) -> List[np.ndarray]:
+    """
+    Interleaved [min, max, min, max, ...] peaks for every level in PEAK_LEVELS,
+    scaled to signed `bits` integers
+    """
+    dtype = np.int8 if bits == 8 else np.int16
+    shift = 16 - bits
+
+    levels = []
+    mins = maxs = samples.astype(np.int16)
+    previous = 1
+    for samples_per_peak in PEAK_LEVELS:
+        group = samples_per_peak // previous
+        # Pad the last group with its own edge values so it does not pull peaks toward zero
+        count = -(-len(mins) // group)
+        pad = count * group - len(mins)
+        mins = np.pad(mins, (0, pad), mode='edge').reshape(count, group).min(axis=1)
+        maxs = np.pad(maxs, (0, pad), mode='edge').reshape(count, group).max(axis=1)
+
+        level = np.empty(count * 2, dtype=dtype)
+        level[0::2] = mins >> shift
+        level[1::2] = maxs >> shift
+        levels.append(level)
+        previous = samples_per_peak
+    return levels
+
+
+def onset_envelope(samples: np.ndarray) -> np.ndarray:
+    """
+    Spectral flux of the log-magnitude spectrogram, one value per hop. The STFT
+    runs over ONSET_BLOCK_FRAMES frames at a time (carrying the last spectrum
+    over for the flux), so memory does not grow with the length of the audio.
+    """
+    if len(samples) < FFT_SIZE:
+        return np.zeros(0, dtype=np.float32)
+
+    frame_count = (len(samples) - FFT_SIZE) // HOP_SIZE + 1
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    flux = np.zeros(frame_count, dtype=np.float32)
+    previous = None
+    for first in range(0, frame_count, ONSET_BLOCK_FRAMES):
+        last = min(first + ONSET_BLOCK_FRAMES, frame_count)
+        audio = samples[first * HOP_SIZE:(last - 1) * HOP_SIZE + FFT_SIZE].astype(np.float32) / 32768.0
+        frames = np.lib.stride_tricks.sliding_window_view(audio, FFT_SIZE)[::HOP_SIZE]
+        log_spectrum = np.log1p(1000 * np.abs(np.fft.rfft(frames * window, axis=1)))
+
+        # The first frame has no predecessor and keeps a flux of 0
+        rows = log_spectrum if previous is None else np.vstack([previous, log_spectrum])
+        flux[last - len(rows) + 1:last] = np.maximum(np.diff(rows, axis=0), 0).sum(axis=1)
+        previous = log_spectrum[-1:]
+
+    std = flux.std()
+    return (flux - flux.mean()) / std if std > 0 else flux
+
+
+def estimate_tempo(envelope: np.ndarray) -> Optional[float]:
+    """Tempo (BPM) from the autocorrelation of the onset envelope, biased toward PREFERRED_BPM"""
+    frame_rate = SAMPLE_RATE / HOP_SIZE
+    min_lag = int(frame_rate * 60 / MAX_BPM)
+    max_lag = int(frame_rate * 60 / MIN_BPM)
+    if len(envelope) <= max_lag * 2:
+        return None
+
+    spectrum = np.fft.rfft(envelope, n=2 * len(envelope))
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:max_lag + 1]
+    lags = np.arange(min_lag, max_lag + 1)
+    weights = np.exp(-0.5 * (np.log2(frame_rate * 60 / lags / PREFERRED_BPM)) ** 2)
+    best = int(np.argmax(autocorrelation[min_lag:max_lag + 1] * weights)) + min_lag
+
+    # Parabolic interpolation between neighbouring lags; whole-frame lags are too coarse for BPM
+    lag = float(best)
+    if min_lag < best < max_lag:
+        left, centre, right = autocorrelation[best - 1:best + 2]
+        denominator = left - 2 * centre + right
+        if denominator < 0:
+            lag += 0.5 * (left - right) / denominator
+    return float(frame_rate * 60 / lag)
+
+
+def track_beats(envelope: np.ndarray, bpm: float) -> np.ndarray:
+    """
+    Beat frames by dynamic programming (Ellis 2007): each beat maximizes onset
+    strength plus the best previous beat, penalized for straying from the tempo
+    """
+    period = SAMPLE_RATE / HOP_SIZE * 60 / bpm
+    offsets = np.arange(-int(round(2 * period)), -int(round(period / 2)) + 1)
+    penalty = -BEAT_TIGHTNESS * np.log(-offsets / period) ** 2
+
+    scores = envelope.astype(np.float64).copy()
+    backlinks = np.full(len(envelope), -1)
+    for t in range(len(envelope)):
+        candidates = t + offsets
+        valid = candidates >= 0
+        if not valid.any():
+            continue
+        candidate_scores = scores[candidates[valid]] + penalty[valid]
+        best = np.argmax(candidate_scores)
+        if candidate_scores[best] > 0:
+            scores[t] += candidate_scores[best]
+            backlinks[t] = candidates[valid][best]
+
+    # Start from the best-scoring frame within the last beat period
+    tail = max(len(envelope) - int(round(period)), 0)
+    beat = tail + int(np.argmax(scores[tail:]))
+    beats = []
+    while beat >= 0:
+        beats.append(beat)
+        beat = backlinks[beat]
+    return np.array(beats[::-1], dtype=np.int64)
+
+
+def pick_onsets(envelope: np.ndarray) -> np.ndarray:
+    """Local maxima of the onset envelope above one standard deviation"""
+    if len(envelope) < 3:
+        return np.zeros(0, dtype=np.int64)
+
+    middle = envelope[1:-1]
+    peaks = np.flatnonzero((middle > envelope[:-2]) & (middle >= envelope[2:]) & (middle > 1.0)) + 1
+    min_spacing = MIN_ONSET_SPACING_MS / 1000 * SAMPLE_RATE / HOP_SIZE
+    kept = []
+    for frame in peaks:
+        if not kept or frame - kept[-1] >= min_spacing:
+            kept.append(frame)
+    return np.array(kept, dtype=np.int64)
+
+
+def _frames_to_ms(frames: np.ndarray) -> List[int]:
+    # Frame times are the window centres
+    return ((frames * HOP_SIZE + FFT_SIZE // 2) / SAMPLE_RATE * 1000).astype(int).tolist()
+
+
+def analyze_pcm(pcm_path: str, sha256: str) -> Dict:
+    """
+    Compute (or load from cache) peaks and beat grid for a raw 16 kHz mono .pcm
+    file from audio_ingest. Writes peaks.bin and analysis.json to the cache.
+
+    Returns the analysis metadata:
+    {
+        "sha256": "...", "duration": 10.5, "sample_rate": 16000,
+        "peaks": {"bits": 8, "levels": [{"samples_per_peak": 64, "offset": 0, "length": 5250}, ...]},
+        "tempo": 120.2, "beats": [250, 750, ...], "onsets": [240, 510, ...]
+    }
+    """
+    cached = load_analysis(sha256)
+    if cached is not None:
+        return cached
+
+    samples = np.fromfile(pcm_path, dtype=np.int16)
+    envelope = onset_envelope(samples)
+    tempo = estimate_tempo(envelope)
+    beats = track_beats(envelope, tempo) if tempo else np.zeros(0, dtype=np.int64)
+
+    levels = peak_pyramid(samples) if len(samples) else []
+    level_info = []
+    offset = 0
+    for samples_per_peak, level in zip(PEAK_LEVELS, levels):
+        level_info.append({'samples_per_peak': samples_per_peak, 'offset': offset, 'length': len(level) // 2})
+        offset += level.nbytes
+
+    analysis = {
+        'sha256': sha256,
+        'duration': len(samples) / SAMPLE_RATE,
+        'sample_rate': SAMPLE_RATE,
+        'peaks': {'bits': PEAK_BITS, 'levels': level_info},
+        'tempo': round(tempo, 2) if tempo else None,
+        'beats': _frames_to_ms(beats),
+        'onsets': _frames_to_ms(pick_onsets(envelope)),
+    }
+
+    # Write to a temp dir and rename so readers never see a partial entry
+    target = os.path.dirname(cache_path(sha256))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(target))
+    try:
+        with open(os.path.join(staging, PEAKS_NAME), 'wb') as f:
+            for level in levels:
+                f.write(level.tobytes())
+        with open(os.path.join(staging, ANALYSIS_NAME), 'w') as f:
+            json.dump(analysis, f)
+        os.rename(staging, target)
+    except OSError:
+        # Another request cached the same audio first
+        if not os.path.isdir(target):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return analysis
+
+
+def load_analysis(sha256: str) -> Optional[Dict]:
+    path = cache_path(sha256)
+    if not path or not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def analyze_upload(audio: Dict) -> Dict:
+    """
+    Run the analysis for a decoded upload from StreamingAudioDecoder.finish().
+    Returns the response fields pointing at the cached results, or {} if the
+    analysis failed (it never fails the upload itself).
+    """
+    try:
+        analyze_pcm(audio['pcm_path'], audio['sha256'])
+    except Exception as e:
+        print(f'Audio analysis failed: {e}')
+        return {}
+
+    sha256 = audio['sha256']
+    return {
+        'audio_hash': sha256,
+        'analysis_url': f'/api/audio/{sha256}/analysis',
+        'peaks_url': f'/api/audio/{sha256}/peaks',
+    }
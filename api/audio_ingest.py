@@ -0,0 +1,252 @@
+"""
+Streaming Audio Ingest
+Decodes uploads to 16 kHz mono PCM while they are still being received, so
+decoding overlaps with the upload and only the decoded audio is kept for Whisper.
+"""
+
+import hashlib
+import os
+import subprocess
+import tempfile
+from typing import Dict, Optional
+
+import media_tools
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 256 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+# Form fields other than the audio file are small (e.g. "mode") unless a
+# caller raises the limit
+MAX_FIELD_BYTES = 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def find_ffmpeg() -> str:
+    path = media_tools.find_ffmpeg()
+    if not path:
+        raise AudioDecodeError('ffmpeg is not installed')
+    return path
+
+
+def _pcm_command(ffmpeg: str, source: str) -> list:
+    return [
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+        '-i', source,
+        '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-acodec', 'pcm_s16le', 'pipe:1'
+    ]
+
+
+class StreamingAudioDecoder:
+    """
+    Hashes, size-limits and decodes an upload chunk by chunk.
+
+    Bytes are piped straight into ffmpeg, which writes raw 16 kHz mono s16le
+    PCM to a temp file. Containers that cannot be decoded from a pipe (MP4/M4A
+    with the index at the end) are decoded again from a spooled copy of the
+    upload, which is deleted as soon as decoding is done.
+    """
+
+    def __init__(self, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.bytes_received = 0
+        self._sha256 = hashlib.sha256()
+        self._process: Optional[subprocess.Popen] = None
+        self._pipe_failed = False
+        self._spool = None
+        self._stderr = None
+        self._pcm_file = None
+
+    def _start(self):
+        suffix = os.path.splitext(self.filename or '')[1][:10]
+        self._spool = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        self._pcm_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pcm')
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            _pcm_command(find_ffmpeg(), 'pipe:0'),
+            stdin=subprocess.PIPE, stdout=self._pcm_file, stderr=self._stderr
+        )
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        if self._process is None:
+            self._start()
+
+        self.bytes_received += len(chunk)
+        if self.bytes_received > self.max_bytes:
+            self.abort()
+            raise UploadTooLarge(f'Audio file exceeds the {self.max_bytes // (1024 * 1024)} MB limit')
+
+        self._sha256.update(chunk)
+        self._spool.write(chunk)
+
+        if not self._pipe_failed:
+            try:
+                self._process.stdin.write(chunk)
+            except (BrokenPipeError, OSError):
+                # ffmpeg gave up on the pipe (e.g. needs to seek); decode the spool in finish()
+                self._pipe_failed = True
+
+    def finish(self) -> Dict:
+        """
+        Wait for decoding to complete and return
+        {"pcm_path": "...", "sha256": "...", "bytes": 123, "duration": 10.5}
+        """
+        if self._process is None:
+            raise AudioDecodeError('Empty audio file')
+
+        try:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                self._pipe_failed = True
+            returncode = self._process.wait()
+            self._spool.close()
+
+            if returncode != 0 or self._pipe_failed or os.path.getsize(self._pcm_file.name) == 0:
+                self._decode_spool()
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._stderr.close()
+            if os.path.exists(self._spool.name):
+                os.unlink(self._spool.name)
+
+        self._pcm_file.close()
+        pcm_size = os.path.getsize(self._pcm_file.name)
+        return {
+            'pcm_path': self._pcm_file.name,
+            'sha256': self._sha256.hexdigest(),
+            'bytes': self.bytes_received,
+            'duration': pcm_size / 2 / SAMPLE_RATE,
+        }
+
+    def _decode_spool(self):
+        self._pcm_file.seek(0)
+        self._pcm_file.truncate()
+        result = subprocess.run(
+            _pcm_command(find_ffmpeg(), self._spool.name),
+            stdout=self._pcm_file, stderr=subprocess.PIPE
+        )
+        self._pcm_file.flush()
+        if result.returncode != 0 or os.path.getsize(self._pcm_file.name) == 0:
+            message = result.stderr.decode(errors='replace').strip().splitlines()
+            raise AudioDecodeError(f"Could not decode audio: {message[-1] if message else 'unknown format'}")
+
+    def abort(self):
+        """Stop ffmpeg and remove every temp file"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        for handle in (self._spool, self._pcm_file, self._stderr):
+            if handle is None:
+                continue
+            handle.close()
+            name = getattr(handle, 'name', None)
+            if isinstance(name, str) and os.path.exists(name):
+                os.unlink(name)
+
+
+class MultipartAudioReader:
+    """
+    Incremental multipart/form-data parser that forwards the bytes of one file
+    field to a StreamingAudioDecoder and keeps the other (small) fields.
+    A field longer than `max_field_bytes` raises UploadTooLarge.
+    """
+
+    def __init__(self, content_type: str, file_field: str, decoder: StreamingAudioDecoder,
+                 max_field_bytes: int = MAX_FIELD_BYTES):
+        _, params = parse_options_header(content_type or '')
+        boundary = params.get(b'boundary')
+        if not boundary:
+            raise ValueError('Expected multipart/form-data with a boundary')
+
+        self.file_field = file_field
+        self.decoder = decoder
+        self.max_field_bytes = max_field_bytes
+        self.found = False
+        self.filename: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b''
+        self._header_value = b''
+        self._part_name: Optional[str] = None
+        self._part_is_file = False
+        self._part_data = bytearray()
+
+        self._parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def close(self):
+        self._parser.finalize()
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._part_name = None
+        self._part_is_file = False
+        self._part_data = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        self._part_name = options.get(b'name', b'').decode('utf-8', errors='replace')
+        if self._part_name == self.file_field:
+            self._part_is_file = True
+            self.found = True
+            self.filename = options.get(b'filename', b'').decode('utf-8', errors='replace')
+            self.decoder.filename = self.filename
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._part_is_file:
+            self.decoder.write(data[start:end])
+            return
+        if len(self._part_data) + end - start > self.max_field_bytes:
+            # Never truncate: a cut-off field (e.g. lyrics to align) would be silently wrong
+            raise UploadTooLarge(f'Form field {self._part_name!r} exceeds the {self.max_field_bytes // 1024} KB limit')
+        self._part_data += data[start:end]
+
+    def _on_part_end(self):
+        if not self._part_is_file and self._part_name:
+            self.fields[self._part_name] = self._part_data.decode('utf-8', errors='replace')
+
+
+def load_pcm(pcm_path: str):
+    """Load a decoded .pcm file as the float32 waveform Whisper expects"""
+    import numpy as np
+    return np.fromfile(pcm_path, dtype=np.int16).astype(np.float32) / 32768.0
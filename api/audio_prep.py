@@ -0,0 +1,134 @@
+"""
+Audio Preparation
+Gets a project's audio ready for the mux stage once, instead of re-encoding it
+in every render: sources that are already AAC or MP3 (AAC only for HLS) are
+stream-copied as is, anything else is transcoded to AAC once and cached by the SHA-256 of the
+source file. Loudness-normalized versions are cached the same way.
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+from functools import lru_cache
+from typing import Dict, Optional
+
+from media_tools import find_ffmpeg
+
+CACHE_DIR = os.environ.get(
+    "AUDIO_PREP_CACHE",
+    os.path.join(tempfile.gettempdir(), "lyric_audio_prep")
+)
+CACHE_VERSION = 1
+# Codecs the MP4 muxer takes without re-encoding
+COPY_CODECS = ('aac', 'mp3')
+# MP3 in fMP4 HLS segments does not play in Safari
+HLS_COPY_CODECS = ('aac',)
+AAC_BITRATE = '192k'
+# EBU R128 defaults for the `audio_normalize` config key
+DEFAULT_LOUDNESS = -14.0
+TRUE_PEAK = -1.5
+LOUDNESS_RANGE = 11.0
+# Integrated loudness targets loudnorm accepts
+MIN_LOUDNESS = -70.0
+MAX_LOUDNESS = -5.0
+
+_AUDIO_STREAM = re.compile(r'Stream #\d+:\d+[^:]*: Audio: (\w+).*?(\d+) Hz')
+
+
+class AudioPrepError(Exception):
+    pass
+
+
+def probe_audio(path: str) -> Optional[Dict]:
+    """
+    Codec of the first audio stream, read from `ffmpeg -i` (ffprobe is not
+    always installed). Returns {"codec": "aac", "sample_rate": 44100}
+    or None if the file has no audio stream.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise AudioPrepError('ffmpeg is not installed')
+
+    # ffmpeg exits non-zero without an output file; the stream list is still printed
+    result = subprocess.run([ffmpeg, '-nostdin', '-hide_banner', '-i', path], capture_output=True)
+    match = _AUDIO_STREAM.search(result.stderr.decode(errors='replace'))
+    if not match:
+        return None
+    return {'codec': match.group(1), 'sample_rate': int(match.group(2))}
+
+
+@lru_cache(maxsize=256)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    # Keyed by size and mtime too, so a replaced file is hashed again
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    stat = os.stat(path)
+    return _file_sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def loudness_target(option) -> Optional[float]:
+    """`audio_normalize` config value: true for DEFAULT_LOUDNESS, a number for a LUFS target, else off"""
+    if option is True:
+        return DEFAULT_LOUDNESS
+    if isinstance(option, (int, float)) and not isinstance(option, bool):
+        # Requests are validated by render_schema; this covers direct callers
+        if not MIN_LOUDNESS <= option <= MAX_LOUDNESS:
+            raise AudioPrepError(f'audio_normalize must be between {MIN_LOUDNESS:g} and {MAX_LOUDNESS:g} LUFS')
+        return float(option)
+    return None
+
+
+def _transcode(ffmpeg: str, source: str, target: str, loudness: Optional[float]):
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', source, '-vn', '-map', '0:a:0']
+    if loudness is not None:
+        command += ['-af', f'loudnorm=I={loudness}:TP={TRUE_PEAK}:LRA={LOUDNESS_RANGE}']
+    command += ['-c:a', 'aac', '-b:a', AAC_BITRATE, '-movflags', '+faststart', '-f', 'mp4']
+
+    # Encode next to the cache entry and rename, so concurrent renders never see a partial file
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+    os.close(fd)
+    try:
+        result = subprocess.run(command + [partial], capture_output=True)
+        if result.returncode != 0:
+            raise AudioPrepError(f"Audio transcode failed: {result.stderr.decode(errors='replace').strip()}")
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def prepare_audio(audio_path: Optional[str], normalize=None, copy_codecs=COPY_CODECS) -> Optional[Dict]:
+    """
+    Audio for the mux stage. Returns None when there is no local audio file, otherwise
+    {"path": ..., "mode": "copy" | "transcoded" | "cached", "codec": ..., "sha256": ...}.
+    Sources in `copy_codecs` are used as is (pass HLS_COPY_CODECS for HLS output);
+    the returned file can always be muxed with `-c:a copy`.
+    """
+    if not audio_path or not os.path.isfile(audio_path):
+        return None
+
+    probe = probe_audio(audio_path)
+    if probe is None:
+        return None
+
+    loudness = loudness_target(normalize)
+    if loudness is None and probe['codec'] in copy_codecs:
+        return {'path': audio_path, 'mode': 'copy', 'codec': probe['codec'], 'sha256': None}
+
+    sha256 = file_sha256(audio_path)
+    name = sha256 if loudness is None else f'{sha256}_loudnorm{loudness:g}'
+    target = os.path.join(CACHE_DIR, f'v{CACHE_VERSION}', f'{name}.m4a')
+    mode = 'cached'
+    if not os.path.isfile(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _transcode(find_ffmpeg(), audio_path, target, loudness)
+        mode = 'transcoded'
+    return {'path': target, 'mode': mode, 'codec': 'aac', 'sha256': sha256}
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite for the render engine, transcription and API
+
+Generates synthetic background video, audio and lyric sets, runs each case in a
+fresh process and writes machine-readable JSON so results can be compared
+across commits:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from media_tools import find_ffmpeg
+
+# (word count, duration in seconds)
+RENDER_CASES = [(10, 15), (500, 120), (5000, 300)]
+TRANSCRIBE_DURATIONS = [15, 60]
+API_REQUESTS = 200
+NOMINAL_FPS = 30
+SEED_WORDS = ['love', 'night', 'city', 'lights', 'falling', 'again', 'you', 'and', 'me', 'forever']
+
+
+def make_lyrics(word_count: int, duration_s: float) -> List[Dict]:
+    """Evenly spaced, deterministic lyric words covering the whole duration"""
+    slot_ms = duration_s * 1000 / word_count
+    return [
+        {
+            'text': SEED_WORDS[i % len(SEED_WORDS)],
+            'start': int(i * slot_ms),
+            'end': int((i + 1) * slot_ms),
+        }
+        for i in range(word_count)
+    ]
+
+
+def make_background(directory: str, duration_s: float) -> str:
+    """Synthetic 1080x1920 test pattern video (placeholder file when ffmpeg is missing)"""
+    path = os.path.join(directory, f'background_{int(duration_s)}s.mp4')
+    if os.path.exists(path):
+        return path
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg:
+        subprocess.run([
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'testsrc2=size=1080x1920:rate={NOMINAL_FPS}:duration={duration_s}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', path
+        ], check=True)
+    else:
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 1024)
+    return path
+
+
+def make_audio(directory: str, duration_s: float) -> str:
+    """Synthetic tone (placeholder file when ffmpeg is missing)"""
+    path = os.path.join(directory, f'audio_{int(duration_s)}s.mp3')
+    if os.path.exists(path):
+        return path
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg:
+        subprocess.run([
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={duration_s}',
+            '-c:a', 'libmp3lame', '-b:a', '128k', path
+        ], check=True)
+    else:
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 1024)
+    return path
+
+
+class StubSupabase:
+    """Records Supabase calls instead of talking to the network"""
+
+    def __init__(self):
+        self.calls: List[str] = []
+
+    def __getattr__(self, name):
+        return self
+
+    def from_(self, bucket):
+        self.calls.append(f'storage:{bucket}')
+        return self
+
+    def table(self, name):
+        self.calls.append(f'table:{name}')
+        return self
+
+    def rpc(self, name, params=None):
+        self.calls.append(f'rpc:{name}')
+        return self
+
+    def upload(self, path, file, file_options=None):
+        file.read()
+        return {'path': path}
+
+    def get_public_url(self, path):
+        return f'https://stub.supabase.local/storage/v1/object/public/generated-videos/{path}'
+
+    def update(self, values):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[])
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024, 1)
+
+
+def _run_render_case(word_count: int, duration_s: float, asset_dir: str, backend: str = 'auto') -> Dict:
+    import render_engine
+
+    render_engine.supabase_client = StubSupabase()
+    config = {
+        'project_id': 'benchmark',
+        'background_url': make_background(asset_dir, duration_s),
+        'audio_url': make_audio(asset_dir, duration_s),
+        'lyrics': make_lyrics(word_count, duration_s),
+        'render_backend': backend,
+    }
+    output_path = os.path.join(asset_dir, f'render_{word_count}.mp4')
+
+    renderer = render_engine.LyricVideoRenderer(config)
+    start = time.perf_counter()
+    renderer.render(output_path)
+    elapsed = time.perf_counter() - start
+
+    stats = renderer.composite_stats or {}
+    frames = stats.get('frames') or int(duration_s * NOMINAL_FPS)
+    return {
+        'words': word_count,
+        'duration_s': duration_s,
+        'backend': renderer.backend,
+        'frames': frames,
+        'wall_s': round(elapsed, 4),
+        'fps': round(frames / elapsed, 2) if elapsed > 0 else None,
+        'composited_ratio': stats.get('composited_ratio'),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _run_transcribe_case(duration_s: float, asset_dir: str, model_name: str) -> Dict:
+    try:
+        import whisper
+    except ImportError:
+        return {'duration_s': duration_s, 'skipped': 'openai-whisper is not installed'}
+
+    audio_path = make_audio(asset_dir, duration_s)
+    model = whisper.load_model(model_name)
+
+    start = time.perf_counter()
+    model.transcribe(audio_path, word_timestamps=True, verbose=False)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'duration_s': duration_s,
+        'model': model_name,
+        'wall_s': round(elapsed, 4),
+        'real_time_factor': round(elapsed / duration_s, 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _run_api_case(request_count: int, asset_dir: str) -> Dict:
+    from fastapi.testclient import TestClient
+    import render_engine
+    import index_fastapi
+
+    render_engine.supabase_client = StubSupabase()
+
+    # Measure request handling only; render throughput is covered by the render cases
+    async def no_render(job_id: str, project_config: dict):
+        return None
+    index_fastapi.background_render_job = no_render
+
+    client = TestClient(index_fastapi.app)
+    payload = {
+        'background_url': make_background(asset_dir, 15),
+        'audio_url': make_audio(asset_dir, 15),
+        'lyrics': make_lyrics(500, 120),
+    }
+
+    job_ids = []
+    start = time.perf_counter()
+    for _ in range(request_count):
+        response = client.post('/api/render', json=payload)
+        response.raise_for_status()
+        job_ids.append(response.json()['job_id'])
+    render_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for job_id in job_ids:
+        client.get(f'/api/status/{job_id}').raise_for_status()
+    status_elapsed = time.perf_counter() - start
+
+    return {
+        'requests': request_count,
+        'render_lyrics': len(payload['lyrics']),
+        'render_rps': round(request_count / render_elapsed, 1),
+        'status_rps': round(request_count / status_elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_isolated(func, *args) -> Dict:
+    """Run one case in a fresh interpreter so peak RSS is per case"""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        try:
+            return pool.apply(func, args)
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print relative change of every numeric metric shared with the baseline"""
+    print(f"Comparing against {baseline.get('commit') or 'baseline'}")
+    for section, cases in current['results'].items():
+        base_cases = baseline.get('results', {}).get(section, [])
+        for case, base in zip(cases, base_cases):
+            for key, value in case.items():
+                old = base.get(key)
+                if key in ('words', 'duration_s', 'frames', 'requests') or not isinstance(value, (int, float)):
+                    continue
+                if isinstance(old, (int, float)) and old:
+                    label = f"{section}[{case.get('words', case.get('duration_s', ''))}].{key}"
+                    print(f"  {label:40s} {old:>12} -> {value:>12} ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark render, transcription and API throughput')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    parser.add_argument('--only', choices=['render', 'transcribe', 'api'], action='append',
+                        help='Run only the given section (repeatable)')
+    parser.add_argument('--whisper-model', default='base')
+    parser.add_argument('--assets', help='Directory for synthetic assets (default: temp dir)')
+    parser.add_argument('--render-backend', choices=['auto', 'ffmpeg', 'numpy'], default='auto',
+                        help='Pin the render backend for the render cases')
+    args = parser.parse_args()
+
+    sections = args.only or ['render', 'transcribe', 'api']
+    asset_dir = args.assets or tempfile.mkdtemp(prefix='lyric_bench_')
+    os.makedirs(asset_dir, exist_ok=True)
+
+    results: Dict[str, List[Dict]] = {}
+    if 'render' in sections:
+        results['render'] = [run_isolated(_run_render_case, words, duration, asset_dir, args.render_backend)
+                             for words, duration in RENDER_CASES]
+    if 'transcribe' in sections:
+        results['transcribe'] = [run_isolated(_run_transcribe_case, duration, asset_dir, args.whisper_model)
+                                 for duration in TRANSCRIBE_DURATIONS]
+    if 'api' in sections:
+        results['api'] = [run_isolated(_run_api_case, API_REQUESTS, asset_dir)]
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': bool(find_ffmpeg()),
+        'results': results,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    if not args.assets:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
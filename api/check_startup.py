@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Startup regression check for the API servers
+
+Imports each server module in a fresh interpreter and fails when the import
+takes too long, uses too much memory, or pulls in heavy dependencies that
+should only load on first use (whisper, torch, supabase).
+
+    python check_startup.py
+    python check_startup.py --max-seconds 2 --max-rss-mb 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULES = ['index_fastapi', 'index']
+HEAVY_MODULES = ['whisper', 'torch', 'supabase']
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+print(json.dumps({{
+    'import_s': round(elapsed, 3),
+    'peak_rss_mb': round(rss_mb, 1),
+    'heavy_loaded': [m for m in {heavy!r} if m in sys.modules],
+}}))
+'''
+
+
+def probe(module: str) -> dict:
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=api_dir
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check API server startup time and memory')
+    parser.add_argument('--max-seconds', type=float, default=3.0)
+    parser.add_argument('--max-rss-mb', type=float, default=250.0)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        stats = probe(module)
+        print(f'{module}: {json.dumps(stats)}')
+
+        if 'error' in stats:
+            failures.append(f"{module}: {stats['error']}")
+            continue
+        if stats['import_s'] > args.max_seconds:
+            failures.append(f"{module}: import took {stats['import_s']}s (max {args.max_seconds}s)")
+        if stats['peak_rss_mb'] > args.max_rss_mb:
+            failures.append(f"{module}: peak RSS {stats['peak_rss_mb']} MB (max {args.max_rss_mb} MB)")
+        if stats['heavy_loaded']:
+            failures.append(f"{module}: imported at startup: {', '.join(stats['heavy_loaded'])}")
+
+    if failures:
+        print('Startup check failed:')
+        for failure in failures:
+            print(f'  - {failure}')
+        sys.exit(1)
+
+    print('Startup check passed')
+
+
+if __name__ == '__main__':
+    main()
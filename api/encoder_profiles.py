@@ -0,0 +1,56 @@
+"""
+Encoder Profiles
+Named x264 settings the scheduler picks from queue depth and job priority,
+trading quality for throughput when the render queue is busy.
+"""
+
+import os
+from typing import Dict, Optional
+
+ENCODER_PROFILES: Dict[str, Dict] = {
+    'draft': {'codec': 'libx264', 'preset': 'ultrafast', 'crf': 30, 'fps': 24, 'threads': 2},
+    'standard': {'codec': 'libx264', 'preset': 'veryfast', 'crf': 23, 'fps': 30, 'threads': 4},
+    'high': {'codec': 'libx264', 'preset': 'medium', 'crf': 18, 'fps': 30, 'threads': 0},  # 0 = all cores
+}
+PROFILE_ORDER = ['draft', 'standard', 'high']
+DEFAULT_PROFILE = 'standard'
+
+# Queue depths (jobs pending or processing, excluding the job being scheduled)
+# at or below which `high` is used, and above which `draft` is used
+HIGH_QUALITY_MAX_DEPTH = int(os.environ.get("ENCODER_HIGH_MAX_QUEUE_DEPTH", "2"))
+DRAFT_MIN_DEPTH = int(os.environ.get("ENCODER_DRAFT_MIN_QUEUE_DEPTH", "20"))
+
+# Priorities shift the load-based choice up or down one step
+PRIORITY_SHIFT = {'low': -1, 'normal': 0, 'high': 1}
+
+
+def select_encoder_profile(queue_depth: int, priority: Optional[str] = None,
+                           pinned: Optional[str] = None) -> Dict:
+    """
+    Choose an encoder profile for a job.
+
+    Returns {"name": "standard", "settings": {...}, "reason": "...", "queue_depth": 5}
+    """
+    if pinned:
+        if pinned not in ENCODER_PROFILES:
+            raise ValueError(f'Unknown encoder profile: {pinned}')
+        name, reason = pinned, 'pinned by request'
+    else:
+        if queue_depth <= HIGH_QUALITY_MAX_DEPTH:
+            level = PROFILE_ORDER.index('high')
+        elif queue_depth > DRAFT_MIN_DEPTH:
+            level = PROFILE_ORDER.index('draft')
+        else:
+            level = PROFILE_ORDER.index(DEFAULT_PROFILE)
+
+        shift = PRIORITY_SHIFT.get(priority or 'normal', 0)
+        level = min(max(level + shift, 0), len(PROFILE_ORDER) - 1)
+        name = PROFILE_ORDER[level]
+        reason = f'queue depth {queue_depth}, priority {priority or "normal"}'
+
+    return {
+        'name': name,
+        'settings': dict(ENCODER_PROFILES[name]),
+        'reason': reason,
+        'queue_depth': queue_depth,
+    }
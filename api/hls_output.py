@@ -0,0 +1,146 @@
+"""
+Progressive HLS Output
+Encodes composited frames into fragmented-MP4 HLS segments as they are
+produced, so playback can start while the render is still running, and
+remuxes the segments into a regular MP4 at the end.
+"""
+
+import os
+import subprocess
+import tempfile
+from typing import Dict, Optional
+
+import numpy as np
+
+from media_tools import find_ffmpeg
+
+SEGMENT_SECONDS = 2
+PLAYLIST_NAME = 'index.m3u8'
+INIT_SEGMENT_NAME = 'init.mp4'
+# Files the stream endpoint is allowed to serve from a job's HLS directory
+SERVABLE_EXTENSIONS = {'.m3u8': 'application/vnd.apple.mpegurl', '.mp4': 'video/mp4', '.m4s': 'video/iso.segment'}
+
+
+class EncodeError(Exception):
+    pass
+
+
+class HLSEncoder:
+    """
+    Pipes raw RGB frames into ffmpeg, which writes an EVENT playlist plus
+    fMP4 segments. The playlist grows as segments are finished and gets
+    #EXT-X-ENDLIST when the encode completes.
+    """
+
+    def __init__(self, output_dir: str, width: int, height: int, fps: int,
+                 encoder_settings: Dict, audio_path: Optional[str] = None, audio_copy: bool = False):
+        self.output_dir = output_dir
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.encoder_settings = encoder_settings
+        self.audio_path = audio_path if audio_path and os.path.exists(audio_path) else None
+        # True when the audio was already prepared for muxing (see audio_prep.py)
+        self.audio_copy = audio_copy
+        self.playlist_path = os.path.join(output_dir, PLAYLIST_NAME)
+        self.frames_written = 0
+
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr = None
+
+    def _command(self, ffmpeg: str) -> list:
+        settings = self.encoder_settings
+        command = [
+            ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}', '-r', str(self.fps), '-i', 'pipe:0',
+        ]
+        if self.audio_path:
+            command += ['-i', self.audio_path, '-map', '0:v', '-map', '1:a:0']
+            command += ['-c:a', 'copy'] if self.audio_copy else ['-c:a', 'aac', '-b:a', '192k']
+            command += ['-shortest']
+
+        command += [
+            '-c:v', settings.get('codec', 'libx264'),
+            '-preset', settings.get('preset', 'veryfast'),
+            '-crf', str(settings.get('crf', 23)),
+            '-threads', str(settings.get('threads', 0)),
+            '-pix_fmt', 'yuv420p',
+            # Keyframe at every segment boundary so segments are independently playable
+            '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+            '-f', 'hls',
+            '-hls_time', str(SEGMENT_SECONDS),
+            '-hls_playlist_type', 'event',
+            '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', INIT_SEGMENT_NAME,
+            '-hls_segment_filename', os.path.join(self.output_dir, 'segment_%05d.m4s'),
+            self.playlist_path,
+        ]
+        return command
+
+    def start(self):
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            raise EncodeError('ffmpeg is not installed')
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(self._command(ffmpeg), stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def write_frame(self, frame: np.ndarray):
+        if self._process is None:
+            self.start()
+        try:
+            self._process.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError):
+            self._raise_ffmpeg_error('ffmpeg stopped accepting frames')
+        self.frames_written += 1
+
+    def finish(self, mp4_path: str) -> str:
+        """Close the stream, wait for the last segment and remux everything into `mp4_path`"""
+        if self._process is None:
+            raise EncodeError('No frames were encoded')
+
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            self._raise_ffmpeg_error('HLS encode failed')
+        self._stderr.close()
+
+        result = subprocess.run([
+            find_ffmpeg(), '-nostdin', '-loglevel', 'error', '-y',
+            '-i', self.playlist_path, '-c', 'copy', '-movflags', '+faststart', mp4_path
+        ], capture_output=True)
+        if result.returncode != 0:
+            raise EncodeError(f"MP4 remux failed: {result.stderr.decode(errors='replace').strip()}")
+        return mp4_path
+
+    def abort(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._stderr is not None:
+            self._stderr.close()
+
+    def _raise_ffmpeg_error(self, message: str):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._stderr.seek(0)
+        details = self._stderr.read().decode(errors='replace').strip().splitlines()
+        self._stderr.close()
+        raise EncodeError(f"{message}: {details[-1] if details else 'unknown error'}")
+
+
+def resolve_stream_file(hls_dir: str, filename: str) -> Optional[Dict]:
+    """
+    Map a requested file name to a path inside a job's HLS directory.
+    Returns {"path": ..., "media_type": ...} or None if it is not servable.
+    """
+    if os.path.basename(filename) != filename:
+        return None
+
+    media_type = SERVABLE_EXTENSIONS.get(os.path.splitext(filename)[1])
+    path = os.path.join(hls_dir, filename)
+    if not media_type or not os.path.isfile(path):
+        return None
+    return {'path': path, 'media_type': media_type}
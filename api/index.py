@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import subprocess
 import json
@@ -8,10 +8,24 @@ import uuid
 import threading
 from datetime import datetime
 from enum import Enum
-import whisper
+from typing import Optional
 
 # Import render engine
 from render_engine import render_video_from_config
+from profiling import profiler_from_config
+from encoder_profiles import select_encoder_profile
+from hls_output import PLAYLIST_NAME, resolve_stream_file
+from preview_assets import preview_urls, resolve_preview_file
+from render_schema import error_summary, validate_render_request
+from render_queue import get_render_queue
+from lyric_timeline import MSGPACK_MEDIA_TYPE, accepts_msgpack, encode_msgpack_response
+from transcription import transcribe_audio
+from alignment import MAX_LYRICS_BYTES, AlignmentError, align_lyrics
+from audio_analysis import analyze_upload, cache_path, ANALYSIS_NAME, PEAKS_NAME
+from audio_ingest import (
+    AudioDecodeError, MultipartAudioReader, StreamingAudioDecoder, UploadTooLarge, CHUNK_SIZE, MAX_UPLOAD_BYTES
+)
+from transcribe_worker import get_transcription_queue, job_status_response
 
 app = Flask(__name__)
 CORS(app)
@@ -30,9 +44,29 @@ jobs = {}
 renders_dir = os.path.join(os.path.dirname(__file__), "..", "public", "renders")
 os.makedirs(renders_dir, exist_ok=True)
 
+def active_job_count(exclude: Optional[str] = None) -> int:
+    """Number of render jobs queued or in progress"""
+    return sum(
+        1 for other_id, job in list(jobs.items())
+        if other_id != exclude and job['status'] in (JobStatus.PENDING, JobStatus.PROCESSING)
+    )
+
+def get_job(job_id: str) -> Optional[dict]:
+    """In-process render job, or one handed to the render workers (RENDER_QUEUE)"""
+    job = jobs.get(job_id)
+    render_queue = get_render_queue()
+    if job is None and render_queue is not None:
+        job = render_queue.get(job_id)
+        if job is not None:
+            job['status'] = JobStatus(job['status'])
+    return job
+
 def background_render_job(job_id: str, project_config: dict):
     """Background function to handle video rendering"""
+    profiler = None
     try:
+        # Inside the try so a bad `profile` option fails the job instead of leaving it PENDING
+        profiler = profiler_from_config(project_config)
         jobs[job_id]['status'] = JobStatus.PROCESSING
         jobs[job_id]['progress'] = 0
         jobs[job_id]['message'] = 'Starting render...'
@@ -45,13 +79,29 @@ def background_render_job(job_id: str, project_config: dict):
         
         # Import here to avoid circular import
         from render_engine import LyricVideoRenderer
-        renderer = LyricVideoRenderer(project_config)
+        # Pick encoder settings from the current load unless the request pinned a profile
+        encoder_profile = select_encoder_profile(
+            active_job_count(exclude=job_id),
+            priority=project_config.get('priority'),
+            pinned=project_config.get('encoder_profile')
+        )
+        jobs[job_id]['encoder_profile'] = encoder_profile
+        
+        with profiler.span('load'):
+            renderer = LyricVideoRenderer(project_config, profiler=profiler, encoder_profile=encoder_profile)
         
         jobs[job_id]['message'] = 'Processing video...'
         jobs[job_id]['progress'] = 30
         
+        # Progressive output: segments become playable from /api/stream while rendering
+        hls_dir = None
+        if project_config.get('output_mode') == 'hls':
+            hls_dir = os.path.join(renders_dir, f"{job_id}_hls")
+            jobs[job_id]['hls_dir'] = hls_dir
+        
         # Render the video
-        rendered_path = renderer.render(output_path)
+        with profiler.span('render'):
+            rendered_path = renderer.render(output_path, hls_dir=hls_dir)
         
         jobs[job_id]['progress'] = 90
         jobs[job_id]['message'] = 'Finalizing...'
@@ -60,14 +110,16 @@ def background_render_job(job_id: str, project_config: dict):
         jobs[job_id]['status'] = JobStatus.COMPLETED
         jobs[job_id]['progress'] = 100
         jobs[job_id]['output_path'] = rendered_path
+        jobs[job_id]['composite_stats'] = renderer.composite_stats
+        jobs[job_id]['encode_fps'] = renderer.encode_fps
+        jobs[job_id]['previews'] = renderer.previews
         jobs[job_id]['message'] = 'Render complete!'
         jobs[job_id]['completed_at'] = datetime.now().isoformat()
         
         # Calculate metadata
-        if project_config.get('lyrics'):
-            last_lyric = project_config['lyrics'][-1]
-            jobs[job_id]['duration'] = last_lyric.get('end', 0) / 1000
-            jobs[job_id]['lyrics_count'] = len(project_config['lyrics'])
+        if len(renderer.timeline):
+            jobs[job_id]['duration'] = int(renderer.timeline.ends[-1]) / 1000
+            jobs[job_id]['lyrics_count'] = len(renderer.timeline)
         
     except Exception as e:
         jobs[job_id]['status'] = JobStatus.FAILED
@@ -75,6 +127,18 @@ def background_render_job(job_id: str, project_config: dict):
         jobs[job_id]['message'] = f'Render failed: {str(e)}'
         jobs[job_id]['error'] = str(e)
         jobs[job_id]['completed_at'] = datetime.now().isoformat()
+    finally:
+        if profiler is not None and profiler.enabled:
+            jobs[job_id]['trace'] = profiler.to_chrome_trace()
+
+def lyrics_response(payload: dict):
+    """JSON by default; MessagePack with columnar lyrics if the client accepts it"""
+    if accepts_msgpack(request.headers.get('Accept')):
+        response = Response(encode_msgpack_response(payload), mimetype=MSGPACK_MEDIA_TYPE)
+    else:
+        response = jsonify(payload)
+    response.headers['Vary'] = 'Accept'
+    return response
 
 def extract_pinterest_media(url):
     """Extract media URLs from Pinterest using pinterest-dl command"""
@@ -155,40 +219,25 @@ def handle_video_render():
         "job_id": "uuid-string",
         "status": "PENDING"
     }
+    
+    Invalid requests get a 400 listing every problem:
+    {"error": "2 validation errors: ...", "errors": ["...", "..."]}
     """
     try:
-        project_config = request.get_json()
+        project_config, errors = validate_render_request(request.get_data(), request.content_type)
+        if errors:
+            return jsonify({'error': error_summary(errors), 'errors': errors}), 400
         
-        # Validate required fields
-        required_fields = ['background_url', 'audio_url', 'lyrics']
-        for field in required_fields:
-            if field not in project_config:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Validate file paths exist
-        if not os.path.exists(project_config['background_url']):
-            return jsonify({'error': f'Background file not found: {project_config["background_url"]}'}), 400
-        
-        if not os.path.exists(project_config['audio_url']):
-            return jsonify({'error': f'Audio file not found: {project_config["audio_url"]}'}), 400
-        
-        # Validate lyrics array
-        lyrics = project_config['lyrics']
-        if not isinstance(lyrics, list) or len(lyrics) == 0:
-            return jsonify({'error': 'Lyrics must be a non-empty array'}), 400
-        
-        # Validate each lyric entry
-        for i, lyric in enumerate(lyrics):
-            if not isinstance(lyric, dict):
-                return jsonify({'error': f'Lyric at index {i} must be an object'}), 400
-            if 'text' not in lyric:
-                return jsonify({'error': f'Lyric at index {i} missing "text" field'}), 400
-            if 'start' not in lyric:
-                return jsonify({'error': f'Lyric at index {i} missing "start" field'}), 400
-            if 'end' not in lyric:
-                return jsonify({'error': f'Lyric at index {i} missing "end" field'}), 400
-            if lyric['end'] <= lyric['start']:
-                return jsonify({'error': f'Lyric at index {i} has invalid timing (end must be > start)'}), 400
+        # Hand the job to the render workers when a shared queue is configured
+        render_queue = get_render_queue()
+        if render_queue is not None:
+            job_id = render_queue.enqueue(project_config)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': JobStatus.PENDING.value,
+                'message': 'Render job queued'
+            })
         
         # Generate job ID
         job_id = str(uuid.uuid4())
@@ -235,16 +284,20 @@ def get_job_status(job_id):
         "status": "PROCESSING|COMPLETED|FAILED",
         "progress": 45,
         "message": "Processing video...",
+        "encoder_profile": "standard", // Once processing starts
+        "stream_url": "/api/stream/uuid-string/index.m3u8", // output_mode "hls" only, playable while processing
         "output_path": "/path/to/output.mp4", // Only when completed
         "duration": 12.5, // Only when completed
-        "lyrics_count": 10 // Only when completed
+        "lyrics_count": 10, // Only when completed
+        "composite_stats": {"frames": 900, "skipped_frames": 600, "composited_pixels": ..., "total_pixels": ...}, // Only when completed
+        "encode_fps": 240.5, // Only when completed
+        "previews": {"poster_url": "...", "sprite_url": "...", "vtt_url": "...", "interval": 2.0, "thumbnail_size": [135, 240]} // Only when completed
     }
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id]
-    
     response = {
         'success': True,
         'job_id': job_id,
@@ -254,6 +307,12 @@ def get_job_status(job_id):
         'created_at': job['created_at']
     }
     
+    if job.get('encoder_profile'):
+        response['encoder_profile'] = job['encoder_profile']['name']
+    
+    if job.get('hls_dir'):
+        response['stream_url'] = f'/api/stream/{job_id}/{PLAYLIST_NAME}'
+    
     # Add completion data if job is finished
     if job['status'] in [JobStatus.COMPLETED, JobStatus.FAILED]:
         response['completed_at'] = job.get('completed_at')
@@ -262,6 +321,10 @@ def get_job_status(job_id):
             response['output_path'] = job.get('output_path')
             response['duration'] = job.get('duration')
             response['lyrics_count'] = job.get('lyrics_count')
+            response['composite_stats'] = job.get('composite_stats')
+            response['encode_fps'] = job.get('encode_fps')
+            if job.get('previews'):
+                response['previews'] = preview_urls(job['previews'], f'/api/previews/{job_id}')
         elif job['status'] == JobStatus.FAILED:
             response['error'] = job.get('error')
     
@@ -272,11 +335,10 @@ def download_video(job_id):
     """
     Download the rendered video file
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id]
-    
     if job['status'] != JobStatus.COMPLETED:
         return jsonify({'error': 'Video not ready yet'}), 400
     
@@ -287,6 +349,65 @@ def download_video(job_id):
     from flask import send_file
     return send_file(output_path, as_attachment=True, download_name=f'lyric_video_{job_id}.mp4')
 
+@app.route('/api/stream/<job_id>/<filename>', methods=['GET'])
+def stream_render_output(job_id, filename):
+    """
+    Serve the live HLS playlist and fMP4 segments of a render started with
+    "output_mode": "hls". The playlist grows while the job is processing.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    hls_dir = job.get('hls_dir')
+    stream_file = resolve_stream_file(hls_dir, filename) if hls_dir else None
+    if not stream_file:
+        return jsonify({'error': 'Stream file not found'}), 404
+    
+    from flask import send_file
+    response = send_file(stream_file['path'], mimetype=stream_file['media_type'])
+    if filename == PLAYLIST_NAME:
+        # The playlist changes until the render completes
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/previews/<job_id>/<filename>', methods=['GET'])
+def download_preview_asset(job_id, filename):
+    """
+    Serve the poster, scrub sprite and sprite.vtt generated during a render
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    previews = job.get('previews')
+    preview_file = resolve_preview_file(previews, filename) if previews else None
+    if not preview_file:
+        return jsonify({'error': 'Preview file not found'}), 404
+    
+    from flask import send_file
+    return send_file(preview_file['path'], mimetype=preview_file['media_type'])
+
+@app.route('/api/jobs/<job_id>/trace', methods=['GET'])
+def download_job_trace(job_id):
+    """
+    Download the profiling trace of a render job as Chrome trace JSON
+    
+    Only available for jobs started with "profile": true in the request
+    or while the RENDER_PROFILE environment variable is set.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    trace = job.get('trace')
+    if not trace:
+        return jsonify({'error': 'No trace recorded for this job'}), 404
+    
+    response = jsonify(trace)
+    response.headers['Content-Disposition'] = f'attachment; filename="render_trace_{job_id}.json"'
+    return response
+
 
 @app.route('/api/transcribe', methods=['POST'])
 def handle_transcription():
@@ -295,6 +416,14 @@ def handle_transcription():
     
     Expected: multipart/form-data with 'audio' file field
     
+    The upload is decoded to 16 kHz mono PCM while it streams in; uploads over
+    MAX_UPLOAD_MB are rejected with 413 as soon as the limit is crossed.
+    
+    With ?mode=async (or a "mode" form field; the query string wins when both
+    are set) the file is queued for the transcription workers and the response is
+    {"success": true, "job_id": "...", "status": "PENDING"};
+    poll GET /api/transcribe/<job_id> for the result.
+    
     Returns:
     {
         "success": true,
@@ -303,76 +432,219 @@ def handle_transcription():
             {"text": "world", "start": 800, "end": 1600}
         ],
         "duration": 10.5,
-        "language": "en"
+        "language": "en",
+        "audio_hash": "sha256 hex", // Waveform peaks and beat grid, see /api/audio/<audio_hash>/analysis
+        "analysis_url": "/api/audio/<audio_hash>/analysis",
+        "peaks_url": "/api/audio/<audio_hash>/peaks"
     }
     """
     try:
-        # Check if audio file is present
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        audio_file = request.files['audio']
-        
-        if audio_file.filename == '':
-            return jsonify({'error': 'Empty filename'}), 400
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_audio:
-            audio_file.save(temp_audio.name)
-            temp_audio_path = temp_audio.name
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({'error': 'Audio file too large'}), 413
         
+        # Decode the upload while it streams in (request.files would buffer it all first)
+        decoder = StreamingAudioDecoder()
         try:
-            # Load Whisper model (base model for balance of speed and accuracy)
-            # You can use 'tiny', 'base', 'small', 'medium', 'large' based on needs
-            print('Loading Whisper model...')
-            model = whisper.load_model("base")
+            reader = MultipartAudioReader(request.content_type, 'audio', decoder)
+            while True:
+                chunk = request.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                reader.feed(chunk)
+            reader.close()
             
-            # Transcribe with word-level timestamps
-            print(f'Transcribing audio file: {temp_audio_path}')
-            result = model.transcribe(
-                temp_audio_path,
-                word_timestamps=True,
-                verbose=False
-            )
+            # Check if audio file is present
+            if not reader.found:
+                decoder.abort()
+                return jsonify({'error': 'No audio file provided'}), 400
             
-            # Extract word-level timestamps
-            lyrics = []
-            
-            for segment in result.get('segments', []):
-                for word_info in segment.get('words', []):
-                    lyrics.append({
-                        'text': word_info['word'].strip(),
-                        'start': int(word_info['start'] * 1000),  # Convert to milliseconds
-                        'end': int(word_info['end'] * 1000)       # Convert to milliseconds
-                    })
-            
-            # Clean up temporary file
-            os.unlink(temp_audio_path)
-            
-            if len(lyrics) == 0:
-                return jsonify({
-                    'error': 'No words detected in audio. Please ensure the audio contains speech.'
-                }), 400
+            if reader.filename == '':
+                decoder.abort()
+                return jsonify({'error': 'Empty filename'}), 400
             
+            audio = decoder.finish()
+        except UploadTooLarge as e:
+            decoder.abort()
+            return jsonify({'error': str(e)}), 413
+        except (ValueError, AudioDecodeError) as e:
+            decoder.abort()
+            return jsonify({'error': str(e)}), 400
+        except Exception:
+            decoder.abort()
+            raise
+        
+        pcm_path = audio['pcm_path']
+        # Waveform peaks and beat grid for the timeline editor, cached by content hash
+        analysis = analyze_upload(audio)
+        # Same order as the FastAPI server: ?mode= first, then the form field
+        mode = request.args.get('mode') or reader.fields.get('mode') or 'sync'
+        if mode == 'async':
+            # The worker deletes the file once it is done with it
+            job_id = get_transcription_queue().enqueue(pcm_path)
             return jsonify({
                 'success': True,
-                'lyrics': lyrics,
-                'duration': result.get('segments', [{}])[-1].get('end', 0) if result.get('segments') else 0,
-                'language': result.get('language', 'unknown'),
-                'text': result.get('text', '')
+                'job_id': job_id,
+                'status': JobStatus.PENDING.value,
+                'message': 'Transcription job queued',
+                **analysis
             })
-            
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(temp_audio_path):
-                os.unlink(temp_audio_path)
-            raise e
+        
+        try:
+            result = transcribe_audio(pcm_path)
+        finally:
+            # Clean up temporary file
+            os.unlink(pcm_path)
+        
+        if len(result['lyrics']) == 0:
+            return jsonify({
+                'error': 'No words detected in audio. Please ensure the audio contains speech.'
+            }), 400
+        
+        return lyrics_response({
+            'success': True,
+            **result,
+            **analysis
+        })
             
     except Exception as e:
         print(f'Transcription error: {str(e)}')
         return jsonify({'error': f'Transcription failed: {str(e)}'}), 500
 
 
+@app.route('/api/align', methods=['POST'])
+def handle_alignment():
+    """
+    Align lyrics the user already has to the audio (forced alignment) and
+    return word-level timestamps. Much faster than /api/transcribe because
+    the text is fixed instead of being decoded by Whisper.
+    
+    Expected: multipart/form-data with an 'audio' file field and a 'lyrics'
+    text field (words separated by whitespace, at most 64 KB; longer lyrics get 413)
+    
+    Returns:
+    {
+        "success": true,
+        "lyrics": [
+            {"text": "Hello", "start": 0, "end": 800},
+            {"text": "world", "start": 800, "end": 1600}
+        ],
+        "duration": 10.5,
+        "text": "Hello world"
+    }
+    """
+    try:
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES + MAX_LYRICS_BYTES:
+            return jsonify({'error': 'Audio file too large'}), 413
+        
+        # Decode the upload while it streams in (request.files would buffer it all first)
+        decoder = StreamingAudioDecoder()
+        try:
+            reader = MultipartAudioReader(request.content_type, 'audio', decoder, max_field_bytes=MAX_LYRICS_BYTES)
+            while True:
+                chunk = request.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                reader.feed(chunk)
+            reader.close()
+            
+            if not reader.found:
+                decoder.abort()
+                return jsonify({'error': 'No audio file provided'}), 400
+            
+            if not reader.fields.get('lyrics', '').strip():
+                decoder.abort()
+                return jsonify({'error': 'No lyrics provided'}), 400
+            
+            audio = decoder.finish()
+        except UploadTooLarge as e:
+            decoder.abort()
+            return jsonify({'error': str(e)}), 413
+        except (ValueError, AudioDecodeError) as e:
+            decoder.abort()
+            return jsonify({'error': str(e)}), 400
+        except Exception:
+            decoder.abort()
+            raise
+        
+        analysis = analyze_upload(audio)
+        
+        try:
+            result = align_lyrics(audio['pcm_path'], reader.fields['lyrics'])
+        except AlignmentError as e:
+            return jsonify({'error': str(e)}), 400
+        finally:
+            # Clean up temporary file
+            os.unlink(audio['pcm_path'])
+        
+        return lyrics_response({
+            'success': True,
+            **result,
+            **analysis
+        })
+            
+    except Exception as e:
+        print(f'Alignment error: {str(e)}')
+        return jsonify({'error': f'Alignment failed: {str(e)}'}), 500
+
+
+@app.route('/api/transcribe/<job_id>', methods=['GET'])
+def get_transcription_status(job_id):
+    """
+    Get the status of an async transcription job
+    
+    Returns the same fields as /api/status/<job_id>; once COMPLETED the
+    response also carries "lyrics", "duration", "language" and "text".
+    """
+    job = get_transcription_queue(start_workers=False).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return lyrics_response(job_status_response(job))
+
+
+@app.route('/api/audio/<audio_hash>/analysis', methods=['GET'])
+def get_audio_analysis(audio_hash):
+    """
+    Waveform peak levels and beat grid of an uploaded audio file, keyed by the
+    SHA-256 of the upload (returned by /api/transcribe and /api/align)
+    
+    Returns:
+    {
+        "sha256": "...", "duration": 10.5, "sample_rate": 16000,
+        "peaks": {"bits": 8, "levels": [{"samples_per_peak": 64, "offset": 0, "length": 2625}, ...]},
+        "tempo": 120.0, "beats": [250, 750, ...], "onsets": [240, 510, ...]
+    }
+    
+    Each level is `length` interleaved min/max pairs of signed `bits`-bit
+    integers starting at byte `offset` of /api/audio/<audio_hash>/peaks.
+    """
+    path = cache_path(audio_hash, ANALYSIS_NAME)
+    if not path or not os.path.isfile(path):
+        return jsonify({'error': 'Audio analysis not found'}), 404
+    
+    from flask import send_file
+    response = send_file(path, mimetype='application/json')
+    # Content-addressed, so it never changes
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/api/audio/<audio_hash>/peaks', methods=['GET'])
+def get_audio_peaks(audio_hash):
+    """
+    Binary waveform peaks for all zoom levels. Supports Range requests, so a
+    client can fetch a single level using the offsets from /analysis.
+    """
+    path = cache_path(audio_hash, PEAKS_NAME)
+    if not path or not os.path.isfile(path):
+        return jsonify({'error': 'Audio analysis not found'}), 404
+    
+    from flask import send_file
+    response = send_file(path, mimetype='application/octet-stream', conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 # For local development
 if __name__ == '__main__':
     app.run(port=8000, debug=True)
\ No newline at end of file
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 import subprocess
 import json
 import tempfile
@@ -10,11 +10,23 @@ import asyncio
 from datetime import datetime
 from enum import Enum
 from typing import Optional, Dict, Any
-import whisper
-import shutil
 
 # Import render engine
 from render_engine import render_video_from_config, LyricVideoRenderer
+from profiling import profiler_from_config
+from encoder_profiles import select_encoder_profile
+from hls_output import PLAYLIST_NAME, resolve_stream_file
+from preview_assets import preview_urls, resolve_preview_file
+from render_schema import error_summary, validate_render_request
+from render_queue import get_render_queue
+from lyric_timeline import MSGPACK_MEDIA_TYPE, accepts_msgpack, encode_msgpack_response
+from transcription import transcribe_audio
+from alignment import MAX_LYRICS_BYTES, AlignmentError, align_lyrics
+from audio_analysis import analyze_upload, cache_path, ANALYSIS_NAME, PEAKS_NAME
+from audio_ingest import (
+    AudioDecodeError, MultipartAudioReader, StreamingAudioDecoder, UploadTooLarge, MAX_UPLOAD_BYTES
+)
+from transcribe_worker import get_transcription_queue, job_status_response
 
 app = FastAPI(title="Lyric Video Render API", version="1.0.0")
 
@@ -41,9 +53,29 @@ jobs: Dict[str, Dict[str, Any]] = {}
 renders_dir = os.path.join(os.path.dirname(__file__), "..", "public", "renders")
 os.makedirs(renders_dir, exist_ok=True)
 
+def active_job_count(exclude: Optional[str] = None) -> int:
+    """Number of render jobs queued or in progress"""
+    return sum(
+        1 for other_id, job in list(jobs.items())
+        if other_id != exclude and job['status'] in (JobStatus.PENDING, JobStatus.PROCESSING)
+    )
+
+def get_job(job_id: str) -> Optional[dict]:
+    """In-process render job, or one handed to the render workers (RENDER_QUEUE)"""
+    job = jobs.get(job_id)
+    render_queue = get_render_queue()
+    if job is None and render_queue is not None:
+        job = render_queue.get(job_id)
+        if job is not None:
+            job['status'] = JobStatus(job['status'])
+    return job
+
 async def background_render_job(job_id: str, project_config: dict):
     """Background function to handle video rendering"""
+    profiler = None
     try:
+        # Inside the try so a bad `profile` option fails the job instead of leaving it PENDING
+        profiler = profiler_from_config(project_config)
         jobs[job_id]['status'] = JobStatus.PROCESSING
         jobs[job_id]['progress'] = 0
         jobs[job_id]['message'] = 'Starting render...'
@@ -56,13 +88,30 @@ async def background_render_job(job_id: str, project_config: dict):
         
         # Import here to avoid circular import
         from render_engine import LyricVideoRenderer
-        renderer = LyricVideoRenderer(project_config)
+        # Pick encoder settings from the current load unless the request pinned a profile
+        encoder_profile = select_encoder_profile(
+            active_job_count(exclude=job_id),
+            priority=project_config.get('priority'),
+            pinned=project_config.get('encoder_profile')
+        )
+        jobs[job_id]['encoder_profile'] = encoder_profile
+        
+        with profiler.span('load'):
+            renderer = LyricVideoRenderer(project_config, profiler=profiler, encoder_profile=encoder_profile)
         
         jobs[job_id]['message'] = 'Processing video...'
         jobs[job_id]['progress'] = 30
         
-        # Render the video (this is CPU-intensive)
-        rendered_path = renderer.render(output_path)
+        # Progressive output: segments become playable from /api/stream while rendering
+        hls_dir = None
+        if project_config.get('output_mode') == 'hls':
+            hls_dir = os.path.join(renders_dir, f"{job_id}_hls")
+            jobs[job_id]['hls_dir'] = hls_dir
+        
+        # Render the video (this is CPU-intensive) off the event loop so status
+        # and stream requests are served while it renders
+        with profiler.span('render'):
+            rendered_path = await asyncio.to_thread(renderer.render, output_path, hls_dir=hls_dir)
         
         # Check if video_url was added to config during render (by upload_video_to_supabase)
         video_url = project_config.get('video_url')
@@ -74,15 +123,17 @@ async def background_render_job(job_id: str, project_config: dict):
         jobs[job_id]['status'] = JobStatus.COMPLETED
         jobs[job_id]['progress'] = 100
         jobs[job_id]['output_path'] = rendered_path
+        jobs[job_id]['composite_stats'] = renderer.composite_stats
+        jobs[job_id]['encode_fps'] = renderer.encode_fps
+        jobs[job_id]['previews'] = renderer.previews
         jobs[job_id]['video_url'] = video_url
         jobs[job_id]['message'] = 'Render complete!'
         jobs[job_id]['completed_at'] = datetime.now().isoformat()
         
         # Calculate metadata
-        if project_config.get('lyrics'):
-            last_lyric = project_config['lyrics'][-1]
-            jobs[job_id]['duration'] = last_lyric.get('end', 0) / 1000
-            jobs[job_id]['lyrics_count'] = len(project_config['lyrics'])
+        if len(renderer.timeline):
+            jobs[job_id]['duration'] = int(renderer.timeline.ends[-1]) / 1000
+            jobs[job_id]['lyrics_count'] = len(renderer.timeline)
         
     except Exception as e:
         jobs[job_id]['status'] = JobStatus.FAILED
@@ -90,6 +141,15 @@ async def background_render_job(job_id: str, project_config: dict):
         jobs[job_id]['message'] = f'Render failed: {str(e)}'
         jobs[job_id]['error'] = str(e)
         jobs[job_id]['completed_at'] = datetime.now().isoformat()
+    finally:
+        if profiler is not None and profiler.enabled:
+            jobs[job_id]['trace'] = profiler.to_chrome_trace()
+
+def lyrics_response(request: Request, payload: Dict):
+    """JSON by default; MessagePack with columnar lyrics if the client accepts it"""
+    if accepts_msgpack(request.headers.get('accept')):
+        return Response(encode_msgpack_response(payload), media_type=MSGPACK_MEDIA_TYPE, headers={'Vary': 'Accept'})
+    return JSONResponse(content=payload, headers={'Vary': 'Accept'})
 
 def extract_pinterest_media(url: str):
     """Extract media URLs from Pinterest using pinterest-dl command"""
@@ -151,7 +211,7 @@ async def handle_pinterest_download(url_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/render")
-async def handle_video_render(background_tasks: BackgroundTasks, project_config: dict):
+async def handle_video_render(background_tasks: BackgroundTasks, request: Request):
     """
     Start an async video render job
     
@@ -171,38 +231,28 @@ async def handle_video_render(background_tasks: BackgroundTasks, project_config:
         "job_id": "uuid-string",
         "status": "PENDING"
     }
+    
+    Invalid requests get a 400 listing every problem:
+    {"detail": "2 validation errors: ...", "errors": ["...", "..."]}
     """
     try:
-        # Validate required fields
-        required_fields = ['background_url', 'audio_url', 'lyrics']
-        for field in required_fields:
-            if field not in project_config:
-                raise HTTPException(status_code=400, detail=f'Missing required field: {field}')
-        
-        # Validate file paths exist
-        if not os.path.exists(project_config['background_url']):
-            raise HTTPException(status_code=400, detail=f'Background file not found: {project_config["background_url"]}')
-        
-        if not os.path.exists(project_config['audio_url']):
-            raise HTTPException(status_code=400, detail=f'Audio file not found: {project_config["audio_url"]}')
-        
-        # Validate lyrics array
-        lyrics = project_config['lyrics']
-        if not isinstance(lyrics, list) or len(lyrics) == 0:
-            raise HTTPException(status_code=400, detail='Lyrics must be a non-empty array')
-        
-        # Validate each lyric entry
-        for i, lyric in enumerate(lyrics):
-            if not isinstance(lyric, dict):
-                raise HTTPException(status_code=400, detail=f'Lyric at index {i} must be an object')
-            if 'text' not in lyric:
-                raise HTTPException(status_code=400, detail=f'Lyric at index {i} missing "text" field')
-            if 'start' not in lyric:
-                raise HTTPException(status_code=400, detail=f'Lyric at index {i} missing "start" field')
-            if 'end' not in lyric:
-                raise HTTPException(status_code=400, detail=f'Lyric at index {i} missing "end" field')
-            if lyric['end'] <= lyric['start']:
-                raise HTTPException(status_code=400, detail=f'Lyric at index {i} has invalid timing (end must be > start)')
+        project_config, errors = validate_render_request(await request.body(), request.headers.get('content-type'))
+        if errors:
+            return JSONResponse(
+                status_code=400,
+                content={'detail': error_summary(errors), 'errors': errors}
+            )
+        
+        # Hand the job to the render workers when a shared queue is configured
+        render_queue = get_render_queue()
+        if render_queue is not None:
+            job_id = render_queue.enqueue(project_config)
+            return {
+                'success': True,
+                'job_id': job_id,
+                'status': JobStatus.PENDING.value,
+                'message': 'Render job queued'
+            }
         
         # Generate job ID
         job_id = str(uuid.uuid4())
@@ -244,16 +294,20 @@ async def get_job_status(job_id: str):
         "status": "PROCESSING|COMPLETED|FAILED",
         "progress": 45,
         "message": "Processing video...",
+        "encoder_profile": "standard", // Once processing starts
+        "stream_url": "/api/stream/uuid-string/index.m3u8", // output_mode "hls" only, playable while processing
         "output_path": "/path/to/output.mp4", // Only when completed
         "duration": 12.5, // Only when completed
-        "lyrics_count": 10 // Only when completed
+        "lyrics_count": 10, // Only when completed
+        "composite_stats": {"frames": 900, "skipped_frames": 600, "composited_pixels": ..., "total_pixels": ...}, // Only when completed
+        "encode_fps": 240.5, // Only when completed
+        "previews": {"poster_url": "...", "sprite_url": "...", "vtt_url": "...", "interval": 2.0, "thumbnail_size": [135, 240]} // Only when completed
     }
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail='Job not found')
     
-    job = jobs[job_id]
-    
     response = {
         'success': True,
         'job_id': job_id,
@@ -263,6 +317,12 @@ async def get_job_status(job_id: str):
         'created_at': job['created_at']
     }
     
+    if job.get('encoder_profile'):
+        response['encoder_profile'] = job['encoder_profile']['name']
+    
+    if job.get('hls_dir'):
+        response['stream_url'] = f'/api/stream/{job_id}/{PLAYLIST_NAME}'
+    
     # Add completion data if job is finished
     if job['status'] in [JobStatus.COMPLETED, JobStatus.FAILED]:
         response['completed_at'] = job.get('completed_at')
@@ -272,6 +332,10 @@ async def get_job_status(job_id: str):
             response['video_url'] = job.get('video_url')
             response['duration'] = job.get('duration')
             response['lyrics_count'] = job.get('lyrics_count')
+            response['composite_stats'] = job.get('composite_stats')
+            response['encode_fps'] = job.get('encode_fps')
+            if job.get('previews'):
+                response['previews'] = preview_urls(job['previews'], f'/api/previews/{job_id}')
         elif job['status'] == JobStatus.FAILED:
             response['error'] = job.get('error')
     
@@ -282,11 +346,10 @@ async def download_video(job_id: str):
     """
     Download the rendered video file
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail='Job not found')
     
-    job = jobs[job_id]
-    
     if job['status'] != JobStatus.COMPLETED:
         raise HTTPException(status_code=400, detail='Video not ready yet')
     
@@ -300,13 +363,78 @@ async def download_video(job_id: str):
         filename=f'lyric_video_{job_id}.mp4'
     )
 
+@app.get("/api/stream/{job_id}/{filename}")
+async def stream_render_output(job_id: str, filename: str):
+    """
+    Serve the live HLS playlist and fMP4 segments of a render started with
+    "output_mode": "hls". The playlist grows while the job is processing.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    
+    hls_dir = job.get('hls_dir')
+    stream_file = resolve_stream_file(hls_dir, filename) if hls_dir else None
+    if not stream_file:
+        raise HTTPException(status_code=404, detail='Stream file not found')
+    
+    # The playlist changes until the render completes
+    headers = {'Cache-Control': 'no-cache'} if filename == PLAYLIST_NAME else None
+    return FileResponse(stream_file['path'], media_type=stream_file['media_type'], headers=headers)
+
+@app.get("/api/previews/{job_id}/{filename}")
+async def download_preview_asset(job_id: str, filename: str):
+    """
+    Serve the poster, scrub sprite and sprite.vtt generated during a render
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    
+    previews = job.get('previews')
+    preview_file = resolve_preview_file(previews, filename) if previews else None
+    if not preview_file:
+        raise HTTPException(status_code=404, detail='Preview file not found')
+    
+    return FileResponse(preview_file['path'], media_type=preview_file['media_type'])
+
+@app.get("/api/jobs/{job_id}/trace")
+async def download_job_trace(job_id: str):
+    """
+    Download the profiling trace of a render job as Chrome trace JSON
+    
+    Only available for jobs started with "profile": true in the request
+    or while the RENDER_PROFILE environment variable is set.
+    Open the file in chrome://tracing or https://ui.perfetto.dev
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    
+    trace = job.get('trace')
+    if not trace:
+        raise HTTPException(status_code=404, detail='No trace recorded for this job')
+    
+    return JSONResponse(
+        content=trace,
+        headers={'Content-Disposition': f'attachment; filename="render_trace_{job_id}.json"'}
+    )
+
 @app.post("/api/transcribe")
-async def handle_transcription(audio_file: UploadFile = File(...)):
+async def handle_transcription(request: Request, mode: Optional[str] = None):
     """
     Transcribe audio file and return word-level timestamps using OpenAI Whisper
     
     Expected: multipart/form-data with 'audio' file field
     
+    The upload is decoded to 16 kHz mono PCM while it streams in; uploads over
+    MAX_UPLOAD_MB are rejected with 413 as soon as the limit is crossed.
+    
+    With ?mode=async (or a "mode" form field; the query string wins when both
+    are set) the audio is queued for the transcription workers and the
+    response is {"success": true, "job_id": "...", "status": "PENDING"};
+    poll GET /api/transcribe/{job_id} for the result.
+    
     Returns:
     {
         "success": true,
@@ -315,76 +443,211 @@ async def handle_transcription(audio_file: UploadFile = File(...)):
             {"text": "world", "start": 800, "end": 1600}
         ],
         "duration": 10.5,
-        "language": "en"
+        "language": "en",
+        "audio_hash": "sha256 hex", // Waveform peaks and beat grid, see /api/audio/<audio_hash>/analysis
+        "analysis_url": "/api/audio/<audio_hash>/analysis",
+        "peaks_url": "/api/audio/<audio_hash>/peaks"
     }
     """
     try:
-        # Check if audio file is present
-        if not audio_file:
-            raise HTTPException(status_code=400, detail='No audio file provided')
-        
-        if audio_file.filename == '':
-            raise HTTPException(status_code=400, detail='Empty filename')
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_audio:
-            # Save the uploaded file
-            with open(temp_audio.name, 'wb') as buffer:
-                shutil.copyfileobj(audio_file.file, buffer)
-            temp_audio_path = temp_audio.name
+        content_length = int(request.headers.get('content-length') or 0)
+        if content_length > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail='Audio file too large')
         
+        # Decode the upload while it streams in
+        decoder = StreamingAudioDecoder()
         try:
-            # Load Whisper model (base model for balance of speed and accuracy)
-            # You can use 'tiny', 'base', 'small', 'medium', 'large' based on needs
-            print('Loading Whisper model...')
-            model = whisper.load_model("base")
-            
-            # Transcribe with word-level timestamps
-            print(f'Transcribing audio file: {temp_audio_path}')
-            result = model.transcribe(
-                temp_audio_path,
-                word_timestamps=True,
-                verbose=False
-            )
+            reader = MultipartAudioReader(request.headers.get('content-type', ''), 'audio', decoder)
+            # feed() writes to ffmpeg's stdin and finish() waits for ffmpeg; both block,
+            # so they run in worker threads to keep the event loop serving other requests
+            async for chunk in request.stream():
+                await asyncio.to_thread(reader.feed, chunk)
+            await asyncio.to_thread(reader.close)
             
-            # Extract word-level timestamps
-            lyrics = []
+            # Check if audio file is present
+            if not reader.found:
+                raise HTTPException(status_code=400, detail='No audio file provided')
             
-            for segment in result.get('segments', []):
-                for word_info in segment.get('words', []):
-                    lyrics.append({
-                        'text': word_info['word'].strip(),
-                        'start': int(word_info['start'] * 1000),  # Convert to milliseconds
-                        'end': int(word_info['end'] * 1000)       # Convert to milliseconds
-                    })
-            
-            # Clean up temporary file
-            os.unlink(temp_audio_path)
-            
-            if len(lyrics) == 0:
-                raise HTTPException(
-                    status_code=400, 
-                    detail='No words detected in audio. Please ensure the audio contains speech.'
-                )
+            if reader.filename == '':
+                raise HTTPException(status_code=400, detail='Empty filename')
             
+            audio = await asyncio.to_thread(decoder.finish)
+        except UploadTooLarge as e:
+            decoder.abort()
+            raise HTTPException(status_code=413, detail=str(e))
+        except (ValueError, AudioDecodeError) as e:
+            decoder.abort()
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            decoder.abort()
+            raise
+        
+        pcm_path = audio['pcm_path']
+        # Waveform peaks and beat grid for the timeline editor, cached by content hash
+        analysis = await asyncio.to_thread(analyze_upload, audio)
+        # Same order as the Flask server: ?mode= first, then the form field
+        mode = mode or reader.fields.get('mode') or 'sync'
+        if mode == 'async':
+            # The worker deletes the file once it is done with it
+            job_id = get_transcription_queue().enqueue(pcm_path)
             return {
                 'success': True,
-                'lyrics': lyrics,
-                'duration': result.get('segments', [{}])[-1].get('end', 0) if result.get('segments') else 0,
-                'language': result.get('language', 'unknown'),
-                'text': result.get('text', '')
+                'job_id': job_id,
+                'status': JobStatus.PENDING.value,
+                'message': 'Transcription job queued',
+                **analysis
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(temp_audio_path):
-                os.unlink(temp_audio_path)
-            raise e
-            
+        
+        try:
+            result = await asyncio.to_thread(transcribe_audio, pcm_path)
+        finally:
+            # Clean up temporary file
+            os.unlink(pcm_path)
+        
+        if len(result['lyrics']) == 0:
+            raise HTTPException(
+                status_code=400, 
+                detail='No words detected in audio. Please ensure the audio contains speech.'
+            )
+        
+        return lyrics_response(request, {
+            'success': True,
+            **result,
+            **analysis
+        })
+        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f'Transcription error: {str(e)}')
         raise HTTPException(status_code=500, detail=f'Transcription failed: {str(e)}')
 
+@app.post("/api/align")
+async def handle_alignment(request: Request):
+    """
+    Align lyrics the user already has to the audio (forced alignment) and
+    return word-level timestamps. Much faster than /api/transcribe because
+    the text is fixed instead of being decoded by Whisper.
+    
+    Expected: multipart/form-data with an 'audio' file field and a 'lyrics'
+    text field (words separated by whitespace, at most 64 KB; longer lyrics get 413)
+    
+    Returns:
+    {
+        "success": true,
+        "lyrics": [
+            {"text": "Hello", "start": 0, "end": 800},
+            {"text": "world", "start": 800, "end": 1600}
+        ],
+        "duration": 10.5,
+        "text": "Hello world"
+    }
+    """
+    try:
+        content_length = int(request.headers.get('content-length') or 0)
+        if content_length > MAX_UPLOAD_BYTES + MAX_LYRICS_BYTES:
+            raise HTTPException(status_code=413, detail='Audio file too large')
+        
+        # Decode the upload while it streams in
+        decoder = StreamingAudioDecoder()
+        try:
+            reader = MultipartAudioReader(
+                request.headers.get('content-type', ''), 'audio', decoder, max_field_bytes=MAX_LYRICS_BYTES
+            )
+            # feed() writes to ffmpeg's stdin and finish() waits for ffmpeg; both block,
+            # so they run in worker threads to keep the event loop serving other requests
+            async for chunk in request.stream():
+                await asyncio.to_thread(reader.feed, chunk)
+            await asyncio.to_thread(reader.close)
+            
+            if not reader.found:
+                raise HTTPException(status_code=400, detail='No audio file provided')
+            
+            if not reader.fields.get('lyrics', '').strip():
+                raise HTTPException(status_code=400, detail='No lyrics provided')
+            
+            audio = await asyncio.to_thread(decoder.finish)
+        except UploadTooLarge as e:
+            decoder.abort()
+            raise HTTPException(status_code=413, detail=str(e))
+        except (ValueError, AudioDecodeError) as e:
+            decoder.abort()
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            decoder.abort()
+            raise
+        
+        analysis = await asyncio.to_thread(analyze_upload, audio)
+        
+        try:
+            result = await asyncio.to_thread(align_lyrics, audio['pcm_path'], reader.fields['lyrics'])
+        except AlignmentError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            # Clean up temporary file
+            os.unlink(audio['pcm_path'])
+        
+        return lyrics_response(request, {
+            'success': True,
+            **result,
+            **analysis
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f'Alignment error: {str(e)}')
+        raise HTTPException(status_code=500, detail=f'Alignment failed: {str(e)}')
+
+@app.get("/api/transcribe/{job_id}")
+async def get_transcription_status(job_id: str, request: Request):
+    """
+    Get the status of an async transcription job
+    
+    Returns the same fields as /api/status/{job_id}; once COMPLETED the
+    response also carries "lyrics", "duration", "language" and "text".
+    """
+    job = get_transcription_queue(start_workers=False).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    
+    return lyrics_response(request, job_status_response(job))
+
+@app.get("/api/audio/{audio_hash}/analysis")
+async def get_audio_analysis(audio_hash: str):
+    """
+    Waveform peak levels and beat grid of an uploaded audio file, keyed by the
+    SHA-256 of the upload (returned by /api/transcribe and /api/align)
+    
+    Returns:
+    {
+        "sha256": "...", "duration": 10.5, "sample_rate": 16000,
+        "peaks": {"bits": 8, "levels": [{"samples_per_peak": 64, "offset": 0, "length": 2625}, ...]},
+        "tempo": 120.0, "beats": [250, 750, ...], "onsets": [240, 510, ...]
+    }
+    
+    Each level is `length` interleaved min/max pairs of signed `bits`-bit
+    integers starting at byte `offset` of /api/audio/{audio_hash}/peaks.
+    """
+    path = cache_path(audio_hash, ANALYSIS_NAME)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail='Audio analysis not found')
+    
+    # Content-addressed, so it never changes
+    return FileResponse(path, media_type='application/json', headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+@app.get("/api/audio/{audio_hash}/peaks")
+async def get_audio_peaks(audio_hash: str):
+    """
+    Binary waveform peaks for all zoom levels. Supports Range requests, so a
+    client can fetch a single level using the offsets from /analysis.
+    """
+    path = cache_path(audio_hash, PEAKS_NAME)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail='Audio analysis not found')
+    
+    return FileResponse(path, media_type='application/octet-stream', headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
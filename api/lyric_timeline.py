@@ -0,0 +1,197 @@
+"""
+Columnar Lyric Timeline
+A compact alternative to JSON arrays of {text, start, end} dicts: a table of
+unique word strings plus little-endian int32 arrays of text indices, start
+deltas and durations (milliseconds). Sent as MessagePack (or inside JSON with
+base64 bytes) and loaded straight into NumPy arrays without per-word dicts.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import msgspec
+import numpy as np
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+# Also accepted in Content-Type / Accept headers
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, 'application/x-msgpack', 'application/vnd.msgpack')
+
+_INDEX_DTYPE = np.dtype('<u4')
+_TIME_DTYPE = np.dtype('<i4')
+
+
+class TimelineColumns(msgspec.Struct):
+    """
+    Wire form of a lyric timeline:
+    {"strings": ["hello", "world"], "text_index": <u32 LE>, "start_deltas": <i32 LE>, "durations": <i32 LE>}
+    The first start delta is the absolute start of the first word.
+    """
+    strings: List[str]
+    text_index: bytes
+    start_deltas: bytes
+    durations: bytes
+
+
+def _check_time_range(starts: np.ndarray, ends: np.ndarray):
+    """Raise ValueError unless every time is a finite value that fits in int32 milliseconds"""
+    if not len(starts):
+        return
+    limits = np.iinfo(_TIME_DTYPE)
+    if not (np.isfinite(starts).all() and np.isfinite(ends).all()):
+        raise ValueError('Lyric times must be finite numbers')
+    if min(starts.min(), ends.min()) < limits.min or max(starts.max(), ends.max()) > limits.max:
+        raise ValueError('Lyric times do not fit in int32 milliseconds')
+
+
+class LyricTimeline:
+    """Array-backed lyric timeline: a string table plus int32 start/end arrays in ms"""
+
+    __slots__ = ('strings', 'text_index', 'starts', 'ends')
+
+    def __init__(self, strings: List[str], text_index: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self.strings = strings
+        self.text_index = text_index
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text(self, index: int) -> str:
+        return self.strings[self.text_index[index]]
+
+    @classmethod
+    def from_words(cls, words: Iterable[Any]) -> 'LyricTimeline':
+        """Build from {text, start, end} dicts or structs (e.g. render_schema.LyricWord)"""
+        words = list(words)
+        count = len(words)
+        if count and isinstance(words[0], dict):
+            texts = [word['text'] for word in words]
+            starts = np.fromiter((word['start'] for word in words), dtype=np.float64, count=count)
+            ends = np.fromiter((word['end'] for word in words), dtype=np.float64, count=count)
+        else:
+            texts = [word.text for word in words]
+            starts = np.fromiter((word.start for word in words), dtype=np.float64, count=count)
+            ends = np.fromiter((word.end for word in words), dtype=np.float64, count=count)
+
+        starts, ends = np.rint(starts), np.rint(ends)
+        _check_time_range(starts, ends)
+
+        table: Dict[str, int] = {}
+        text_index = np.fromiter((table.setdefault(text, len(table)) for text in texts),
+                                 dtype=_INDEX_DTYPE, count=count)
+        return cls(list(table), text_index, starts.astype(_TIME_DTYPE), ends.astype(_TIME_DTYPE))
+
+    @classmethod
+    def from_columns(cls, columns: TimelineColumns) -> 'LyricTimeline':
+        """Decode the wire form; raises ValueError if the columns do not line up"""
+        if len(columns.text_index) % _INDEX_DTYPE.itemsize:
+            raise ValueError('text_index is not a whole number of uint32 values')
+
+        count = len(columns.text_index) // _INDEX_DTYPE.itemsize
+        for name in ('start_deltas', 'durations'):
+            if len(getattr(columns, name)) != count * _TIME_DTYPE.itemsize:
+                raise ValueError(f'{name} must hold {count} int32 values, one per word')
+
+        text_index = np.frombuffer(columns.text_index, dtype=_INDEX_DTYPE)
+        if count and int(text_index.max()) >= len(columns.strings):
+            raise ValueError('text_index points past the end of strings')
+
+        # int64 while summing so long timelines cannot overflow before the range check
+        starts = np.cumsum(np.frombuffer(columns.start_deltas, dtype=_TIME_DTYPE), dtype=np.int64)
+        ends = starts + np.frombuffer(columns.durations, dtype=_TIME_DTYPE)
+        _check_time_range(starts, ends)
+
+        return cls(columns.strings, text_index, starts.astype(np.int32), ends.astype(np.int32))
+
+    def to_columns(self) -> TimelineColumns:
+        deltas = np.diff(self.starts, prepend=0).astype(_TIME_DTYPE)
+        return TimelineColumns(
+            strings=self.strings,
+            text_index=self.text_index.astype(_INDEX_DTYPE).tobytes(),
+            start_deltas=deltas.tobytes(),
+            durations=(self.ends - self.starts).astype(_TIME_DTYPE).tobytes(),
+        )
+
+    def to_words(self) -> List[Dict]:
+        return [
+            {'text': self.strings[i], 'start': start, 'end': end}
+            for i, start, end in zip(self.text_index.tolist(), self.starts.tolist(), self.ends.tolist())
+        ]
+
+
+def as_timeline(lyrics: Union[LyricTimeline, TimelineColumns, List, None]) -> LyricTimeline:
+    """Timeline for any of the forms lyrics arrive in"""
+    if isinstance(lyrics, LyricTimeline):
+        return lyrics
+    if isinstance(lyrics, TimelineColumns):
+        return LyricTimeline.from_columns(lyrics)
+    return LyricTimeline.from_words(lyrics or [])
+
+
+def is_msgpack(media_type: Optional[str]) -> bool:
+    """True for a MessagePack Content-Type header"""
+    return (media_type or '').split(';')[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def _quality(media_range: str) -> float:
+    for param in media_range.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return min(max(float(value), 0.0), 1.0)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """
+    True if an Accept header asks for MessagePack: a MessagePack range with
+    q > 0 that JSON (application/json, application/* or */*) does not outrank
+    """
+    msgpack_q = json_q = 0.0
+    for media_range in (accept or '').split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, _quality(media_range))
+        elif media_type in ('application/json', 'application/*', '*/*'):
+            json_q = max(json_q, _quality(media_range))
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def _enc_hook(obj):
+    if isinstance(obj, LyricTimeline):
+        return obj.to_columns()
+    raise NotImplementedError(f'Cannot encode {type(obj).__name__}')
+
+
+_encoder = msgspec.msgpack.Encoder(enc_hook=_enc_hook)
+
+
+def encode_msgpack_response(response: Dict) -> bytes:
+    """MessagePack body for an API response, with `lyrics` in columnar form"""
+    if isinstance(response.get('lyrics'), list):
+        response = {**response, 'lyrics': LyricTimeline.from_words(response['lyrics'])}
+    return _encoder.encode(response)
+
+
+def encode_timeline(timeline: LyricTimeline) -> bytes:
+    """Standalone MessagePack encoding of a timeline, e.g. for storing it"""
+    return _encoder.encode(timeline)
+
+
+def decode_timeline(data: bytes) -> LyricTimeline:
+    return LyricTimeline.from_columns(msgspec.msgpack.decode(data, type=TimelineColumns))
+
+
+def encode_config(config: Dict) -> bytes:
+    """JSON for a stored render config; LyricTimeline lyrics stay columnar (base64 fields)"""
+    return msgspec.json.encode(config, enc_hook=_enc_hook)
+
+
+def decode_config(data: Union[bytes, str, Dict]) -> Dict:
+    """Inverse of encode_config; also accepts the already-parsed JSON (e.g. from a jsonb column)"""
+    config = dict(data) if isinstance(data, dict) else msgspec.json.decode(data)
+    if isinstance(config.get('lyrics'), dict):
+        config['lyrics'] = LyricTimeline.from_columns(msgspec.convert(config['lyrics'], TimelineColumns))
+    return config
@@ -0,0 +1,19 @@
+"""
+Media Tool Helpers
+Locates the ffmpeg binary shared by the ingest, encode and benchmark code.
+"""
+
+import shutil
+from typing import Optional
+
+
+def find_ffmpeg() -> Optional[str]:
+    """System ffmpeg if on PATH, otherwise the binary bundled with imageio-ffmpeg"""
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
@@ -0,0 +1,171 @@
+"""
+Render Preview Assets
+Taps the composited frame stream during a render to produce a poster image
+and a downscaled scrub sprite sheet with a WebVTT index, without decoding the
+finished video again.
+"""
+
+import os
+import subprocess
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from media_tools import find_ffmpeg
+
+DEFAULT_INTERVAL_SECONDS = 2.0
+# Longer videos get a wider interval so the sprite sheet stays a sensible size
+MAX_THUMBNAILS = 200
+THUMBNAIL_DOWNSCALE = 8  # 1080x1920 -> 135x240
+SPRITE_COLUMNS = 10
+
+POSTER_NAME = 'poster'
+SPRITE_NAME = 'sprite'
+VTT_NAME = 'sprite.vtt'
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'webp': 'image/webp', 'vtt': 'text/vtt'}
+
+
+def _vtt_timestamp(seconds: float) -> str:
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}'
+
+
+def downscale(frame: np.ndarray, factor: int) -> np.ndarray:
+    """Box-filter downscale by an integer factor"""
+    h, w = frame.shape[0] // factor, frame.shape[1] // factor
+    blocks = frame[:h * factor, :w * factor].reshape(h, factor, w, factor, 3)
+    return blocks.mean(axis=(1, 3), dtype=np.float32).round().astype(np.uint8)
+
+
+def write_image(pixels: np.ndarray, path: str, quality: int = 4):
+    """Encode an RGB array as JPEG or WebP (by extension) with ffmpeg"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError('ffmpeg is not installed')
+
+    height, width = pixels.shape[:2]
+    quality_args = ['-q:v', str(quality)] if path.endswith('.jpg') else ['-quality', '80']
+    result = subprocess.run([
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-i', 'pipe:0',
+        '-frames:v', '1', *quality_args, path
+    ], input=np.ascontiguousarray(pixels).tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Image encode failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+class PreviewCollector:
+    """
+    Receives every composited frame and keeps a full-size poster frame plus
+    one downscaled thumbnail per interval. `finish()` writes
+    poster.<fmt>, sprite.<fmt> and sprite.vtt into `output_dir`.
+    """
+
+    def __init__(self, output_dir: str, fps: float, frame_count: int, poster_frame: int = 0,
+                 interval: float = DEFAULT_INTERVAL_SECONDS, image_format: str = 'jpg'):
+        if image_format not in ('jpg', 'webp'):
+            raise ValueError(f'Unsupported preview format: {image_format}')
+
+        self.output_dir = output_dir
+        self.fps = fps
+        self.frame_count = frame_count
+        self.poster_frame = min(max(poster_frame, 0), max(frame_count - 1, 0))
+        self.image_format = image_format
+
+        duration = frame_count / fps
+        self.interval = max(interval, duration / MAX_THUMBNAILS)
+        self._frames_per_thumbnail = max(1, round(self.interval * fps))
+        self._poster: Optional[np.ndarray] = None
+        self._sprite: Optional[np.ndarray] = None
+        self._thumbnails = 0
+        self._thumb_size = (0, 0)
+
+    def wanted_frames(self) -> List[int]:
+        """Indices of the frames offer() keeps, for producers that can skip the others"""
+        return sorted(set(range(0, self.frame_count, self._frames_per_thumbnail)) | {self.poster_frame})
+
+    def offer(self, frame_index: int, frame: np.ndarray):
+        if frame_index == self.poster_frame:
+            self._poster = frame.copy()
+
+        if frame_index % self._frames_per_thumbnail != 0:
+            return
+
+        thumbnail = downscale(frame, THUMBNAIL_DOWNSCALE)
+        if self._sprite is None:
+            # Allocate the whole sheet up front from the known frame count
+            total = -(-self.frame_count // self._frames_per_thumbnail)
+            rows = -(-total // SPRITE_COLUMNS)
+            columns = min(total, SPRITE_COLUMNS)
+            th, tw = thumbnail.shape[:2]
+            self._thumb_size = (tw, th)
+            self._sprite = np.zeros((rows * th, columns * tw, 3), dtype=np.uint8)
+
+        tw, th = self._thumb_size
+        row, column = divmod(self._thumbnails, SPRITE_COLUMNS)
+        self._sprite[row * th:(row + 1) * th, column * tw:(column + 1) * tw] = thumbnail
+        self._thumbnails += 1
+
+    def _vtt(self, sprite_name: str) -> str:
+        tw, th = self._thumb_size
+        duration = self.frame_count / self.fps
+        lines = ['WEBVTT', '']
+        for i in range(self._thumbnails):
+            start = i * self._frames_per_thumbnail / self.fps
+            end = min((i + 1) * self._frames_per_thumbnail / self.fps, duration)
+            row, column = divmod(i, SPRITE_COLUMNS)
+            lines.append(f'{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}')
+            lines.append(f'{sprite_name}#xywh={column * tw},{row * th},{tw},{th}')
+            lines.append('')
+        return '\n'.join(lines)
+
+    def finish(self) -> Optional[Dict]:
+        """
+        Write the preview files. Returns
+        {"dir": ..., "poster": path, "sprite": path, "vtt": path, "interval": 2.0, "thumbnail_size": [135, 240]}
+        """
+        if self._poster is None or self._sprite is None:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        poster_path = os.path.join(self.output_dir, f'{POSTER_NAME}.{self.image_format}')
+        sprite_name = f'{SPRITE_NAME}.{self.image_format}'
+        sprite_path = os.path.join(self.output_dir, sprite_name)
+        vtt_path = os.path.join(self.output_dir, VTT_NAME)
+
+        write_image(self._poster, poster_path)
+        write_image(self._sprite, sprite_path)
+        with open(vtt_path, 'w') as f:
+            # The sprite is referenced relatively so the index works wherever the folder is uploaded
+            f.write(self._vtt(sprite_name))
+
+        return {
+            'dir': self.output_dir,
+            'poster': poster_path,
+            'sprite': sprite_path,
+            'vtt': vtt_path,
+            'interval': round(self.interval, 3),
+            'thumbnail_size': list(self._thumb_size),
+        }
+
+
+def preview_urls(previews: Dict, base_url: str) -> Dict:
+    """
+    Public description of a job's previews: uploaded URLs where available,
+    otherwise `base_url`/<file name> served by the API
+    """
+    response = {'interval': previews.get('interval'), 'thumbnail_size': previews.get('thumbnail_size')}
+    for key in ('poster', 'sprite', 'vtt'):
+        if previews.get(key):
+            response[f'{key}_url'] = previews.get(f'{key}_url') or f"{base_url}/{os.path.basename(previews[key])}"
+    return response
+
+
+def resolve_preview_file(previews: Dict, filename: str) -> Optional[Dict]:
+    """Map a requested file name to one of a job's preview files, or None"""
+    for key in ('poster', 'sprite', 'vtt'):
+        path = previews.get(key)
+        if path and os.path.basename(path) == filename and os.path.isfile(path):
+            return {'path': path, 'media_type': CONTENT_TYPES[filename.rsplit('.', 1)[-1]]}
+    return None
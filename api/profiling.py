@@ -0,0 +1,153 @@
+"""
+Render Profiling Helpers
+Records per-stage span timings for render jobs and exports them as Chrome trace JSON
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Set to 1/true to profile every render job without changing the request
+PROFILE_ENV_VAR = "RENDER_PROFILE"
+# Set to 1/true to also capture a cProfile of the rendering worker
+CPROFILE_ENV_VAR = "RENDER_PROFILE_CPROFILE"
+
+DEFAULT_FRAME_INTERVAL = 30
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def profiler_from_config(project_config: Dict) -> 'RenderProfiler':
+    """
+    Build a profiler for a render job.
+
+    Profiling is enabled by the RENDER_PROFILE environment variable or by a
+    `profile` key in the project config, which can be `true` or an object:
+    {"frame_interval": 30, "cprofile": true}
+    """
+    option = project_config.get('profile')
+    options = option if isinstance(option, dict) else {}
+    enabled = bool(option) or _env_flag(PROFILE_ENV_VAR)
+
+    return RenderProfiler(
+        enabled=enabled,
+        frame_interval=int(options.get('frame_interval', DEFAULT_FRAME_INTERVAL)),
+        capture_cprofile=enabled and (bool(options.get('cprofile')) or _env_flag(CPROFILE_ENV_VAR)),
+    )
+
+
+class RenderProfiler:
+    """Collects timing spans for one render job. Does nothing when disabled."""
+
+    def __init__(self, enabled: bool = True, frame_interval: int = DEFAULT_FRAME_INTERVAL,
+                 capture_cprofile: bool = False):
+        self.enabled = enabled
+        self.frame_interval = max(1, frame_interval)
+        self.events: List[Dict[str, Any]] = []
+
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._cprofile = cProfile.Profile() if capture_cprofile else None
+        self._cprofile_stats: Optional[str] = None
+        self._window_start: Optional[float] = None
+        self._window_first_frame = 0
+
+    def _record(self, name: str, start: float, end: float, args: Optional[Dict] = None):
+        event = {
+            'name': name,
+            'cat': 'render',
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1_000_000, 1),
+            'dur': round((end - start) * 1_000_000, 1),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time a render stage, e.g. `with profiler.span('encode'):`"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter(), args)
+
+    def frame_tick(self, frame_index: int):
+        """Call once per rendered frame; records one span per `frame_interval` frames"""
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        if self._window_start is None:
+            self._window_start = now
+            self._window_first_frame = frame_index
+            return
+
+        if frame_index - self._window_first_frame + 1 >= self.frame_interval:
+            self._record('frames', self._window_start, now, {
+                'first_frame': self._window_first_frame,
+                'last_frame': frame_index,
+            })
+            self._window_start = None
+
+    def flush_frames(self, last_frame_index: int):
+        """Close a partially filled frame window at the end of the frame loop"""
+        if not self.enabled or self._window_start is None:
+            return
+
+        self._record('frames', self._window_start, time.perf_counter(), {
+            'first_frame': self._window_first_frame,
+            'last_frame': last_frame_index,
+        })
+        self._window_start = None
+
+    def start_cprofile(self):
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop_cprofile(self, limit: int = 40):
+        if self._cprofile is None:
+            return
+
+        self._cprofile.disable()
+        buffer = io.StringIO()
+        pstats.Stats(self._cprofile, stream=buffer).sort_stats('cumulative').print_stats(limit)
+        self._cprofile_stats = buffer.getvalue()
+
+    def summary(self) -> Dict[str, float]:
+        """Total milliseconds spent per span name"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for event in self.events:
+                totals[event['name']] = totals.get(event['name'], 0.0) + event['dur'] / 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Export spans in the Chrome trace event format (chrome://tracing, Perfetto)"""
+        with self._lock:
+            events = list(self.events)
+
+        trace: Dict[str, Any] = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'summary_ms': self.summary()},
+        }
+        if self._cprofile_stats:
+            trace['otherData']['cprofile'] = self._cprofile_stats
+        return trace
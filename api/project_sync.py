@@ -0,0 +1,270 @@
+"""
+Write-behind Project Sync
+Render status and progress for editor_projects rows are collected in memory,
+coalesced per project (only the newest value of each column is kept) and
+written in batches from a background thread through the shared Supabase
+client. A batch is one `apply_project_updates` RPC call; batches that fail
+for a transient reason (network, 5xx, connection errors) are retried with
+exponential backoff. A permanent error (bad id, constraint) fails the whole
+RPC transaction, so the batch is split in halves until the offending project
+is found, and only that project's update is dropped and logged.
+
+Updates for a project are always written in the order they were made: flushes
+never overlap, and a failed batch is merged back *under* any newer updates so
+a retry can never overwrite newer state.
+"""
+
+import atexit
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+SYNC_INTERVAL = float(os.environ.get("PROJECT_SYNC_INTERVAL", "1"))
+MAX_BATCH = 100
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+# Attempts made by flush() when a caller waits for the result (job finished, shutdown)
+FLUSH_ATTEMPTS = 4
+
+# PostgREST error code for an RPC function that does not exist (migration not applied)
+FUNCTION_NOT_FOUND = 'PGRST202'
+# Postgres error code when the key may not execute the RPC (it is granted to service_role only)
+INSUFFICIENT_PRIVILEGE = '42501'
+# Worth retrying: PostgREST connection errors (PGRST000-003) and the Postgres connection,
+# transaction rollback, resource and operator intervention classes
+TRANSIENT_CODE_PREFIXES = ('PGRST00', '08', '40', '53', '57', '58')
+# Columns every editor_projects schema has (and the legacy `projects` table too);
+# the rest come from later migrations and may be missing
+BASE_FIELDS = ('video_url', 'status')
+
+
+def _merge(older: Dict, newer: Dict) -> Dict:
+    return {**older, **newer}
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a failed write may succeed when retried. Errors without a PostgREST
+    code (network, timeouts) are; so are HTTP 408/429/5xx responses, which
+    postgrest-py reports with the status as code when the body is not JSON.
+    """
+    code = getattr(error, 'code', None)
+    if code is None or code == '':
+        return True
+    if isinstance(code, int) or (str(code).isdigit() and len(str(code)) == 3):
+        status = int(code)
+        return status >= 500 or status in (408, 429)
+    return str(code).startswith(TRANSIENT_CODE_PREFIXES)
+
+
+def _rows(response) -> list:
+    data = getattr(response, 'data', None)
+    return data if isinstance(data, list) else []
+
+
+class ProjectSync:
+    """
+    Coalescing, batching writer for editor_projects updates.
+
+        sync = get_project_sync()
+        sync.update(project_id, status='processing', render_progress=40)
+        ...
+        sync.update(project_id, status='completed', video_url=url)
+        sync.flush()  # wait until the final state is stored
+    """
+
+    def __init__(self, client=None, interval: float = SYNC_INTERVAL, max_batch: int = MAX_BATCH):
+        self._client = client
+        self.interval = interval
+        self.max_batch = max_batch
+        self.batch_rpc = True
+        self.failures = 0
+        self.requests = 0
+        # Updates given up on because of a permanent error
+        self.dropped = 0
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # Held for a whole flush so batches are written strictly in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from render_engine import get_supabase_client
+            self._client = get_supabase_client()
+        return self._client
+
+    def update(self, project_id: str, **fields):
+        """Queue column updates for a project; replaces older queued values of the same columns"""
+        if not project_id or not fields:
+            return
+        with self._lock:
+            self._pending[project_id] = _merge(self._pending.get(project_id, {}), fields)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='project-sync', daemon=True)
+                self._thread.start()
+
+    def pending(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {project_id: dict(fields) for project_id, fields in self._pending.items()}
+
+    def flush(self, attempts: int = FLUSH_ATTEMPTS) -> bool:
+        """Write everything queued so far, retrying with backoff. True once nothing is left."""
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(self._backoff())
+            if self._flush_once():
+                return True
+        return False
+
+    def close(self):
+        """Stop the background thread after a final flush"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _flush_once(self) -> bool:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return True
+            if self.client is None:
+                # Nothing to sync to; drop updates as upload_video_to_supabase always did
+                return True
+
+            try:
+                while batch:
+                    chunk = dict(list(batch.items())[:self.max_batch])
+                    self._send(chunk, batch)
+            except Exception as e:
+                self.failures += 1
+                print(f"Project sync failed ({len(batch)} project(s) pending, attempt {self.failures}): {e}")
+                with self._lock:
+                    for project_id, fields in batch.items():
+                        self._pending[project_id] = _merge(fields, self._pending.get(project_id, {}))
+                return False
+
+            self.failures = 0
+            return True
+
+    def _send(self, chunk: Dict[str, Dict], batch: Dict[str, Dict]):
+        """
+        Write one chunk, removing each project from `batch` once it is stored or
+        dropped. Raises on transient errors, leaving the rest in `batch`.
+        """
+        if self.batch_rpc:
+            try:
+                self.requests += 1
+                missing = _rows(self.client.rpc('apply_project_updates', {
+                    'p_updates': [{'id': project_id, 'fields': fields} for project_id, fields in chunk.items()]
+                }).execute())
+            except Exception as e:
+                code = getattr(e, 'code', None)
+                if code == FUNCTION_NOT_FOUND:
+                    print("apply_project_updates is not in the database; syncing projects one row at a time")
+                elif code == INSUFFICIENT_PRIVILEGE:
+                    print("apply_project_updates needs the service role key; syncing projects one row at a time")
+                elif is_transient(e):
+                    raise
+                elif len(chunk) > 1:
+                    # The batch is one transaction, so one bad project fails all of them
+                    items = list(chunk.items())
+                    self._send(dict(items[:len(items) // 2]), batch)
+                    self._send(dict(items[len(items) // 2:]), batch)
+                    return
+                else:
+                    project_id, fields = next(iter(chunk.items()))
+                    self._drop(project_id, fields, e, batch)
+                    return
+                self.batch_rpc = False
+            else:
+                for project_id, fields in chunk.items():
+                    if project_id in missing:
+                        # Not an editor_projects row; may be a project from the legacy table
+                        self._send_row(project_id, fields, batch, self._update_legacy)
+                    else:
+                        del batch[project_id]
+                return
+
+        for project_id, fields in chunk.items():
+            self._send_row(project_id, fields, batch, self._update_row)
+
+    def _send_row(self, project_id: str, fields: Dict, batch: Dict[str, Dict], write):
+        try:
+            write(project_id, fields)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            self._drop(project_id, fields, e, batch)
+            return
+        del batch[project_id]
+
+    def _drop(self, project_id: str, fields: Dict, error: Exception, batch: Dict[str, Dict]):
+        self.dropped += 1
+        print(f"Dropping update for project {project_id} ({', '.join(fields)}): {error}")
+        del batch[project_id]
+
+    def _update_row(self, project_id: str, fields: Dict):
+        base = {key: value for key, value in fields.items() if key in BASE_FIELDS}
+        extra = {key: value for key, value in fields.items() if key not in BASE_FIELDS}
+        if base:
+            self.requests += 1
+            try:
+                stored = _rows(self.client.table('editor_projects').update(base).eq('id', project_id).execute())
+            except Exception as db_e:
+                if is_transient(db_e):
+                    raise
+                print(f"Failed to update editor_projects, trying projects table: {db_e}")
+                stored = []
+            if not stored:
+                self._update_legacy(project_id, base)
+        if extra:
+            # Separate so a database without these columns still gets status and video_url
+            self.requests += 1
+            try:
+                self.client.table('editor_projects').update(extra).eq('id', project_id).execute()
+            except Exception as extra_e:
+                print(f"Failed to store {', '.join(extra)} for project {project_id}: {extra_e}")
+
+    def _update_legacy(self, project_id: str, fields: Dict):
+        """Status and video_url for a project in the legacy `projects` table"""
+        base = {key: value for key, value in fields.items() if key in BASE_FIELDS}
+        if not base:
+            return
+        self.requests += 1
+        if not _rows(self.client.table('projects').update(base).eq('id', project_id).execute()):
+            print(f"Project {project_id} is in neither editor_projects nor projects; update not stored")
+
+    def _backoff(self) -> float:
+        delay = min(RETRY_BASE_DELAY * 2 ** max(self.failures - 1, 0), RETRY_MAX_DELAY)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self._backoff() if self.failures else self.interval)
+            self._wake.clear()
+            if not self._stopped.is_set():
+                self._flush_once()
+
+
+_sync: Optional[ProjectSync] = None
+_sync_lock = threading.Lock()
+
+
+def get_project_sync() -> ProjectSync:
+    """The process-wide ProjectSync (flushed once more at interpreter exit)"""
+    global _sync
+    if _sync is None:
+        with _sync_lock:
+            if _sync is None:
+                _sync = ProjectSync()
+                atexit.register(_sync.close)
+    return _sync
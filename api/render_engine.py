@@ -4,28 +4,87 @@ Creates mock video rendering without requiring full moviepy dependencies
 """
 
 import json
+import math
 import os
 import tempfile
 import time
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import random
-from supabase import create_client, Client
+import threading
 
-# Initialize Supabase client
+import numpy as np
+
+from compositor import FrameCompositor, Overlay
+from encoder_profiles import select_encoder_profile
+from ass_backend import choose_backend, render_with_ass
+from audio_prep import COPY_CODECS, HLS_COPY_CODECS, AudioPrepError, prepare_audio
+from hls_output import EncodeError, HLSEncoder
+from media_tools import find_ffmpeg
+from preview_assets import CONTENT_TYPES, PreviewCollector
+from lyric_timeline import as_timeline
+from project_sync import get_project_sync
+from profiling import RenderProfiler, profiler_from_config
+from render_queue import LeaseLost
+
+ACTIVE_WORD_SCALE = 1.1
+
+# Supabase client is created on first use so importing the engine stays cheap
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-supabase_client: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"Failed to initialize Supabase client: {e}")
+supabase_client = None
+_supabase_lock = threading.Lock()
+_supabase_init_attempted = False
+
+def get_supabase_client():
+    """
+    Return the shared Supabase client, creating it on first call
+    """
+    global supabase_client, _supabase_init_attempted
+    if supabase_client is not None or _supabase_init_attempted:
+        return supabase_client
+    
+    with _supabase_lock:
+        if supabase_client is None and not _supabase_init_attempted:
+            _supabase_init_attempted = True
+            if SUPABASE_URL and SUPABASE_KEY:
+                try:
+                    from supabase import create_client
+                    supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                except Exception as e:
+                    print(f"Failed to initialize Supabase client: {e}")
+    
+    return supabase_client
+
+def upload_preview_assets(supabase_client, previews: Dict, storage_prefix: str):
+    """
+    Upload poster, sprite sheet and WebVTT index next to the video. The public
+    URLs are added to `previews` as poster_url, sprite_url and vtt_url.
+    """
+    for key in ('poster', 'sprite', 'vtt'):
+        local_path = previews.get(key)
+        if not local_path:
+            continue
+        
+        # Keep the file names: sprite.vtt references the sprite relatively
+        file_name = os.path.basename(local_path)
+        storage_path = f"{storage_prefix}_previews/{file_name}"
+        content_type = CONTENT_TYPES.get(file_name.rsplit('.', 1)[-1], 'application/octet-stream')
+        with open(local_path, 'rb') as f:
+            supabase_client.storage.from_('generated-videos').upload(
+                path=storage_path,
+                file=f,
+                file_options={"content-type": content_type}
+            )
+        previews[f'{key}_url'] = supabase_client.storage.from_('generated-videos').get_public_url(storage_path)
 
-def upload_video_to_supabase(file_path: str, project_id: str) -> Optional[str]:
+def upload_video_to_supabase(file_path: str, project_id: str, previews: Optional[Dict] = None) -> Optional[str]:
     """
-    Upload rendered video to Supabase Storage and update project record
+    Upload rendered video (and preview images, if any) to Supabase Storage and
+    update project record
     """
+    supabase_client = get_supabase_client()
     if not supabase_client:
         print("Supabase client not initialized. Skipping upload.")
         return None
@@ -50,26 +109,33 @@ def upload_video_to_supabase(file_path: str, project_id: str) -> Optional[str]:
         public_url = supabase_client.storage.from_('generated-videos').get_public_url(storage_path)
         print(f"Upload successful. Public URL: {public_url}")
         
-        # Update database - try editor_projects first as it's used by the current editor
+        if previews:
+            try:
+                upload_preview_assets(supabase_client, previews, storage_path.rsplit('.', 1)[0])
+            except Exception as preview_e:
+                print(f"Failed to upload preview assets: {preview_e}")
+        
+        # Queued with any pending progress for the project and written in one batch
+        fields = {'video_url': public_url, 'status': 'completed', 'render_progress': 100}
+        if previews and previews.get('poster_url'):
+            fields.update(
+                poster_url=previews.get('poster_url'),
+                sprite_url=previews.get('sprite_url'),
+                sprite_vtt_url=previews.get('vtt_url')
+            )
         print(f"Updating project {project_id} in database...")
-        try:
-            supabase_client.table('editor_projects').update({
-                'video_url': public_url,
-                'status': 'completed'
-            }).eq('id', project_id).execute()
-        except Exception as db_e:
-            print(f"Failed to update editor_projects, trying projects table: {db_e}")
-            supabase_client.table('projects').update({
-                'video_url': public_url,
-                'status': 'completed'
-            }).eq('id', project_id).execute()
+        sync = get_project_sync()
+        sync.update(project_id, **fields)
+        # Store the final state before the job reports COMPLETED (the editor checks it then)
+        if not sync.flush():
+            print(f"Project {project_id} update still pending; retrying in the background")
         
         return public_url
     except Exception as e:
         print(f"Error in upload_video_to_supabase: {e}")
         return None
 
-def simulate_render_process(project_config: dict, output_path: str) -> str:
+def simulate_render_process(project_config: dict, output_path: str, encoder_settings: Optional[Dict] = None) -> str:
     """
     Simulate video rendering process for demo purposes
     """
@@ -87,6 +153,8 @@ def simulate_render_process(project_config: dict, output_path: str) -> str:
         f.write(f"Simulated duration: {render_duration:.1f}s\n")
         f.write(f"Resolution: 1080x1920\n")
         f.write(f"Format: MP4 (H.264)\n")
+        if encoder_settings:
+            f.write(f"Encoder: {json.dumps(encoder_settings)}\n")
         f.write(f"Background: {project_config.get('background_url', 'Unknown')}\n")
         f.write(f"Audio: {project_config.get('audio_url', 'Unknown')}\n")
     
@@ -95,13 +163,18 @@ def simulate_render_process(project_config: dict, output_path: str) -> str:
 
 def render_video_from_config(project_config: Dict, output_path: Optional[str] = None) -> str:
     """
-    Mock function to simulate video rendering from project configuration
+    Mock function to simulate video rendering from project configuration.
+    Styles the ffmpeg/ASS backend can draw are rendered for real by it.
     """
     if not output_path:
         # Create temp file if no output path provided
         temp_dir = tempfile.gettempdir()
         output_path = os.path.join(temp_dir, f"mock_lyric_video_{int(time.time())}.mp4")
     
+    if choose_backend(project_config) == 'ffmpeg':
+        # Also uploads when a project_id is set
+        return LyricVideoRenderer(project_config).render(output_path)
+    
     rendered_path = simulate_render_process(project_config, output_path)
     
     # Upload to Supabase if project_id is present
@@ -112,34 +185,309 @@ def render_video_from_config(project_config: Dict, output_path: Optional[str] =
     return rendered_path
 
 
+@lru_cache(maxsize=256)
+def mock_text_patch(text: str, scale: float = 1.0) -> np.ndarray:
+    """
+    Stand-in for rasterized text: a white block sized like the word with a
+    2px black stroke, as an RGBA patch
+    """
+    height = int(96 * scale)
+    width = max(int(44 * scale * len(text)), height)
+    patch = np.zeros((height, width, 4), dtype=np.uint8)
+    patch[..., 3] = 255
+    patch[2:-2, 2:-2, :3] = 255
+    patch.flags.writeable = False
+    return patch
+
+
 class LyricVideoRenderer:
     """Mock renderer for demo purposes"""
     
-    def __init__(self, project_config: Dict):
+    def __init__(self, project_config: Dict, profiler: Optional[RenderProfiler] = None,
+                 encoder_profile: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[float], None]] = None):
         self.project_config = project_config
+        # Called with the fraction of frames composited, about once per second of video
+        self.progress_callback = progress_callback
+        self.profiler = profiler or profiler_from_config(project_config)
+        # Chosen by the scheduler; standalone renders use the pinned or default profile
+        self.encoder_profile = encoder_profile or select_encoder_profile(
+            0, pinned=project_config.get('encoder_profile') or 'standard'
+        )
         self.background_url = project_config.get('background_url')
         self.audio_url = project_config.get('audio_url')
-        self.lyrics = project_config.get('lyrics', [])
+        # Columnar lyrics load straight into arrays; word dicts are converted once
+        self.timeline = as_timeline(project_config.get('lyrics'))
+        # Set by prepare_audio() when the render muxes audio
+        self.audio: Optional[Dict] = None
+        # Render progress is written behind to editor_projects when the job belongs to a project
+        self.project_id = project_config.get('project_id')
         
         # Mock video dimensions
         self.width = 1080
         self.height = 1920
+        self.fps = self.encoder_profile['settings']['fps']
         
-    def render(self, output_path: str) -> str:
-        """Mock render method"""
+        self.compositor = FrameCompositor(self.width, self.height)
+        self.composite_stats: Optional[Dict] = None
+        self.encode_fps: Optional[float] = None
+        self.preview_collector: Optional[PreviewCollector] = None
+        self.previews: Optional[Dict] = None
+        # 'ffmpeg' (ASS subtitles, see ass_backend.py) or 'numpy' (FrameCompositor), chosen per render
+        self.backend: Optional[str] = None
+    
+    def timeline_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Lyric start/end times in milliseconds"""
+        return self.timeline.starts, self.timeline.ends
+    
+    def _background_frame(self) -> np.ndarray:
+        """Mock background: a static vertical gradient (no video decoding in the demo engine)"""
+        shade = np.linspace(24, 72, self.height, dtype=np.uint8)
+        return np.repeat(shade[:, None, None], self.width, axis=1).repeat(3, axis=2)
+    
+    def _overlays_for(self, index: int) -> List[Overlay]:
+        if index < 0:
+            return []
+        patch = mock_text_patch(self.timeline.text(index), ACTIVE_WORD_SCALE)
+        x = (self.width - patch.shape[1]) // 2
+        y = (self.height - patch.shape[0]) // 2
+        return [Overlay(key=(index, ACTIVE_WORD_SCALE), x=x, y=y, rgba=patch)]
+    
+    def frame_plan(self) -> np.ndarray:
+        """Index of the active lyric for every output frame (-1 for none)"""
+        if len(self.timeline) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        starts, ends = self.timeline_arrays()
+        frame_count = math.ceil(ends.max() / 1000 * self.fps)
+        
+        # Active word per frame, computed for all frames at once
+        times = np.arange(frame_count) * (1000 / self.fps)
+        active = np.searchsorted(starts, times, side='right') - 1
+        active[(active >= 0) & (times >= ends[np.maximum(active, 0)])] = -1
+        return active
+    
+    def iter_frames(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield (frame_index, frame) for the whole video. Frames are composited
+        into one reused buffer; copy a frame if you need to keep it.
+        """
+        active = self.frame_plan()
+        background = self._background_frame()
+        
+        frame_index = -1
+        for frame_index in range(len(active)):
+            frame = self.compositor.composite(background, self._overlays_for(int(active[frame_index])))
+            if self.preview_collector:
+                self.preview_collector.offer(frame_index, frame)
+            if frame_index % self.fps == 0:
+                self._report_progress(frame_index / len(active))
+            self.profiler.frame_tick(frame_index)
+            yield frame_index, frame
+        self.profiler.flush_frames(frame_index)
+    
+    def _report_progress(self, fraction: float):
+        if self.progress_callback:
+            self.progress_callback(fraction)
+        if self.project_id:
+            # Coalesced per project, so this costs no request per tick
+            get_project_sync().update(self.project_id, render_progress=int(fraction * 100))
+    
+    def _create_preview_collector(self, output_path: str) -> Optional[PreviewCollector]:
+        """
+        Poster and scrub sprite settings come from the `previews` config key:
+        false to disable, or {"interval": 2, "format": "jpg"|"webp", "poster_time": ms}
+        """
+        option = self.project_config.get('previews', True)
+        if option is False:
+            return None
+        if not find_ffmpeg():
+            print("ffmpeg not found. Skipping preview generation.")
+            return None
+        
+        options = option if isinstance(option, dict) else {}
+        active = self.frame_plan()
+        try:
+            if 'poster_time' in options:
+                poster_frame = int(options['poster_time'] / 1000 * self.fps)
+            else:
+                # Middle of the first lyric, so the poster shows text
+                shown = np.flatnonzero(active == active[active >= 0][0]) if (active >= 0).any() else [0]
+                poster_frame = int(shown[len(shown) // 2])
+
+            return PreviewCollector(
+                f"{os.path.splitext(output_path)[0]}_previews",
+                fps=self.fps,
+                frame_count=len(active),
+                poster_frame=poster_frame,
+                interval=float(options.get('interval', 2.0)),
+                image_format=options.get('format', 'jpg'),
+            )
+        except (TypeError, ValueError) as e:
+            # Requests are validated by render_schema.PreviewOptions; this covers direct callers
+            print(f"Invalid preview options, skipping preview generation: {e}")
+            return None
+        
+    def prepare_audio(self, copy_codecs=COPY_CODECS) -> Optional[Dict]:
+        """
+        Audio ready to be stream-copied into the output (see audio_prep.py), or
+        None to let the encoder transcode `audio_url` itself
+        """
+        try:
+            audio = prepare_audio(self.audio_url, self.project_config.get('audio_normalize'), copy_codecs)
+        except AudioPrepError as e:
+            print(f"Audio preparation failed, encoding audio during render: {e}")
+            return None
+        if audio:
+            print(f"Audio prepared ({audio['mode']}, {audio['codec']}): {audio['path']}")
+        return audio
+    
+    def render_hls(self, output_path: str, hls_dir: str) -> str:
+        """
+        Encode composited frames into live HLS segments in `hls_dir` while
+        rendering, then remux them into a regular MP4 at `output_path`
+        """
+        settings = self.encoder_profile['settings']
+        with self.profiler.span('audio'):
+            self.audio = self.prepare_audio(HLS_COPY_CODECS)
+        audio_path = self.audio['path'] if self.audio else self.audio_url
+        encoder = HLSEncoder(hls_dir, self.width, self.height, self.fps, settings, audio_path,
+                             audio_copy=self.audio is not None)
+        try:
+            with self.profiler.span('composite_and_encode', lyrics=len(self.timeline), output='hls'):
+                for _, frame in self.iter_frames():
+                    encoder.write_frame(frame)
+            with self.profiler.span('remux'):
+                encoder.finish(output_path)
+        except BaseException:
+            # Also on SIGTERM/KeyboardInterrupt, so no ffmpeg process is left behind
+            encoder.abort()
+            raise
+        return output_path
+    
+    def render_ass(self, output_path: str) -> Optional[str]:
+        """
+        Render with the ffmpeg/ASS backend: one ffmpeg run, no per-frame Python.
+        Returns None if ffmpeg failed, so the caller can use the compositor.
+        """
+        with self.profiler.span('audio'):
+            self.audio = self.prepare_audio()
+        try:
+            with self.profiler.span('ffmpeg_render', lyrics=len(self.timeline), backend='ffmpeg'):
+                frames = render_with_ass(
+                    self.timeline, self.background_url, output_path,
+                    self.width, self.height, self.fps, self.encoder_profile['settings'],
+                    style=self.project_config.get('style'),
+                    active_scale=ACTIVE_WORD_SCALE,
+                    audio_path=self.audio['path'] if self.audio else self.audio_url,
+                    audio_copy=self.audio is not None,
+                    preview_collector=self.preview_collector,
+                    progress_callback=self._report_progress,
+                )
+        except EncodeError as e:
+            print(f"ffmpeg render backend failed, falling back to the compositor: {e}")
+            return None
+        # Same shape as the compositor's stats; ffmpeg composites every pixel
+        self.composite_stats = {
+            'backend': 'ffmpeg',
+            'frames': frames,
+            'skipped_frames': 0,
+            'composited_pixels': frames * self.width * self.height,
+            'total_pixels': frames * self.width * self.height,
+            'composited_ratio': 1.0,
+        }
+        return output_path
+    
+    def render(self, output_path: str, hls_dir: Optional[str] = None) -> str:
+        """
+        Mock render method. With "output_mode": "hls" the frames are encoded
+        for real into progressive HLS segments (see render_hls). Styles the
+        ffmpeg backend can draw are rendered by it instead (see render_ass).
+        """
         print("Mock LyricVideoRenderer: Starting render...")
-        rendered_path = simulate_render_process(self.project_config, output_path)
+        if self.project_id:
+            get_project_sync().update(self.project_id, status='processing', render_progress=0)
+        self.profiler.start_cprofile()
+        try:
+            self.preview_collector = self._create_preview_collector(output_path)
+            self.backend = choose_backend(self.project_config)
+            started = time.perf_counter()
+            if self.backend == 'ffmpeg':
+                rendered_path = self.render_ass(output_path)
+                if rendered_path is None:
+                    # The failed run may have fed the collector some frames already
+                    self.backend = 'numpy'
+                    self.preview_collector = self._create_preview_collector(output_path)
+            if self.backend == 'numpy':
+                if self.project_config.get('output_mode') == 'hls':
+                    rendered_path = self.render_hls(
+                        output_path, hls_dir or f"{os.path.splitext(output_path)[0]}_hls"
+                    )
+                    self.composite_stats = self.compositor.stats()
+                else:
+                    rendered_path = self._render_mock(output_path)
+            
+            elapsed = time.perf_counter() - started
+            if elapsed > 0:
+                self.encode_fps = round(self.composite_stats['frames'] / elapsed, 2)
+            
+            if self.preview_collector:
+                with self.profiler.span('previews'):
+                    try:
+                        self.previews = self.preview_collector.finish()
+                    except Exception as e:
+                        print(f"Preview generation failed: {e}")
+        except LeaseLost:
+            # Another render worker owns the job and the project's status now
+            raise
+        except Exception:
+            if self.project_id:
+                get_project_sync().update(self.project_id, status='failed')
+            raise
+        finally:
+            self.profiler.stop_cprofile()
         
         # Upload to Supabase if project_id is present
         project_id = self.project_config.get('project_id')
         if project_id:
-            public_url = upload_video_to_supabase(rendered_path, project_id)
-            if public_url:
-                # We could potentially return the public_url instead or store it in the config
-                self.project_config['video_url'] = public_url
+            public_url = None
+            try:
+                with self.profiler.span('upload'):
+                    public_url = upload_video_to_supabase(rendered_path, project_id, self.previews)
+            finally:
+                if public_url:
+                    # We could potentially return the public_url instead or store it in the config
+                    self.project_config['video_url'] = public_url
+                else:
+                    # Rendered, but the editor has no video to show; don't leave it 'processing'
+                    sync = get_project_sync()
+                    sync.update(project_id, status='failed')
+                    sync.flush()
                 
         return rendered_path
-
+    
+    def _render_mock(self, output_path: str) -> str:
+        if self.preview_collector:
+            # Previews are cut from the composited frames
+            with self.profiler.span('composite', lyrics=len(self.timeline)):
+                for _ in self.iter_frames():
+                    pass
+            self.composite_stats = self.compositor.stats()
+        else:
+            # The mock encoder takes no frames, so none are composited
+            frames = len(self.frame_plan())
+            self.composite_stats = {
+                'frames': frames,
+                'skipped_frames': frames,
+                'composited_pixels': 0,
+                'total_pixels': frames * self.width * self.height,
+                'composited_ratio': 0.0,
+            }
+        
+        with self.profiler.span('encode', profile=self.encoder_profile['name']):
+            return simulate_render_process(
+                self.project_config, output_path, self.encoder_profile['settings']
+            )
 
 if __name__ == '__main__':
     # Example usage for testing
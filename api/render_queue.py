@@ -0,0 +1,303 @@
+"""
+Shared Render Job Queue
+Render jobs handed to `python -m api.worker` processes, possibly on several
+machines. A worker claims a job with a time-limited lease and renews it with
+heartbeats that also carry progress. If a worker dies, its lease expires and
+the job is claimed again by another worker.
+
+Backends, chosen with RENDER_QUEUE:
+    sqlite:///path/to/render_queue.db   workers on one host (or tests)
+    supabase                            workers on any host, via the
+                                        render_jobs table and RPC functions
+When RENDER_QUEUE is unset the API renders in-process as before.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Optional
+
+from lyric_timeline import as_timeline, decode_config, encode_config
+
+QUEUE_URL = os.environ.get("RENDER_QUEUE", "")
+LEASE_SECONDS = int(os.environ.get("RENDER_LEASE_SECONDS", "30"))
+# Heartbeats (and progress updates) are sent this often while rendering
+HEARTBEAT_SECONDS = float(os.environ.get("RENDER_HEARTBEAT_SECONDS", "2"))
+# A job whose worker died this many times is failed instead of retried
+MAX_ATTEMPTS = int(os.environ.get("RENDER_MAX_ATTEMPTS", "3"))
+
+# Status values match JobStatus in the API servers
+PENDING = "PENDING"
+PROCESSING = "PROCESSING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+WORKER_LOST_ERROR = 'Render worker stopped responding'
+
+
+class LeaseLost(Exception):
+    """Another worker owns the job now; the current render must stop without reporting anything"""
+
+
+def _job_from_row(row: Dict) -> Dict:
+    """
+    Flatten a stored job into the shape of the API's in-memory job entries:
+    id, status, progress, message, config, created_at, ... plus everything the
+    worker reported in its state (output_path, encoder_profile, previews, ...)
+    """
+    state = row.get('state') or {}
+    if isinstance(state, str):
+        state = json.loads(state)
+
+    job = {
+        **state,
+        'id': row['id'],
+        'status': row['status'],
+        'progress': row['progress'] or 0,
+        'message': row['message'] or '',
+        'config': decode_config(row['config']),
+        'worker': row['worker'],
+        'attempts': row['attempts'],
+        'created_at': row['created_at'],
+        'completed_at': row['completed_at'],
+    }
+    if row.get('error'):
+        job['error'] = row['error']
+    return job
+
+
+def _stored_config(project_config: Dict) -> bytes:
+    # Lyrics are stored in the compact columnar form
+    return encode_config({**project_config, 'lyrics': as_timeline(project_config.get('lyrics'))})
+
+
+class RenderQueue:
+    """SQLite-backed render queue; the database must be on a local disk shared by the workers"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    progress INTEGER DEFAULT 0,
+                    message TEXT,
+                    state TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    lease_expires_at REAL,
+                    created_at TEXT NOT NULL,
+                    completed_at TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs (status, created_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def enqueue(self, project_config: Dict) -> str:
+        job_id = str(uuid.uuid4())
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO render_jobs (id, status, config, message, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, PENDING, _stored_config(project_config).decode(), 'Job queued', datetime.now().isoformat())
+            )
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Dict]:
+        """Atomically take the oldest pending job or one whose lease expired"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Give up on jobs whose workers keep dying
+            conn.execute(
+                'UPDATE render_jobs SET status = ?, error = ?, completed_at = ? '
+                'WHERE status = ? AND lease_expires_at < ? AND attempts >= ?',
+                (FAILED, WORKER_LOST_ERROR, datetime.now().isoformat(), PROCESSING, now, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                'SELECT * FROM render_jobs '
+                'WHERE status = ? OR (status = ? AND lease_expires_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (PENDING, PROCESSING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                'UPDATE render_jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires_at = ? '
+                'WHERE id = ?',
+                (PROCESSING, worker_id, now + lease_seconds, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        job = _job_from_row(dict(row))
+        job.update(status=PROCESSING, worker=worker_id, attempts=row['attempts'] + 1)
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: int, message: str, state: Dict,
+                  lease_seconds: int = LEASE_SECONDS) -> bool:
+        """Renew the lease and report progress. False means the lease was lost to another worker."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'UPDATE render_jobs SET lease_expires_at = ?, progress = ?, message = ?, state = ? '
+                'WHERE id = ? AND worker = ? AND status = ?',
+                (time.time() + lease_seconds, progress, message, json.dumps(state), job_id, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, state: Dict) -> bool:
+        return self._finish(job_id, worker_id, COMPLETED, state, None, 'Render complete!')
+
+    def fail(self, job_id: str, worker_id: str, state: Dict, error: str) -> bool:
+        return self._finish(job_id, worker_id, FAILED, state, error, f'Render failed: {error}')
+
+    def _finish(self, job_id, worker_id, status, state, error, message) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'UPDATE render_jobs SET status = ?, progress = ?, message = ?, state = ?, error = ?, '
+                'completed_at = ?, lease_expires_at = NULL '
+                'WHERE id = ? AND worker = ? AND status = ?',
+                (status, 100 if status == COMPLETED else 0, message, json.dumps(state), error,
+                 datetime.now().isoformat(), job_id, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker_id: str):
+        """Hand a job back to the queue (worker shutting down) without counting an attempt"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE render_jobs SET status = ?, worker = NULL, lease_expires_at = NULL, '
+                'attempts = attempts - 1, message = ? WHERE id = ? AND worker = ? AND status = ?',
+                (PENDING, 'Job queued', job_id, worker_id, PROCESSING)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM render_jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job_from_row(dict(row)) if row else None
+
+    def active_count(self, exclude: Optional[str] = None) -> int:
+        """Number of render jobs queued or in progress"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM render_jobs WHERE status IN (?, ?) AND id != ?',
+                (PENDING, PROCESSING, exclude or '')
+            ).fetchone()
+        return row[0]
+
+
+class SupabaseRenderQueue:
+    """
+    Render queue in the Supabase Postgres database (see the render_jobs
+    migration). Claims and heartbeats run as RPC functions so leases use the
+    database clock and FOR UPDATE SKIP LOCKED, not the workers' clocks.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from render_engine import get_supabase_client
+            client = get_supabase_client()
+        if client is None:
+            raise RuntimeError('RENDER_QUEUE=supabase needs SUPABASE_URL and SUPABASE_KEY')
+        self.client = client
+
+    def enqueue(self, project_config: Dict) -> str:
+        job_id = str(uuid.uuid4())
+        self.client.table('render_jobs').insert({
+            'id': job_id,
+            'status': PENDING,
+            'config': json.loads(_stored_config(project_config)),
+            'message': 'Job queued',
+        }).execute()
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Dict]:
+        rows = self.client.rpc('claim_render_job', {
+            'p_worker': worker_id,
+            'p_lease_seconds': lease_seconds,
+            'p_max_attempts': MAX_ATTEMPTS,
+        }).execute().data
+        return _job_from_row(rows[0]) if rows else None
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: int, message: str, state: Dict,
+                  lease_seconds: int = LEASE_SECONDS) -> bool:
+        return bool(self.client.rpc('heartbeat_render_job', {
+            'p_id': job_id,
+            'p_worker': worker_id,
+            'p_lease_seconds': lease_seconds,
+            'p_progress': progress,
+            'p_message': message,
+            'p_state': state,
+        }).execute().data)
+
+    def complete(self, job_id: str, worker_id: str, state: Dict) -> bool:
+        return self._finish(job_id, worker_id, {
+            'status': COMPLETED, 'progress': 100, 'message': 'Render complete!', 'state': state
+        })
+
+    def fail(self, job_id: str, worker_id: str, state: Dict, error: str) -> bool:
+        return self._finish(job_id, worker_id, {
+            'status': FAILED, 'progress': 0, 'message': f'Render failed: {error}', 'state': state, 'error': error
+        })
+
+    def _finish(self, job_id: str, worker_id: str, values: Dict) -> bool:
+        values.update(completed_at=datetime.now().isoformat(), lease_expires_at=None)
+        rows = (
+            self.client.table('render_jobs').update(values)
+            .eq('id', job_id).eq('worker', worker_id).eq('status', PROCESSING)
+            .execute().data
+        )
+        return bool(rows)
+
+    def release(self, job_id: str, worker_id: str):
+        self.client.rpc('release_render_job', {'p_id': job_id, 'p_worker': worker_id}).execute()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        rows = self.client.table('render_jobs').select('*').eq('id', job_id).execute().data
+        return _job_from_row(rows[0]) if rows else None
+
+    def active_count(self, exclude: Optional[str] = None) -> int:
+        query = self.client.table('render_jobs').select('id', count='exact').in_('status', [PENDING, PROCESSING])
+        if exclude:
+            query = query.neq('id', exclude)
+        return query.execute().count or 0
+
+
+def open_render_queue(queue_url: str):
+    """Queue for a RENDER_QUEUE-style URL: sqlite:///relative/path, sqlite:////absolute/path or supabase"""
+    if queue_url == 'supabase':
+        return SupabaseRenderQueue()
+    if queue_url.startswith('sqlite:///'):
+        return RenderQueue(queue_url[len('sqlite:///'):])
+    raise ValueError(f'Unsupported RENDER_QUEUE: {queue_url}')
+
+
+_queue = None
+
+
+def get_render_queue():
+    """The configured shared render queue, or None when the API renders in-process"""
+    global _queue
+    if not QUEUE_URL:
+        return None
+    if _queue is None:
+        _queue = open_render_queue(QUEUE_URL)
+    return _queue
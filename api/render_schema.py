@@ -0,0 +1,166 @@
+"""
+Render Request Schema
+Shared, typed validation of /api/render payloads for the Flask and FastAPI servers.
+The body (JSON or MessagePack) is decoded straight into msgspec structs and the
+lyric timing checks run as array operations, so every timing and file problem
+is reported in a single response. Structural errors (a missing field, a wrong
+type, a value out of range) stop decoding, so only the first one is reported.
+"""
+
+import os
+import uuid
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Union
+
+import msgspec
+import numpy as np
+
+from audio_prep import MAX_LOUDNESS, MIN_LOUDNESS
+from lyric_timeline import LyricTimeline, TimelineColumns, as_timeline, is_msgpack
+
+# Keep error responses small for very long transcriptions
+MAX_ERRORS_PER_CHECK = 10
+# Longest video a render request may ask for
+MAX_VIDEO_SECONDS = int(os.environ.get("MAX_VIDEO_SECONDS", "1800"))
+# Lyric times are stored as int32 milliseconds
+MAX_TIME_MS = 2 ** 31 - 1
+Milliseconds = Union[
+    Annotated[int, msgspec.Meta(ge=0, le=MAX_TIME_MS)],
+    Annotated[float, msgspec.Meta(ge=0, le=MAX_TIME_MS)],
+]
+
+
+class LyricWord(msgspec.Struct):
+    text: str
+    start: Milliseconds
+    end: Milliseconds
+
+
+class ProfileOptions(msgspec.Struct, omit_defaults=True):
+    # Record a frame timing span every N frames
+    frame_interval: Optional[Annotated[int, msgspec.Meta(gt=0)]] = None
+    cprofile: Optional[bool] = None
+
+
+class PreviewOptions(msgspec.Struct, omit_defaults=True):
+    # Seconds between scrub sprite thumbnails
+    interval: Optional[Annotated[float, msgspec.Meta(gt=0)]] = None
+    format: Optional[Literal['jpg', 'webp']] = None
+    # Milliseconds into the video for the poster frame
+    poster_time: Optional[Annotated[float, msgspec.Meta(ge=0)]] = None
+
+
+class RenderRequest(msgspec.Struct, omit_defaults=True):
+    background_url: str
+    audio_url: str
+    # A list of words or the columnar form from lyric_timeline
+    lyrics: Union[List[LyricWord], TimelineColumns]
+    # editor_projects id; returned in project_config as a lowercase string
+    project_id: Optional[uuid.UUID] = None
+    # true, or {"frame_interval": 30, "cprofile": true}; see profiling.profiler_from_config
+    profile: Union[bool, ProfileOptions, None] = None
+    # Pin an encoder profile instead of letting the scheduler pick one from load
+    encoder_profile: Optional[Literal['draft', 'standard', 'high']] = None
+    priority: Optional[Literal['low', 'normal', 'high']] = None
+    # "hls" streams fMP4 segments while rendering, in addition to the final MP4
+    output_mode: Optional[Literal['file', 'hls']] = None
+    # false disables poster/sprite generation; otherwise {"interval": 2, "format": "jpg", "poster_time": 1500}
+    previews: Union[bool, PreviewOptions, None] = None
+    # true for -14 LUFS loudness normalization, or a LUFS target such as -16
+    # true for the default target, or an integrated loudness target in LUFS
+    audio_normalize: Union[bool, Annotated[float, msgspec.Meta(ge=MIN_LOUDNESS, le=MAX_LOUDNESS)], None] = None
+    # {"font", "font_size", "text_color", "stroke_color", "stroke_width"}; see ass_backend.DEFAULT_STYLE
+    style: Optional[Dict[str, Any]] = None
+    # "auto" uses the ffmpeg/ASS backend when it can draw the style, else the NumPy compositor
+    render_backend: Optional[Literal['auto', 'ffmpeg', 'numpy']] = None
+
+
+_decoder = msgspec.json.Decoder(RenderRequest)
+_msgpack_decoder = msgspec.msgpack.Decoder(RenderRequest)
+
+
+def _index_errors(indices: np.ndarray, message: str) -> List[str]:
+    errors = [f'Lyric at index {i} {message}' for i in indices[:MAX_ERRORS_PER_CHECK]]
+    if len(indices) > MAX_ERRORS_PER_CHECK:
+        errors.append(f'...and {len(indices) - MAX_ERRORS_PER_CHECK} more lyrics {message}')
+    return errors
+
+
+def timing_arrays(lyrics: Union[List[LyricWord], LyricTimeline]) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(lyrics, LyricTimeline):
+        return lyrics.starts, lyrics.ends
+
+    count = len(lyrics)
+    starts = np.fromiter((word.start for word in lyrics), dtype=np.float64, count=count)
+    ends = np.fromiter((word.end for word in lyrics), dtype=np.float64, count=count)
+    return starts, ends
+
+
+def validate_lyric_timing(starts: np.ndarray, ends: np.ndarray) -> List[str]:
+    """
+    Check non-negative starts, end > start, monotonic start order, overlaps and
+    the video length limit for all words at once
+    """
+    errors = _index_errors(np.flatnonzero(starts < 0), 'starts before 0 ms')
+    errors += _index_errors(np.flatnonzero(ends <= starts), 'has invalid timing (end must be > start)')
+    errors += _index_errors(np.flatnonzero(ends > MAX_VIDEO_SECONDS * 1000),
+                            f'ends after the {MAX_VIDEO_SECONDS} s video length limit')
+
+    if len(starts) > 1:
+        errors += _index_errors(np.flatnonzero(starts[1:] < starts[:-1]) + 1,
+                                'starts before the previous lyric (lyrics must be in time order)')
+        errors += _index_errors(np.flatnonzero(starts[1:] < ends[:-1]) + 1,
+                                'overlaps the previous lyric')
+    return errors
+
+
+def validate_render_request(body: bytes, content_type: Optional[str] = None) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Decode and validate a render request body. MessagePack bodies are
+    recognized by their Content-Type; anything else is parsed as JSON.
+
+    Returns (project_config, []) on success or (None, errors) listing every
+    timing and file problem found (only the first structural error).
+    Columnar lyrics stay columnar: project_config['lyrics'] is then a
+    LyricTimeline instead of a list of dicts.
+    """
+    msgpack = is_msgpack(content_type)
+    try:
+        render_request = (_msgpack_decoder if msgpack else _decoder).decode(body)
+    except msgspec.ValidationError as e:
+        return None, [str(e)]
+    except msgspec.DecodeError as e:
+        return None, [f"Invalid {'MessagePack' if msgpack else 'JSON'} body: {e}"]
+
+    lyrics = render_request.lyrics
+    if isinstance(lyrics, TimelineColumns):
+        try:
+            lyrics = as_timeline(lyrics)
+        except ValueError as e:
+            return None, [f'Invalid lyric timeline: {e}']
+
+    errors = []
+
+    # Validate file paths exist
+    if not os.path.exists(render_request.background_url):
+        errors.append(f'Background file not found: {render_request.background_url}')
+
+    if not os.path.exists(render_request.audio_url):
+        errors.append(f'Audio file not found: {render_request.audio_url}')
+
+    if len(lyrics) == 0:
+        errors.append('Lyrics must be a non-empty array')
+    else:
+        errors += validate_lyric_timing(*timing_arrays(lyrics))
+
+    if errors:
+        return None, errors
+
+    if isinstance(lyrics, LyricTimeline):
+        project_config = msgspec.to_builtins(msgspec.structs.replace(render_request, lyrics=[]))
+        project_config['lyrics'] = lyrics
+        return project_config, []
+    return msgspec.to_builtins(render_request), []
+
+
+def error_summary(errors: List[str]) -> str:
+    return errors[0] if len(errors) == 1 else f'{len(errors)} validation errors: {errors[0]}'
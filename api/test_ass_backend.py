@@ -0,0 +1,140 @@
+"""
+Test script for the ffmpeg/ASS render backend
+
+Checks backend selection and the generated ASS script, then renders a short
+video with both backends (needs ffmpeg built with libass).
+
+    python test_ass_backend.py
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+from ass_backend import build_ass_script, choose_backend, ffmpeg_has_libass, is_still_image
+from lyric_timeline import LyricTimeline
+from media_tools import find_ffmpeg
+from render_engine import LyricVideoRenderer
+
+
+def test_backend_selection():
+    config = {'background_url': __file__, 'audio_url': __file__, 'lyrics': []}
+    expected = 'ffmpeg' if ffmpeg_has_libass() else 'numpy'
+    assert choose_backend(config) == expected
+    assert choose_backend({**config, 'style': {'text_color': '#FFD700', 'font_size': 100}}) == expected
+
+    assert choose_backend({**config, 'render_backend': 'numpy'}) == 'numpy'
+    assert choose_backend({**config, 'style': {'animation': 'bounce'}}) == 'numpy'
+    assert choose_backend({**config, 'style': {'text_color': 'chartreuse-ish'}}) == 'numpy'
+    assert choose_backend({**config, 'output_mode': 'hls'}) == 'numpy'
+    assert choose_backend({**config, 'background_url': '/missing.mp4'}) == 'numpy'
+    print('✅ Backend selection')
+
+
+def test_ass_script():
+    timeline = LyricTimeline.from_words([
+        {'text': 'Hello {world}', 'start': 0, 'end': 1234},
+        {'text': 'again', 'start': 1234, 'end': 3725999},
+    ])
+    script = build_ass_script(timeline, 1080, 1920, {'text_color': '#FFD700'}, active_scale=1.1)
+
+    assert 'PlayResX: 1080' in script and 'PlayResY: 1920' in script
+    # &HAABBGGRR
+    assert 'Style: Lyric,Inter,80,&H0000D7FF,' in script
+    events = [line for line in script.splitlines() if line.startswith('Dialogue:')]
+    assert events[0].startswith('Dialogue: 0,0:00:00.00,0:00:01.23,')
+    assert events[0].endswith('\\t(0,80,\\fscx110\\fscy110)}Hello \\{world\\}')
+    assert events[1].startswith('Dialogue: 0,0:00:01.23,1:02:05.99,')
+    print('✅ ASS script')
+
+
+def test_render_matches_compositor_output():
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg_has_libass():
+        print('⚠️  Skipping render test: ffmpeg with libass is not available')
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='ass_backend_')
+    background = os.path.join(work_dir, 'background.mp4')
+    audio = os.path.join(work_dir, 'audio.wav')
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', 'testsrc2=size=1920x1080:rate=25:duration=2', '-pix_fmt', 'yuv420p', background], check=True)
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=duration=6', audio], check=True)
+
+    config = {
+        'background_url': background,
+        'audio_url': audio,
+        'encoder_profile': 'draft',
+        'lyrics': [{'text': f'word{i}', 'start': i * 400, 'end': i * 400 + 350} for i in range(10)],
+    }
+    progress = []
+    renderer = LyricVideoRenderer(config, progress_callback=progress.append)
+    output = renderer.render(os.path.join(work_dir, 'ffmpeg.mp4'))
+    compositor = LyricVideoRenderer({**config, 'render_backend': 'numpy'})
+    compositor.render(os.path.join(work_dir, 'numpy.mp4'))
+
+    assert renderer.backend == 'ffmpeg' and compositor.backend == 'numpy'
+    # Same frame plan and preview layout from both backends
+    assert renderer.composite_stats['frames'] == compositor.composite_stats['frames']
+    assert renderer.previews['thumbnail_size'] == compositor.previews['thumbnail_size']
+    assert progress
+
+    probe = subprocess.run([ffmpeg, '-hide_banner', '-i', output], capture_output=True, text=True).stderr
+    assert 'Video: h264' in probe and '1080x1920' in probe and 'Audio: aac' in probe
+    print(f"✅ ffmpeg backend rendered {renderer.composite_stats['frames']} frames at {renderer.encode_fps} fps")
+
+
+def decode_frame(ffmpeg: str, video: str, frame_index: int) -> np.ndarray:
+    raw = subprocess.run([ffmpeg, '-loglevel', 'error', '-i', video, '-vf', f"select='eq(n,{frame_index})'",
+                          '-frames:v', '1', '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'],
+                         capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(1920, 1080, 3)
+
+
+def test_still_image_background_draws_text():
+    """A JPG background is looped as a still picture and the lyrics are drawn on it"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg_has_libass():
+        print('⚠️  Skipping still image test: ffmpeg with libass is not available')
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='ass_backend_')
+    background = os.path.join(work_dir, 'background.jpg')
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', 'color=c=0x203040:size=1280x720', '-frames:v', '1', background], check=True)
+    assert is_still_image(background) and not is_still_image(__file__)
+
+    config = {
+        'background_url': background,
+        'encoder_profile': 'draft',
+        'previews': False,
+        # A word is on screen for 0-1.2s and 1.6-2s; 1.2-1.6s is a gap
+        'lyrics': [{'text': 'HELLO', 'start': 0, 'end': 1200}, {'text': 'WORLD', 'start': 1600, 'end': 2000}],
+    }
+    renderer = LyricVideoRenderer(config)
+    output = os.path.join(work_dir, 'still.mp4')
+    # Looping a still with -stream_loop used to keep ffmpeg running forever
+    render = threading.Thread(target=renderer.render, args=(output,), daemon=True)
+    render.start()
+    render.join(timeout=120)
+    assert not render.is_alive(), 'render with a JPG background did not finish'
+    assert renderer.backend == 'ffmpeg'
+    assert renderer.composite_stats['frames'] == 2 * renderer.fps
+
+    # White text with a black stroke in the middle of the frame during a word, only background in the gap
+    lyric = decode_frame(ffmpeg, output, int(0.5 * renderer.fps))[760:1160]
+    gap = decode_frame(ffmpeg, output, int(1.4 * renderer.fps))[760:1160]
+    assert (lyric.min(axis=2) > 200).sum() > 2000, 'no text drawn during a lyric'
+    assert (lyric.max(axis=2) < 30).sum() > 200, 'no stroke drawn during a lyric'
+    assert (gap.min(axis=2) > 200).sum() == 0
+    print(f"✅ JPG background rendered {renderer.composite_stats['frames']} frames with lyrics drawn")
+
+
+if __name__ == '__main__':
+    test_backend_selection()
+    test_ass_script()
+    test_render_matches_compositor_output()
+    test_still_image_background_draws_text()
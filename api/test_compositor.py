@@ -0,0 +1,111 @@
+"""
+Test script for the dirty-rectangle compositor (compositor.py)
+
+Checks that reusing the frame buffer and re-blending only dirty rectangles
+gives the same frames as compositing every frame from scratch, and that
+composite_stats counts the work that was actually done.
+
+    python test_compositor.py
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from compositor import FrameCompositor, Overlay
+from render_engine import LyricVideoRenderer
+
+WIDTH, HEIGHT = 160, 120
+
+
+def full_composite(background: np.ndarray, overlays) -> np.ndarray:
+    """Reference: blend every overlay over a fresh copy of the background"""
+    frame = background.astype(np.float32)
+    for overlay in overlays:
+        h, w = overlay.rgba.shape[:2]
+        x0, y0 = max(overlay.x, 0), max(overlay.y, 0)
+        x1, y1 = min(overlay.x + w, WIDTH), min(overlay.y + h, HEIGHT)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        patch = overlay.rgba[y0 - overlay.y:y1 - overlay.y, x0 - overlay.x:x1 - overlay.x].astype(np.float32)
+        alpha = patch[..., 3:4] / 255
+        target = frame[y0:y1, x0:x1]
+        frame[y0:y1, x0:x1] = np.rint(target + (patch[..., :3] - target) * alpha)
+    return frame.astype(np.uint8)
+
+
+def patch(h: int, w: int, alpha: int, seed: int) -> np.ndarray:
+    rgba = np.random.default_rng(seed).integers(0, 256, (h, w, 4), dtype=np.uint8)
+    rgba[..., 3] = alpha
+    return rgba
+
+
+def test_dirty_rects_match_full_composite():
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    word = Overlay(key=('word', 1), x=40, y=50, rgba=patch(20, 50, 255, 1))
+    moved = Overlay(key=('word', 1), x=48, y=56, rgba=word.rgba)
+    glow = Overlay(key=('glow',), x=30, y=40, rgba=patch(40, 60, 128, 2))
+    offscreen = Overlay(key=('edge',), x=-10, y=100, rgba=patch(30, 30, 200, 3))
+    # Static frames, a word appearing, moving, overlapping a translucent patch, clipped at the edge, gaps
+    sequence = [[], [], [word], [word], [moved], [glow, moved], [glow, moved], [offscreen], [], [word, offscreen]]
+
+    compositor = FrameCompositor(WIDTH, HEIGHT)
+    for overlays in sequence:
+        frame = compositor.composite(background, overlays)
+        difference = np.abs(frame.astype(int) - full_composite(background, overlays)).max()
+        assert difference <= 1, f'frame differs from a full composite by {difference}'
+
+    stats = compositor.stats()
+    assert stats['frames'] == len(sequence)
+    # Frame 2 ([] again), 4 and 7 ([glow, moved] again) reuse the previous frame
+    assert stats['skipped_frames'] == 3, stats
+    assert stats['total_pixels'] == len(sequence) * WIDTH * HEIGHT
+    assert WIDTH * HEIGHT < stats['composited_pixels'] < stats['total_pixels'] / 2, stats
+    print(f"✅ Dirty rectangles match a full composite ({stats['composited_ratio']:.1%} of pixels blended)")
+
+
+def test_background_change_redraws_frame():
+    compositor = FrameCompositor(WIDTH, HEIGHT)
+    word = Overlay(key=('word',), x=10, y=10, rgba=patch(10, 10, 255, 4))
+    dark = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    light = np.full((HEIGHT, WIDTH, 3), 200, dtype=np.uint8)
+
+    compositor.composite(dark, [word])
+    frame = compositor.composite(light, [word], background_changed=True)
+    assert np.array_equal(frame, full_composite(light, [word]))
+    assert compositor.stats()['composited_pixels'] == 2 * WIDTH * HEIGHT
+    assert compositor.stats()['skipped_frames'] == 0
+    print('✅ A changed background redraws the whole frame')
+
+
+def test_renderer_composite_stats():
+    lyrics = [{'text': f'word{i}', 'start': i * 500, 'end': i * 500 + 400} for i in range(6)]
+    config = {'background_url': __file__, 'audio_url': __file__, 'render_backend': 'numpy', 'lyrics': lyrics}
+    work_dir = tempfile.mkdtemp(prefix='compositor_')
+
+    composited = LyricVideoRenderer(config)
+    composited.render(os.path.join(work_dir, 'previews.mp4'))
+    stats = composited.composite_stats
+    assert stats['frames'] == len(composited.frame_plan())
+    # Only the first frame and the frames where a word appears or disappears are blended:
+    # word 0 is on screen from frame 0 and the video ends with the last word
+    assert stats['skipped_frames'] == stats['frames'] - 1 - (2 * len(lyrics) - 2), stats
+    assert 0 < stats['composited_ratio'] < 0.2, stats
+
+    # Without previews nothing uses the frames, so none are composited
+    skipped = LyricVideoRenderer({**config, 'previews': False})
+    skipped.render(os.path.join(work_dir, 'no_previews.mp4'))
+    assert skipped.compositor.frames == 0
+    assert skipped.composite_stats == {
+        'frames': stats['frames'], 'skipped_frames': stats['frames'], 'composited_pixels': 0,
+        'total_pixels': stats['total_pixels'], 'composited_ratio': 0.0,
+    }
+    print(f"✅ composite_stats: {stats['skipped_frames']}/{stats['frames']} frames skipped")
+
+
+if __name__ == '__main__':
+    test_dirty_rects_match_full_composite()
+    test_background_change_redraws_frame()
+    test_renderer_composite_stats()
@@ -0,0 +1,85 @@
+"""
+Test script for load-based encoder profile selection (encoder_profiles.py)
+
+Checks the profile chosen for each queue depth, how request priorities shift
+it, pinned profiles, and the queue depth the render queue reports.
+
+    python test_encoder_profiles.py
+"""
+
+import os
+import tempfile
+
+from encoder_profiles import (DRAFT_MIN_DEPTH, ENCODER_PROFILES, HIGH_QUALITY_MAX_DEPTH,
+                              select_encoder_profile)
+from render_engine import LyricVideoRenderer
+from render_queue import RenderQueue
+
+
+def profile_name(queue_depth: int, priority=None, pinned=None) -> str:
+    return select_encoder_profile(queue_depth, priority=priority, pinned=pinned)['name']
+
+
+def test_selection_by_queue_depth():
+    assert profile_name(0) == 'high'
+    assert profile_name(HIGH_QUALITY_MAX_DEPTH) == 'high'
+    assert profile_name(HIGH_QUALITY_MAX_DEPTH + 1) == 'standard'
+    assert profile_name(DRAFT_MIN_DEPTH) == 'standard'
+    assert profile_name(DRAFT_MIN_DEPTH + 1) == 'draft'
+
+    profile = select_encoder_profile(5)
+    assert profile['reason'] == 'queue depth 5, priority normal' and profile['queue_depth'] == 5
+    # Callers may tweak the settings without changing the shared table
+    profile['settings']['crf'] = 0
+    assert ENCODER_PROFILES['standard']['crf'] != 0
+    print(f'✅ high up to {HIGH_QUALITY_MAX_DEPTH} queued jobs, draft above {DRAFT_MIN_DEPTH}')
+
+
+def test_priority_shifts_one_step():
+    busy = DRAFT_MIN_DEPTH + 1
+    middle = HIGH_QUALITY_MAX_DEPTH + 1
+    assert [profile_name(middle, priority) for priority in ('low', 'normal', 'high')] == ['draft', 'standard', 'high']
+    assert profile_name(busy, 'high') == 'standard'
+    # Clamped at both ends
+    assert profile_name(0, 'high') == 'high'
+    assert profile_name(busy, 'low') == 'draft'
+    # Unknown priorities (direct callers; requests are validated) count as normal
+    assert profile_name(middle, 'urgent') == 'standard'
+    print('✅ Priorities shift the profile one step')
+
+
+def test_pinned_profile():
+    profile = select_encoder_profile(DRAFT_MIN_DEPTH + 50, priority='low', pinned='high')
+    assert profile['name'] == 'high' and profile['reason'] == 'pinned by request'
+    try:
+        select_encoder_profile(0, pinned='lossless')
+        raise AssertionError('unknown profile was accepted')
+    except ValueError as e:
+        assert str(e) == 'Unknown encoder profile: lossless'
+    print('✅ Pinned profiles ignore load and priority')
+
+
+def test_queue_depth_and_renderer_settings():
+    queue = RenderQueue(os.path.join(tempfile.mkdtemp(), 'queue.db'))
+    config = {'background_url': __file__, 'audio_url': __file__, 'lyrics': []}
+    job_ids = [queue.enqueue(config) for _ in range(HIGH_QUALITY_MAX_DEPTH + 2)]
+    claimed = queue.claim('worker')
+    assert claimed['id'] == job_ids[0]
+
+    # Pending and processing jobs count, the job being scheduled does not
+    depth = queue.active_count(exclude=claimed['id'])
+    assert depth == HIGH_QUALITY_MAX_DEPTH + 1
+    assert profile_name(depth) == 'standard'
+    assert queue.complete(claimed['id'], 'worker', {})
+    assert queue.active_count() == HIGH_QUALITY_MAX_DEPTH + 1
+
+    renderer = LyricVideoRenderer(config, encoder_profile=select_encoder_profile(DRAFT_MIN_DEPTH + 1))
+    assert renderer.fps == ENCODER_PROFILES['draft']['fps']
+    print(f'✅ Queue depth {depth} selects the standard profile')
+
+
+if __name__ == '__main__':
+    test_selection_by_queue_depth()
+    test_priority_shifts_one_step()
+    test_pinned_profile()
+    test_queue_depth_and_renderer_settings()
@@ -0,0 +1,124 @@
+"""
+Test script for the columnar lyric timeline (lyric_timeline.py)
+
+Checks that word lists survive the columnar MessagePack and JSON round trips,
+that malformed columns are rejected, and that both servers pick MessagePack
+or JSON from the Accept header's q-values.
+
+    python test_lyric_timeline.py
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault('TRANSCRIBE_QUEUE_DB', os.path.join(tempfile.mkdtemp(prefix='lyric_timeline_'), 'queue.db'))
+
+import msgspec  # noqa: E402
+import numpy as np  # noqa: E402
+
+from lyric_timeline import (LyricTimeline, TimelineColumns, accepts_msgpack, decode_config,  # noqa: E402
+                            decode_timeline, encode_config, encode_msgpack_response, encode_timeline)
+
+WORDS = [
+    {'text': 'la', 'start': 0, 'end': 400},
+    {'text': 'la', 'start': 400, 'end': 800},
+    {'text': 'café', 'start': 1500, 'end': 2250},
+    {'text': 'la', 'start': 2250, 'end': 2600},
+    {'text': '', 'start': 3_600_000, 'end': 3_600_001},
+]
+
+
+def test_round_trips():
+    timeline = LyricTimeline.from_words(WORDS)
+    # Repeated words share one string
+    assert timeline.strings == ['la', 'café', ''] and timeline.text_index.tolist() == [0, 0, 1, 0, 2]
+
+    assert decode_timeline(encode_timeline(timeline)).to_words() == WORDS
+    config = decode_config(encode_config({'style': {'font': 'Inter'}, 'lyrics': timeline}))
+    assert config['style'] == {'font': 'Inter'} and config['lyrics'].to_words() == WORDS
+
+    response = msgspec.msgpack.decode(encode_msgpack_response({'success': True, 'lyrics': WORDS}))
+    columns = msgspec.convert(response['lyrics'], TimelineColumns)
+    assert LyricTimeline.from_columns(columns).to_words() == WORDS
+    assert np.frombuffer(columns.start_deltas, dtype='<i4').tolist() == [0, 400, 1100, 750, 3_597_750]
+
+    # Fractional milliseconds are rounded; an empty timeline round-trips too
+    assert LyricTimeline.from_words([{'text': 'a', 'start': 0.4, 'end': 99.6}]).to_words() == [
+        {'text': 'a', 'start': 0, 'end': 100}]
+    assert decode_timeline(encode_timeline(LyricTimeline.from_words([]))).to_words() == []
+    print(f'✅ {len(WORDS)} words round-trip through MessagePack, stored configs and responses')
+
+
+def test_malformed_columns_are_rejected():
+    columns = LyricTimeline.from_words(WORDS).to_columns()
+    broken = {
+        'text_index is not a whole number of uint32 values': {'text_index': columns.text_index[:-1]},
+        'durations must hold 5 int32 values, one per word': {'durations': columns.durations[:-4]},
+        'text_index points past the end of strings': {'strings': ['la']},
+        'Lyric times do not fit in int32 milliseconds': {
+            'start_deltas': np.array([2**31 - 1, 1, 0, 0, 0], dtype='<i4').tobytes()},
+    }
+    for message, fields in broken.items():
+        try:
+            LyricTimeline.from_columns(msgspec.structs.replace(columns, **fields))
+            raise AssertionError(f'accepted columns with: {message}')
+        except ValueError as e:
+            assert str(e) == message, e
+    print('✅ Malformed columns are rejected')
+
+
+def test_accept_negotiation():
+    cases = {
+        None: False,
+        '': False,
+        'application/json': False,
+        'application/msgpack': True,
+        'application/x-msgpack, application/json;q=0.9': True,
+        'application/json, application/msgpack;q=0.5': False,
+        'application/msgpack;q=0': False,
+        'application/msgpack;q=0.8, */*;q=0.1': True,
+        'application/msgpack;q=0.5, application/*;q=0.9': False,
+        # Ties go to MessagePack, which the client named explicitly
+        'application/vnd.msgpack, application/json': True,
+        'APPLICATION/MSGPACK; Q=0.7': True,
+        'application/msgpack;q=bogus, application/json;q=0.5': True,
+    }
+    for accept, expected in cases.items():
+        assert accepts_msgpack(accept) is expected, accept
+    print(f'✅ {len(cases)} Accept headers negotiated by q-value')
+
+
+def test_servers_negotiate_transcription_status():
+    from transcribe_worker import get_transcription_queue
+
+    queue = get_transcription_queue(start_workers=False)
+    job_id = queue.enqueue('/tmp/unused.pcm')
+    queue.claim('test-worker')
+    queue.complete(job_id, 'test-worker', {'lyrics': WORDS, 'duration': 3600.0, 'language': 'en', 'text': ''})
+
+    from fastapi.testclient import TestClient
+    import index
+    import index_fastapi
+
+    servers = {
+        'Flask': index.app.test_client().get,
+        'FastAPI': TestClient(index_fastapi.app).get,
+    }
+    for name, get in servers.items():
+        preferred = get(f'/api/transcribe/{job_id}', headers={'Accept': 'application/msgpack, application/json;q=0.5'})
+        assert preferred.headers['Content-Type'].startswith('application/msgpack'), name
+        assert 'Accept' in preferred.headers['Vary'], name
+        body = msgspec.msgpack.decode(preferred.data if name == 'Flask' else preferred.content)
+        assert LyricTimeline.from_columns(msgspec.convert(body['lyrics'], TimelineColumns)).to_words() == WORDS
+
+        declined = get(f'/api/transcribe/{job_id}', headers={'Accept': 'application/json, application/msgpack;q=0.2'})
+        assert declined.headers['Content-Type'].startswith('application/json'), name
+        assert (declined.json if name == 'Flask' else declined.json())['lyrics'] == WORDS, name
+    print('✅ Flask and FastAPI negotiate the transcription status response')
+
+
+if __name__ == '__main__':
+    test_round_trips()
+    test_malformed_columns_are_rejected()
+    test_accept_negotiation()
+    test_servers_negotiate_transcription_status()
@@ -0,0 +1,117 @@
+"""
+Test script for render request validation (render_schema.py)
+
+Checks that timing and file problems are all reported in one response, that
+lyric times and the video length are bounded, and that bad options are
+rejected with a message naming the field.
+
+    python test_render_schema.py
+"""
+
+import json
+
+import msgspec
+
+from lyric_timeline import LyricTimeline
+from render_schema import MAX_ERRORS_PER_CHECK, MAX_VIDEO_SECONDS, validate_render_request
+
+
+def request(lyrics, **options) -> bytes:
+    return json.dumps({'background_url': __file__, 'audio_url': __file__, 'lyrics': lyrics, **options}).encode()
+
+
+def errors_for(body: bytes, content_type: str = 'application/json'):
+    config, errors = validate_render_request(body, content_type)
+    assert (config is None) == bool(errors)
+    return errors
+
+
+def test_valid_request():
+    config, errors = validate_render_request(request([{'text': 'Hello', 'start': 0, 'end': 500}]))
+    assert errors == [] and config['lyrics'] == [{'text': 'Hello', 'start': 0, 'end': 500}]
+    print('✅ Valid request')
+
+
+def test_timing_errors_are_aggregated():
+    lyrics = [
+        {'text': 'a', 'start': 1000, 'end': 900},   # end before start
+        {'text': 'b', 'start': 500, 'end': 600},    # out of order
+        {'text': 'c', 'start': 550, 'end': 700},    # overlaps b
+    ]
+    body = json.dumps({'background_url': '/missing.mp4', 'audio_url': __file__, 'lyrics': lyrics}).encode()
+    errors = errors_for(body)
+    assert errors == [
+        'Background file not found: /missing.mp4',
+        'Lyric at index 0 has invalid timing (end must be > start)',
+        'Lyric at index 1 starts before the previous lyric (lyrics must be in time order)',
+        'Lyric at index 1 overlaps the previous lyric',
+        'Lyric at index 2 overlaps the previous lyric',
+    ], errors
+
+    # Long transcriptions are capped per check
+    backwards = [{'text': 'x', 'start': i * 10 + 5, 'end': i * 10} for i in range(25)]
+    errors = errors_for(request(backwards))
+    assert len(errors) == MAX_ERRORS_PER_CHECK + 1
+    assert errors[-1] == f'...and {25 - MAX_ERRORS_PER_CHECK} more lyrics has invalid timing (end must be > start)'
+    print(f'✅ {len(errors)} timing errors reported in one response')
+
+
+def test_structural_errors_report_the_first_problem():
+    errors = errors_for(request([{'text': 'a', 'start': 'soon', 'end': 10}, {'text': 'b', 'end': 20}]))
+    assert errors == ['Expected `int | float`, got `str` - at `$.lyrics[0].start`'], errors
+    assert errors_for(request([])) == ['Lyrics must be a non-empty array']
+    assert errors_for(b'{"lyrics": [')[0].startswith('Invalid JSON body')
+    print('✅ Structural errors report the first problem')
+
+
+def test_lyric_time_bounds():
+    assert errors_for(request([{'text': 'a', 'start': -5, 'end': 10}])) == [
+        'Expected `int` >= 0 - at `$.lyrics[0].start`']
+    # Used to wrap around to a negative int32
+    assert errors_for(request([{'text': 'a', 'start': 0, 'end': 3e9}])) == [
+        'Expected `float` <= 2147483647.0 - at `$.lyrics[0].end`']
+    assert errors_for(request([{'text': 'a', 'start': 0, 'end': MAX_VIDEO_SECONDS * 1000 + 1}])) == [
+        f'Lyric at index 0 ends after the {MAX_VIDEO_SECONDS} s video length limit']
+    assert errors_for(request([{'text': 'a', 'start': 0, 'end': MAX_VIDEO_SECONDS * 1000}])) == []
+
+    try:
+        LyricTimeline.from_words([{'text': 'a', 'start': 0, 'end': 3e9}])
+        raise AssertionError('out of range time was accepted')
+    except ValueError as e:
+        assert str(e) == 'Lyric times do not fit in int32 milliseconds'
+    print('✅ Lyric times and video length are bounded')
+
+
+def test_columnar_timing_is_checked():
+    # Negative starts can only arrive through start deltas
+    timeline = LyricTimeline.from_words([
+        {'text': 'a', 'start': 0, 'end': 100},
+        {'text': 'b', 'start': 200, 'end': 300},
+    ])
+    timeline.starts[0] = -50
+    body = msgspec.msgpack.encode({'background_url': __file__, 'audio_url': __file__, 'lyrics': timeline.to_columns()})
+    assert errors_for(body, 'application/msgpack') == ['Lyric at index 0 starts before 0 ms']
+    print('✅ Columnar timelines are checked like word lists')
+
+
+def test_options_are_validated():
+    lyrics = [{'text': 'a', 'start': 0, 'end': 10}]
+    rejected = {
+        'audio_normalize': (0, 'Expected `float` <= -5.0 - at `$.audio_normalize`'),
+        'previews': ({'interval': 0}, 'Expected `float` > 0.0 - at `$.previews.interval`'),
+        'profile': ({'frame_interval': 'x'}, 'Expected `int | null`, got `str` - at `$.profile.frame_interval`'),
+    }
+    for key, (value, message) in rejected.items():
+        errors = errors_for(request(lyrics, **{key: value}))
+        assert errors == [message], (key, errors)
+    assert errors_for(request(lyrics, audio_normalize=-16, previews=False, profile={'frame_interval': 30})) == []
+    print('✅ Invalid options are rejected with the field name')
+
+
+if __name__ == '__main__':
+    test_valid_request()
+    test_timing_errors_are_aggregated()
+    test_structural_errors_report_the_first_problem()
+    test_lyric_time_bounds()
+    test_columnar_timing_is_checked()
+    test_options_are_validated()
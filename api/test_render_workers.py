@@ -0,0 +1,210 @@
+"""
+Test script for the multi-worker render queue
+
+Runs several render worker processes against a local SQLite queue and checks
+that every job is rendered exactly once, and that a job whose worker stops
+heartbeating is re-queued.
+
+    python test_render_workers.py
+"""
+
+import os
+import tempfile
+import time
+
+os.environ.setdefault('RENDER_OUTPUT_DIR', tempfile.mkdtemp(prefix='render_workers_'))
+
+from render_queue import COMPLETED, FAILED, PENDING, PROCESSING, RenderQueue  # noqa: E402
+from worker import start_worker_pool  # noqa: E402
+
+
+def make_config(word_count: int = 8) -> dict:
+    return {
+        'background_url': __file__,
+        'audio_url': __file__,
+        'previews': False,
+        # The stand-in media files are not real video; skip the ffmpeg backend
+        'render_backend': 'numpy',
+        'lyrics': [
+            {'text': f'word{i}', 'start': i * 250, 'end': i * 250 + 200}
+            for i in range(word_count)
+        ],
+    }
+
+
+def test_expired_lease_is_reclaimed():
+    """A worker that stops heartbeating loses the job to the next claim"""
+    queue = RenderQueue(os.path.join(tempfile.mkdtemp(), 'queue.db'))
+    job_id = queue.enqueue(make_config())
+
+    dead = queue.claim('dead-worker', lease_seconds=0)
+    assert dead['id'] == job_id and dead['attempts'] == 1
+    assert len(dead['config']['lyrics']) == 8
+
+    time.sleep(0.01)
+    alive = queue.claim('live-worker')
+    assert alive['id'] == job_id and alive['attempts'] == 2
+
+    # The old owner can neither renew nor finish the job any more
+    assert not queue.heartbeat(job_id, 'dead-worker', 50, 'Processing video...', {})
+    assert not queue.complete(job_id, 'dead-worker', {})
+    assert queue.heartbeat(job_id, 'live-worker', 50, 'Processing video...', {'hls_dir': None})
+    assert queue.get(job_id)['progress'] == 50
+
+    queue.release(job_id, 'live-worker')
+    assert queue.get(job_id)['status'] == PENDING
+    print('✅ Expired leases are re-claimed')
+
+
+def test_job_fails_after_max_attempts():
+    import render_queue
+    queue = RenderQueue(os.path.join(tempfile.mkdtemp(), 'queue.db'))
+    job_id = queue.enqueue(make_config())
+
+    for attempt in range(render_queue.MAX_ATTEMPTS):
+        assert queue.claim(f'worker-{attempt}', lease_seconds=0)['id'] == job_id
+        time.sleep(0.01)
+
+    assert queue.claim('another-worker') is None
+    job = queue.get(job_id)
+    assert job['status'] == FAILED and job['error'] == render_queue.WORKER_LOST_ERROR
+    print('✅ Jobs whose workers keep dying are failed')
+
+
+def test_workers_render_every_job_once(job_count: int = 6, worker_count: int = 3):
+    db_path = os.path.join(tempfile.mkdtemp(), 'queue.db')
+    queue = RenderQueue(db_path)
+    job_ids = [queue.enqueue(make_config()) for _ in range(job_count)]
+
+    pool = start_worker_pool(worker_count, f'sqlite:///{db_path}')
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            jobs = [queue.get(job_id) for job_id in job_ids]
+            if all(job['status'] not in (PENDING, PROCESSING) for job in jobs):
+                break
+            time.sleep(0.5)
+    finally:
+        for process in pool:
+            process.terminate()
+            process.join()
+
+    for job in jobs:
+        assert job['status'] == COMPLETED, job
+        assert job['attempts'] == 1
+        assert job['progress'] == 100
+        assert os.path.exists(job['output_path'])
+        assert job['lyrics_count'] == 8
+
+    workers = {job['worker'] for job in jobs}
+    print(f'✅ {job_count} jobs rendered once each by {len(workers)} worker(s)')
+
+
+def test_worker_survives_queue_errors():
+    """Claim and complete errors (e.g. "database is locked") are retried instead of killing the worker"""
+    import sqlite3
+    import worker
+
+    queue = RenderQueue(os.path.join(tempfile.mkdtemp(), 'queue.db'))
+    job_id = queue.enqueue(make_config())
+
+    class FlakyQueue:
+        def __init__(self):
+            self.claim_errors = 2
+            self.complete_errors = 1
+
+        def __getattr__(self, name):
+            return getattr(queue, name)
+
+        def claim(self, worker_id, **kwargs):
+            if queue.get(job_id)['status'] == COMPLETED:
+                # Stops run_worker once the job is done
+                raise KeyboardInterrupt
+            if self.claim_errors:
+                self.claim_errors -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return queue.claim(worker_id, **kwargs)
+
+        def complete(self, *args):
+            if self.complete_errors:
+                self.complete_errors -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return queue.complete(*args)
+
+    flaky = FlakyQueue()
+    open_render_queue, poll_interval = worker.open_render_queue, worker.POLL_INTERVAL
+    worker.open_render_queue, worker.POLL_INTERVAL = (lambda url: flaky), 0.01
+    try:
+        worker.run_worker('sqlite:///unused')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.open_render_queue, worker.POLL_INTERVAL = open_render_queue, poll_interval
+
+    job = queue.get(job_id)
+    assert job['status'] == COMPLETED and job['attempts'] == 1, job
+    assert flaky.claim_errors == 0 and flaky.complete_errors == 0
+    print('✅ Workers retry queue errors instead of exiting')
+
+
+def test_worker_survives_unexpected_errors():
+    """An error escaping render_job fails that job; the worker goes on to the next one"""
+    import worker
+
+    queue = RenderQueue(os.path.join(tempfile.mkdtemp(), 'queue.db'))
+    broken, healthy = queue.enqueue(make_config()), queue.enqueue(make_config())
+
+    render_job = worker.render_job
+
+    def flaky_render_job(queue_, job, worker_id):
+        if job['id'] == broken:
+            raise RuntimeError('unexpected')
+        render_job(queue_, job, worker_id)
+        # Both jobs are finished; stop run_worker
+        raise KeyboardInterrupt
+
+    open_render_queue, poll_interval = worker.open_render_queue, worker.POLL_INTERVAL
+    worker.open_render_queue, worker.POLL_INTERVAL, worker.render_job = (lambda url: queue), 0.01, flaky_render_job
+    try:
+        worker.run_worker('sqlite:///unused')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.open_render_queue, worker.POLL_INTERVAL, worker.render_job = open_render_queue, poll_interval, render_job
+
+    assert queue.get(broken)['status'] == FAILED and queue.get(broken)['error'] == 'unexpected'
+    assert queue.get(healthy)['status'] == COMPLETED
+    print('✅ Workers fail the job and keep running on unexpected errors')
+
+
+def test_lost_lease_leaves_project_status_alone():
+    """The worker that lost the job must not mark the project failed; the new owner reports it"""
+    import uuid
+    import project_sync
+    from render_engine import LyricVideoRenderer
+    from render_queue import LeaseLost
+
+    def lose_lease(fraction):
+        raise LeaseLost('Lease on job was lost')
+
+    project_sync._sync = project_sync.ProjectSync(client=None, interval=3600)
+    project_id = str(uuid.uuid4())
+    # Previews keep the frame loop (and its progress reports) running in the mock render
+    renderer = LyricVideoRenderer({**make_config(), 'previews': True, 'project_id': project_id},
+                                  progress_callback=lose_lease)
+    try:
+        renderer.render(os.path.join(tempfile.mkdtemp(), 'lost.mp4'))
+        raise AssertionError('render did not stop')
+    except LeaseLost:
+        pass
+    assert project_sync._sync.pending()[project_id]['status'] == 'processing'
+    print('✅ A lost lease stops the render without marking the project failed')
+
+
+if __name__ == '__main__':
+    test_expired_lease_is_reclaimed()
+    test_job_fails_after_max_attempts()
+    test_workers_render_every_job_once()
+    test_worker_survives_queue_errors()
+    test_worker_survives_unexpected_errors()
+    test_lost_lease_leaves_project_status_alone()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Out-of-process Transcription Workers
+
+Transcription jobs are queued in a local SQLite database and processed by a
+pool of worker processes that keep their Whisper model resident, so a large
+transcription cannot starve the web server of memory or CPU.
+
+Run the pool as its own service:
+
+    python transcribe_worker.py --workers 2
+
+or let the API start it on first use (the default unless
+TRANSCRIBE_EXTERNAL_WORKERS=1 is set).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional
+
+QUEUE_DB_PATH = os.environ.get(
+    "TRANSCRIBE_QUEUE_DB",
+    os.path.join(tempfile.gettempdir(), "lyric_transcribe_queue.db")
+)
+WORKER_COUNT = int(os.environ.get("TRANSCRIBE_WORKERS", "1"))
+EXTERNAL_WORKERS = os.environ.get("TRANSCRIBE_EXTERNAL_WORKERS", "").lower() in ("1", "true", "yes")
+
+POLL_INTERVAL = 0.5
+# A worker holds a job for this long and renews the lease with heartbeats while
+# it transcribes; a job whose lease expires is claimed again by another worker
+LEASE_SECONDS = int(os.environ.get("TRANSCRIBE_LEASE_SECONDS", "60"))
+HEARTBEAT_SECONDS = float(os.environ.get("TRANSCRIBE_HEARTBEAT_SECONDS", "10"))
+# A job whose worker died this many times is failed instead of retried
+MAX_ATTEMPTS = int(os.environ.get("TRANSCRIBE_MAX_ATTEMPTS", "3"))
+
+# Status values match JobStatus in the API servers
+PENDING = "PENDING"
+PROCESSING = "PROCESSING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+WORKER_LOST_ERROR = 'Transcription worker stopped responding'
+
+
+class TranscriptionQueue:
+    """Small SQLite-backed job queue shared by the API and the workers"""
+
+    def __init__(self, db_path: str = QUEUE_DB_PATH):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcription_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    audio_path TEXT NOT NULL,
+                    model TEXT,
+                    progress INTEGER DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    lease_expires_at REAL,
+                    created_at TEXT NOT NULL,
+                    completed_at TEXT
+                )
+            ''')
+            # Queue databases created before leases were added
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(transcription_jobs)')}
+            for column, definition in (('progress', 'INTEGER DEFAULT 0'), ('message', 'TEXT'),
+                                       ('attempts', 'INTEGER DEFAULT 0'), ('lease_expires_at', 'REAL')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE transcription_jobs ADD COLUMN {column} {definition}')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_transcription_jobs_status '
+                'ON transcription_jobs (status, created_at)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def enqueue(self, audio_path: str, model: Optional[str] = None) -> str:
+        job_id = str(uuid.uuid4())
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO transcription_jobs (id, status, audio_path, model, message, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, PENDING, audio_path, model, 'Transcription job queued', datetime.now().isoformat())
+            )
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Dict]:
+        """Atomically take the oldest pending job or one whose lease expired"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Give up on jobs whose workers keep dying, and drop their uploads
+            abandoned = conn.execute(
+                'SELECT audio_path FROM transcription_jobs '
+                'WHERE status = ? AND lease_expires_at < ? AND attempts >= ?',
+                (PROCESSING, now, MAX_ATTEMPTS)
+            ).fetchall()
+            conn.execute(
+                'UPDATE transcription_jobs SET status = ?, progress = 0, message = ?, error = ?, completed_at = ? '
+                'WHERE status = ? AND lease_expires_at < ? AND attempts >= ?',
+                (FAILED, f'Transcription failed: {WORKER_LOST_ERROR}', WORKER_LOST_ERROR,
+                 datetime.now().isoformat(), PROCESSING, now, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                'SELECT * FROM transcription_jobs '
+                'WHERE status = ? OR (status = ? AND lease_expires_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (PENDING, PROCESSING, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    'UPDATE transcription_jobs SET status = ?, worker = ?, attempts = attempts + 1, '
+                    'lease_expires_at = ?, progress = ?, message = ? WHERE id = ?',
+                    (PROCESSING, worker_id, now + lease_seconds, 10, 'Transcribing audio...', row['id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        for (audio_path,) in abandoned:
+            if os.path.exists(audio_path):
+                os.unlink(audio_path)
+        if row is None:
+            return None
+
+        job = dict(row)
+        job.update(status=PROCESSING, worker=worker_id, attempts=row['attempts'] + 1)
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+        """Renew the lease. False means the lease was lost to another worker."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'UPDATE transcription_jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = ?',
+                (time.time() + lease_seconds, job_id, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        return self._finish(job_id, worker_id, COMPLETED, json.dumps(result), None, 'Transcription complete!')
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._finish(job_id, worker_id, FAILED, None, error, f'Transcription failed: {error}')
+
+    def _finish(self, job_id, worker_id, status, result, error, message) -> bool:
+        """Store the outcome if this worker still holds the job"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'UPDATE transcription_jobs SET status = ?, progress = ?, message = ?, result = ?, error = ?, '
+                'completed_at = ?, lease_expires_at = NULL WHERE id = ? AND worker = ? AND status = ?',
+                (status, 100 if status == COMPLETED else 0, message, result, error,
+                 datetime.now().isoformat(), job_id, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM transcription_jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class JobLease:
+    """Renews a claimed job's lease from a background thread while it is transcribed"""
+
+    def __init__(self, queue: TranscriptionQueue, job_id: str, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(HEARTBEAT_SECONDS):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    return
+            except Exception as e:
+                # The lease may still be valid; try again on the next beat
+                print(f'Heartbeat for transcription job {self.job_id} failed: {e}')
+
+
+def run_worker(db_path: str = QUEUE_DB_PATH, model_name: Optional[str] = None):
+    """Worker loop: claim a job, transcribe it with the resident model, store the result"""
+    # Imported here so the API process never loads whisper through this module
+    from transcription import DEFAULT_MODEL, transcribe_audio, get_whisper_model
+
+    queue = TranscriptionQueue(db_path)
+    worker_id = f"{os.uname().nodename}:{os.getpid()}"
+    get_whisper_model(model_name or DEFAULT_MODEL)
+    print(f'Transcription worker {worker_id} ready')
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        finished = False
+        try:
+            with JobLease(queue, job['id'], worker_id):
+                try:
+                    result = transcribe_audio(job['audio_path'], job['model'] or model_name or DEFAULT_MODEL)
+                    if len(result['lyrics']) == 0:
+                        finished = queue.fail(job['id'], worker_id,
+                                              'No words detected in audio. Please ensure the audio contains speech.')
+                    else:
+                        finished = queue.complete(job['id'], worker_id, result)
+                except Exception as e:
+                    print(f"Transcription job {job['id']} failed: {e}")
+                    finished = queue.fail(job['id'], worker_id, str(e))
+        finally:
+            # A job taken over by another worker still needs its upload
+            if finished and os.path.exists(job['audio_path']):
+                os.unlink(job['audio_path'])
+        if not finished:
+            print(f"Transcription job {job['id']} was taken over by another worker; result discarded")
+
+
+def start_worker_pool(workers: int = WORKER_COUNT, db_path: str = QUEUE_DB_PATH,
+                      model_name: Optional[str] = None) -> List[multiprocessing.Process]:
+    """Start daemon worker processes (spawned, so they do not inherit the web server)"""
+    return [_start_worker(db_path, model_name) for _ in range(max(1, workers))]
+
+
+def _start_worker(db_path: str = QUEUE_DB_PATH, model_name: Optional[str] = None) -> multiprocessing.Process:
+    process = multiprocessing.get_context('spawn').Process(target=run_worker, args=(db_path, model_name), daemon=True)
+    process.start()
+    return process
+
+
+_queue: Optional[TranscriptionQueue] = None
+_pool: List[multiprocessing.Process] = []
+_pool_lock = threading.Lock()
+
+
+def get_transcription_queue(start_workers: bool = True) -> TranscriptionQueue:
+    """
+    Return the API's queue handle, starting the embedded worker pool on first
+    use (and replacing any worker that died since) unless workers run as a
+    separate service
+    """
+    global _queue, _pool
+    with _pool_lock:
+        if _queue is None:
+            _queue = TranscriptionQueue()
+        if start_workers and not EXTERNAL_WORKERS:
+            _pool = [process for process in _pool if process.is_alive()]
+            _pool += [_start_worker() for _ in range(max(1, WORKER_COUNT) - len(_pool))]
+    return _queue
+
+
+def job_status_response(job: Dict) -> Dict:
+    """Status payload for a transcription job, with the same fields as the render job status"""
+    response = {
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'progress': job['progress'] or 0,
+        'message': job['message'] or '',
+        'created_at': job['created_at'],
+    }
+
+    if job['status'] in (COMPLETED, FAILED):
+        response['completed_at'] = job['completed_at']
+        if job['status'] == COMPLETED:
+            response.update(job['result'] or {})
+        else:
+            response['error'] = job['error']
+
+    return response
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run transcription workers')
+    parser.add_argument('--workers', type=int, default=WORKER_COUNT)
+    parser.add_argument('--db', default=QUEUE_DB_PATH)
+    parser.add_argument('--model', default=None)
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(args.db, args.model)
+    else:
+        for process in start_worker_pool(args.workers, args.db, args.model):
+            process.join()
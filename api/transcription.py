@@ -0,0 +1,81 @@
+"""
+Whisper Transcription Helpers
+Shared by the Flask and FastAPI servers. Whisper (and torch) are imported on
+first use so that API workers which never transcribe do not pay for them.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List
+
+from audio_ingest import load_pcm
+
+# You can use 'tiny', 'base', 'small', 'medium', 'large' based on needs
+DEFAULT_MODEL = os.environ.get("WHISPER_MODEL", "base")
+
+_models: Dict[str, Any] = {}
+_model_lock = threading.Lock()
+
+
+def get_whisper_model(model_name: str = DEFAULT_MODEL):
+    """
+    Load a Whisper model once per process and keep it resident
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _model_lock:
+        if model_name not in _models:
+            import whisper
+            print(f'Loading Whisper model "{model_name}"...')
+            _models[model_name] = whisper.load_model(model_name)
+        return _models[model_name]
+
+
+def extract_word_timestamps(result: Dict) -> List[Dict]:
+    """Flatten Whisper segments into the `lyrics` shape used by the editor"""
+    lyrics = []
+
+    for segment in result.get('segments', []):
+        for word_info in segment.get('words', []):
+            lyrics.append({
+                'text': word_info['word'].strip(),
+                'start': int(word_info['start'] * 1000),  # Convert to milliseconds
+                'end': int(word_info['end'] * 1000)       # Convert to milliseconds
+            })
+
+    return lyrics
+
+
+def transcribe_audio(audio_path: str, model_name: str = DEFAULT_MODEL) -> Dict:
+    """
+    Transcribe an audio file with word-level timestamps.
+    Raw 16 kHz mono .pcm files from audio_ingest are passed to Whisper as a
+    waveform so they are not decoded a second time.
+
+    Returns:
+    {
+        "lyrics": [{"text": "Hello", "start": 0, "end": 800}, ...],
+        "duration": 10.5,
+        "language": "en",
+        "text": "Hello ..."
+    }
+    """
+    model = get_whisper_model(model_name)
+
+    print(f'Transcribing audio file: {audio_path}')
+    audio = load_pcm(audio_path) if audio_path.endswith('.pcm') else audio_path
+    result = model.transcribe(
+        audio,
+        word_timestamps=True,
+        verbose=False
+    )
+
+    segments = result.get('segments')
+    return {
+        'lyrics': extract_word_timestamps(result),
+        'duration': segments[-1].get('end', 0) if segments else 0,
+        'language': result.get('language', 'unknown'),
+        'text': result.get('text', '')
+    }
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Render Workers
+
+Claim render jobs from the shared queue (render_queue.py), render them and
+report progress back through lease heartbeats. Run any number of them, on
+any number of machines, against the same queue:
+
+    RENDER_QUEUE=sqlite:////shared/render_queue.db python -m api.worker --workers 2
+    RENDER_QUEUE=supabase python -m api.worker
+
+Renders are written to RENDER_OUTPUT_DIR, which must be storage the API can
+also read (it serves /api/download, /api/stream and /api/previews from it).
+A worker that stops heartbeating loses its lease and the job is picked up
+by another worker.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Sibling modules use flat imports (the servers run from api/), so make them
+# importable when started as `python -m api.worker` from the repository root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from render_queue import HEARTBEAT_SECONDS, QUEUE_URL, LeaseLost, open_render_queue  # noqa: E402
+
+RENDER_OUTPUT_DIR = os.environ.get(
+    "RENDER_OUTPUT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "renders")
+)
+WORKER_COUNT = int(os.environ.get("RENDER_WORKERS", "1"))
+POLL_INTERVAL = 1.0
+# Queue calls that fail (network, "database is locked") are retried with a doubling delay up to this
+MAX_RETRY_DELAY = 30.0
+# Tries to store a job's result before leaving it to lease expiry
+FINISH_ATTEMPTS = 5
+
+
+class JobLease:
+    """
+    Renews a claimed job's lease from a background thread while it renders.
+    Each heartbeat carries the latest progress, message and state.
+    """
+
+    def __init__(self, queue, job_id: str, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.progress = 0
+        self.message = 'Starting render...'
+        self.state: Dict = {}
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def report(self, progress: int, message: Optional[str] = None, **state):
+        """Record progress for the next heartbeat; raises LeaseLost once another worker owns the job"""
+        if self.lost.is_set():
+            raise LeaseLost(f'Lease on job {self.job_id} was lost')
+        self.progress = progress
+        if message:
+            self.message = message
+        self.state.update(state)
+
+    def beat(self):
+        try:
+            renewed = self.queue.heartbeat(self.job_id, self.worker_id, self.progress, self.message, self.state)
+        except Exception as e:
+            # The lease may still be valid; try again on the next beat
+            print(f'Heartbeat for job {self.job_id} failed: {e}')
+            return
+        if not renewed:
+            self.lost.set()
+
+    def _run(self):
+        while not self._stopped.wait(HEARTBEAT_SECONDS):
+            self.beat()
+
+
+def _retry_delay(failures: int) -> float:
+    return min(POLL_INTERVAL * 2 ** failures, MAX_RETRY_DELAY)
+
+
+def finish_job(finish, job_id: str, *args) -> Optional[bool]:
+    """
+    Call queue.complete or queue.fail, retrying with backoff while the lease is
+    still being renewed. Returns None if the queue stayed unreachable; the
+    lease then expires and another worker renders the job again.
+    """
+    for attempt in range(FINISH_ATTEMPTS):
+        if attempt:
+            time.sleep(_retry_delay(attempt - 1))
+        try:
+            return finish(job_id, *args)
+        except Exception as e:
+            print(f'Storing the result of job {job_id} failed (attempt {attempt + 1}): {e}')
+    return None
+
+
+def render_job(queue, job: Dict, worker_id: str):
+    """Render one claimed job and store the result (same fields the API keeps for in-process jobs)"""
+    from render_engine import LyricVideoRenderer
+    from encoder_profiles import select_encoder_profile
+    from profiling import profiler_from_config
+
+    job_id = job['id']
+    project_config = job['config']
+    profiler = None
+
+    with JobLease(queue, job_id, worker_id) as lease:
+        try:
+            profiler = profiler_from_config(project_config)
+            lease.report(10, 'Loading audio...')
+            # Pick encoder settings from the shared queue depth unless the request pinned a profile
+            try:
+                active_jobs = queue.active_count(exclude=job_id)
+            except Exception as e:
+                print(f'Could not read the queue depth, assuming an idle queue: {e}')
+                active_jobs = 0
+            encoder_profile = select_encoder_profile(
+                active_jobs,
+                priority=project_config.get('priority'),
+                pinned=project_config.get('encoder_profile')
+            )
+            lease.report(10, encoder_profile=encoder_profile)
+
+            with profiler.span('load'):
+                renderer = LyricVideoRenderer(
+                    project_config, profiler=profiler, encoder_profile=encoder_profile,
+                    progress_callback=lambda fraction: lease.report(30 + int(fraction * 60))
+                )
+
+            output_path = os.path.join(RENDER_OUTPUT_DIR, f"{job_id}.mp4")
+            hls_dir = None
+            if project_config.get('output_mode') == 'hls':
+                hls_dir = os.path.join(RENDER_OUTPUT_DIR, f"{job_id}_hls")
+            lease.report(30, 'Processing video...', hls_dir=hls_dir)
+            # Publish the encoder profile and stream location right away
+            lease.beat()
+
+            with profiler.span('render'):
+                rendered_path = renderer.render(output_path, hls_dir=hls_dir)
+            lease.report(90, 'Finalizing...')
+
+            state = {
+                **lease.state,
+                'output_path': rendered_path,
+                'video_url': project_config.get('video_url'),
+                'composite_stats': renderer.composite_stats,
+                'encode_fps': renderer.encode_fps,
+                'previews': renderer.previews,
+            }
+            if len(renderer.timeline):
+                state['duration'] = int(renderer.timeline.ends[-1]) / 1000
+                state['lyrics_count'] = len(renderer.timeline)
+            if profiler.enabled:
+                state['trace'] = profiler.to_chrome_trace()
+
+            if finish_job(queue.complete, job_id, worker_id, state) is False:
+                print(f'Job {job_id} was taken over by another worker; result discarded')
+        except LeaseLost as e:
+            print(f'{e}; stopping this render')
+        except Exception as e:
+            print(f'Render job {job_id} failed: {e}')
+            state = dict(lease.state)
+            if profiler is not None and profiler.enabled:
+                state['trace'] = profiler.to_chrome_trace()
+            finish_job(queue.fail, job_id, worker_id, state, str(e))
+
+
+def run_worker(queue_url: str = QUEUE_URL):
+    """Worker loop: claim a job, render it while heartbeating, store the result"""
+    if not queue_url:
+        raise SystemExit('Set RENDER_QUEUE (e.g. sqlite:////shared/render_queue.db or supabase)')
+
+    queue = open_render_queue(queue_url)
+    worker_id = f"{os.uname().nodename}:{os.getpid()}"
+    os.makedirs(RENDER_OUTPUT_DIR, exist_ok=True)
+    # Exit through SystemExit so the current job is handed back below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f'Render worker {worker_id} ready')
+
+    failures = 0
+    while True:
+        try:
+            job = queue.claim(worker_id)
+        except Exception as e:
+            # Keep the worker alive through queue outages; jobs wait in the queue meanwhile
+            delay = _retry_delay(failures)
+            failures += 1
+            print(f'Render worker {worker_id} could not claim a job ({e}); retrying in {delay:.0f}s')
+            time.sleep(delay)
+            continue
+        failures = 0
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        print(f"Render worker {worker_id} claimed job {job['id']} (attempt {job['attempts']})")
+        try:
+            render_job(queue, job, worker_id)
+        except Exception as e:
+            # render_job stores render errors itself; this is anything else, so keep the worker running
+            print(f"Render worker {worker_id} failed on job {job['id']}: {e}")
+            finish_job(queue.fail, job['id'], worker_id, {}, str(e))
+        except (KeyboardInterrupt, SystemExit):
+            try:
+                queue.release(job['id'], worker_id)
+            except Exception as e:
+                print(f"Could not hand job {job['id']} back, it is re-queued when its lease expires: {e}")
+            raise
+
+
+def start_worker_pool(workers: int = WORKER_COUNT, queue_url: str = QUEUE_URL) -> List[multiprocessing.Process]:
+    """Start worker processes (spawned, so each gets a fresh interpreter)"""
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for _ in range(max(1, workers)):
+        process = context.Process(target=run_worker, args=(queue_url,))
+        process.start()
+        processes.append(process)
+    return processes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run render workers against the shared render queue')
+    parser.add_argument('--workers', type=int, default=WORKER_COUNT)
+    parser.add_argument('--queue', default=QUEUE_URL, help='RENDER_QUEUE URL (default: $RENDER_QUEUE)')
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(args.queue)
+    else:
+        pool = start_worker_pool(args.workers, args.queue)
+        # Pass SIGTERM on so every worker hands its job back
+        signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in pool])
+        for process in pool:
+            process.join()
@@ -0,0 +1,8 @@
+-- Poster frame and scrub sprite generated during render
+
+ALTER TABLE public.editor_projects ADD COLUMN IF NOT EXISTS poster_url TEXT;
+ALTER TABLE public.editor_projects ADD COLUMN IF NOT EXISTS sprite_url TEXT;
+ALTER TABLE public.editor_projects ADD COLUMN IF NOT EXISTS sprite_vtt_url TEXT;
+
+-- Ask PostgREST to refresh its schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,84 @@
+-- Shared render job queue for multi-node render workers (api/render_queue.py)
+
+CREATE TABLE IF NOT EXISTS public.render_jobs (
+  id UUID PRIMARY KEY,
+  status TEXT NOT NULL DEFAULT 'PENDING',
+  config JSONB NOT NULL,
+  progress INTEGER DEFAULT 0,
+  message TEXT,
+  state JSONB,
+  error TEXT,
+  worker TEXT,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON public.render_jobs (status, created_at);
+
+-- Only the API and workers (service role) use the queue
+ALTER TABLE public.render_jobs ENABLE ROW LEVEL SECURITY;
+
+-- Take the oldest pending job, or one whose worker stopped renewing its lease
+CREATE OR REPLACE FUNCTION public.claim_render_job(p_worker TEXT, p_lease_seconds INTEGER, p_max_attempts INTEGER)
+RETURNS SETOF public.render_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE public.render_jobs
+     SET status = 'FAILED', error = 'Render worker stopped responding', completed_at = NOW()
+   WHERE status = 'PROCESSING' AND lease_expires_at < NOW() AND attempts >= p_max_attempts;
+
+  RETURN QUERY
+  UPDATE public.render_jobs
+     SET status = 'PROCESSING',
+         worker = p_worker,
+         attempts = attempts + 1,
+         lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+   WHERE id = (
+     SELECT id FROM public.render_jobs
+      WHERE status = 'PENDING' OR (status = 'PROCESSING' AND lease_expires_at < NOW())
+      ORDER BY created_at
+      LIMIT 1
+      FOR UPDATE SKIP LOCKED
+   )
+  RETURNING *;
+END;
+$$;
+
+-- Renew a lease and store progress; false if the worker no longer holds the job
+CREATE OR REPLACE FUNCTION public.heartbeat_render_job(
+  p_id UUID, p_worker TEXT, p_lease_seconds INTEGER, p_progress INTEGER, p_message TEXT, p_state JSONB
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE public.render_jobs
+     SET lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+         progress = p_progress,
+         message = p_message,
+         state = p_state
+   WHERE id = p_id AND worker = p_worker AND status = 'PROCESSING';
+  RETURN FOUND;
+END;
+$$;
+
+-- Hand a job back without counting the attempt (worker shutting down)
+CREATE OR REPLACE FUNCTION public.release_render_job(p_id UUID, p_worker TEXT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+  UPDATE public.render_jobs
+     SET status = 'PENDING', worker = NULL, lease_expires_at = NULL,
+         attempts = attempts - 1, message = 'Job queued'
+   WHERE id = p_id AND worker = p_worker AND status = 'PROCESSING';
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.claim_render_job(TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.heartbeat_render_job(UUID, TEXT, INTEGER, INTEGER, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.release_render_job(UUID, TEXT) FROM PUBLIC, anon, authenticated;
+
+-- Ask PostgREST to refresh its schema cache
+NOTIFY pgrst, 'reload schema';
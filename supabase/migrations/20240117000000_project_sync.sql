@@ -0,0 +1,43 @@
+-- Render progress on editor_projects, written in batches by api/project_sync.py
+
+ALTER TABLE public.editor_projects ADD COLUMN IF NOT EXISTS render_progress INTEGER;
+
+-- Apply a batch of per-project column updates in one transaction:
+-- [{"id": "<uuid>", "fields": {"status": "processing", "render_progress": 40}}, ...]
+-- Only the listed columns are touched; columns missing from "fields" keep their value.
+-- Returns the ids that matched no editor_projects row; the caller writes status and
+-- video_url for those to the legacy projects table.
+DROP FUNCTION IF EXISTS public.apply_project_updates(JSONB);
+
+CREATE FUNCTION public.apply_project_updates(p_updates JSONB)
+RETURNS UUID[]
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  missing UUID[];
+BEGIN
+  WITH updated AS (
+    UPDATE public.editor_projects AS p
+       SET status          = CASE WHEN u.fields ? 'status'          THEN u.fields->>'status'          ELSE p.status END,
+           render_progress = CASE WHEN u.fields ? 'render_progress' THEN (u.fields->>'render_progress')::INTEGER ELSE p.render_progress END,
+           video_url       = CASE WHEN u.fields ? 'video_url'       THEN u.fields->>'video_url'       ELSE p.video_url END,
+           poster_url      = CASE WHEN u.fields ? 'poster_url'      THEN u.fields->>'poster_url'      ELSE p.poster_url END,
+           sprite_url      = CASE WHEN u.fields ? 'sprite_url'      THEN u.fields->>'sprite_url'      ELSE p.sprite_url END,
+           sprite_vtt_url  = CASE WHEN u.fields ? 'sprite_vtt_url'  THEN u.fields->>'sprite_vtt_url'  ELSE p.sprite_vtt_url END
+      FROM jsonb_to_recordset(p_updates) AS u(id UUID, fields JSONB)
+     WHERE p.id = u.id
+    RETURNING p.id
+  )
+  SELECT COALESCE(array_agg(u.id), '{}')
+    INTO missing
+    FROM jsonb_to_recordset(p_updates) AS u(id UUID)
+   WHERE NOT EXISTS (SELECT 1 FROM updated WHERE updated.id = u.id);
+  RETURN missing;
+END;
+$$;
+
+-- Only the render service (service role) writes render state
+REVOKE EXECUTE ON FUNCTION public.apply_project_updates(JSONB) FROM PUBLIC, anon, authenticated;
+
+-- Ask PostgREST to refresh its schema cache
+NOTIFY pgrst, 'reload schema';